@@ -19,8 +19,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from contracts import create_contract_store
 from mdtp.api.api_v1 import create_api as create_v1_api
 from mdtp.api.metadata import create_api as create_metadata_api
+from mdtp.grid_item_change_broadcaster import GridItemChangeBroadcaster
+from mdtp.image_executor import ImageExecutor
 from mdtp.image_manager import ImageManager
 from mdtp.ipfs_manager import IpfsManager
+from mdtp.ipfs_resolver import IpfsResolver
 from mdtp.manager import MdtpManager
 from mdtp.store.retriever import Retriever
 from mdtp.store.saver import Saver
@@ -56,13 +59,17 @@ infuraPassword = os.environ['INFURA_IPFS_PROJECT_SECRET']
 infuraAuth = BasicAuthentication(username=infuraUsername, password=infuraPassword)
 infuraRequester = Requester(headers={'Authorization': f'Basic {infuraAuth.to_string()}'})
 ipfsManager = IpfsManager(infuraRequester=infuraRequester)
+ipfsResolver = IpfsResolver(requester=requester)
 
-imageManager = ImageManager(requester=requester, s3Manager=s3Manager, ipfsManager=ipfsManager)
-manager = MdtpManager(requester=requester, retriever=retriever, saver=saver, s3Manager=s3Manager, contractStore=contractStore, workQueue=workQueue, imageManager=imageManager, ipfsManager=ipfsManager)
+imageExecutor = ImageExecutor()
+imageManager = ImageManager(requester=requester, s3Manager=s3Manager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, retriever=retriever, saver=saver, imageExecutor=imageExecutor)
+manager = MdtpManager(requester=requester, retriever=retriever, saver=saver, s3Manager=s3Manager, contractStore=contractStore, workQueue=workQueue, imageManager=imageManager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, imageExecutor=imageExecutor)
+gridItemChangeBroadcaster = GridItemChangeBroadcaster(connectionString=databaseConnectionString, manager=manager)
+gridItemChangeBroadcaster.add_change_listener(changeListener=manager.on_grid_items_changed)
 
 app = FastAPI()
 app.include_router(router=create_health_api(name=name, version=version, environment=environment))
-app.include_router(prefix='/v1', router=create_v1_api(manager=manager))
+app.include_router(prefix='/v1', router=create_v1_api(manager=manager, gridItemChangeBroadcaster=gridItemChangeBroadcaster))
 app.include_router(prefix='', router=create_metadata_api(manager=manager))
 app.add_middleware(ExceptionHandlingMiddleware)
 app.add_middleware(ServerHeadersMiddleware, name=name, version=version, environment=environment)
@@ -79,11 +86,14 @@ async def startup():
     await database.connect()
     await s3Manager.connect()
     await workQueue.connect()
+    await gridItemChangeBroadcaster.start()
 
 @app.on_event('shutdown')
 async def shutdown():
+    await gridItemChangeBroadcaster.stop()
     await requester.close_connections()
     await infuraRequester.close_connections()
     await s3Manager.disconnect()
     await workQueue.disconnect()
     await database.disconnect()
+    imageExecutor.shutdown()
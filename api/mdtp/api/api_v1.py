@@ -1,8 +1,13 @@
 import datetime
+from typing import AsyncIterator
 from typing import Optional
+from typing import Tuple
 
 from fastapi import APIRouter
+from fastapi import Query
+from fastapi import Request
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 
 from mdtp.api.endpoints_v1 import BaseImageUrlResponse
 from mdtp.api.endpoints_v1 import BuildBaseImageRequest
@@ -12,8 +17,10 @@ from mdtp.api.endpoints_v1 import CreateMetadataForTokenGroupResponse
 from mdtp.api.endpoints_v1 import CreateMetadataForTokenRequest
 from mdtp.api.endpoints_v1 import CreateMetadataForTokenResponse
 from mdtp.api.endpoints_v1 import GenerateImageUploadForTokenResponse
+from mdtp.api.endpoints_v1 import GetCacheStatsResponse
 from mdtp.api.endpoints_v1 import GetNetworkStatusResponse
 from mdtp.api.endpoints_v1 import GetNetworkSummaryResponse
+from mdtp.api.endpoints_v1 import ListGridItemsDeltaResponse
 from mdtp.api.endpoints_v1 import ListGridItemsResponse
 from mdtp.api.endpoints_v1 import RetrieveGridItemRequest
 from mdtp.api.endpoints_v1 import RetrieveGridItemResponse
@@ -25,27 +32,93 @@ from mdtp.api.endpoints_v1 import UpdateTokenDeferredRequest
 from mdtp.api.endpoints_v1 import UpdateTokenDeferredResponse
 from mdtp.api.endpoints_v1 import UpdateTokensDeferredRequest
 from mdtp.api.endpoints_v1 import UpdateTokensDeferredResponse
+from mdtp.api.grid_items_columnar import GRID_ITEMS_COLUMNAR_MEDIA_TYPE
+from mdtp.api.grid_items_columnar import encode_grid_items_columnar
 from mdtp.api.resources_v1 import ApiBaseImage
+from mdtp.api.resources_v1 import ApiCacheStats
 from mdtp.api.resources_v1 import ApiGridItem
 from mdtp.api.resources_v1 import ApiNetworkStatus
 from mdtp.api.resources_v1 import ApiNetworkSummary
 from mdtp.api.resources_v1 import ApiPresignedUpload
+from mdtp.api.response_util import create_conditional_response
+from mdtp.api.response_util import create_not_modified_response
+from mdtp.api.response_util import generate_etag_from_change_stamp
+from mdtp.api.response_util import is_etag_matched
 from mdtp.cache_control_header import CacheControlHeader
+from mdtp.grid_item_change_broadcaster import GridItemChangeBroadcaster
+from mdtp.lru_cache import LruCache
 from mdtp.manager import MdtpManager
 
+_GRID_ITEMS_RESPONSE_CACHE_SIZE = 100
+# NOTE(krishan711): short max-ages let CDNs absorb bursts while the etags make revalidation after expiry cheap
+_CACHE_CONTROL_GRID_ITEMS = CacheControlHeader(shouldCachePublically=True, maxAge=10)
+_CACHE_CONTROL_BASE_IMAGE = CacheControlHeader(shouldCachePublically=True, maxAge=60)
+_CACHE_CONTROL_NETWORK_STATUS = CacheControlHeader(shouldCachePublically=True, maxAge=60)
+_CACHE_CONTROL_STREAM = CacheControlHeader(shouldNotCache=True, shouldNotStore=True)
+_CACHE_CONTROL_IMAGE_REDIRECT = CacheControlHeader(shouldCachePublically=True, maxAge=60 * 60 * 24 * 365)
+_GRID_ITEMS_COLUMNAR_FORMAT = 'columnar'
+_GRID_ITEMS_STREAM_KEEP_ALIVE_SECONDS = 15
 
-def create_api(manager: MdtpManager) -> APIRouter():
+
+def create_api(manager: MdtpManager, gridItemChangeBroadcaster: GridItemChangeBroadcaster) -> APIRouter():
     router = APIRouter()
+    # NOTE(krishan711): entries are (changeStamp, content) and are only served while the network's change stamp is unchanged
+    gridItemsResponseCache: LruCache[Tuple[str, bytes]] = LruCache(maxSize=_GRID_ITEMS_RESPONSE_CACHE_SIZE)
 
     @router.get('/networks/{network}/latest-base-image', response_model=BaseImageUrlResponse)
-    async def get_latest_base_image_url(network: str) -> BaseImageUrlResponse: # request: BaseImageUrlRequest
+    async def get_latest_base_image_url(rawRequest: Request, network: str) -> Response: # request: BaseImageUrlRequest
         baseImage = await manager.get_latest_base_image_url(network=network)
-        return BaseImageUrlResponse(baseImage=ApiBaseImage.from_model(model=baseImage))
+        etag = generate_etag_from_change_stamp(baseImage.baseImageId, baseImage.updatedDate.isoformat())
+        if is_etag_matched(request=rawRequest, etag=etag):
+            return create_not_modified_response(etag=etag, cacheControlHeader=_CACHE_CONTROL_BASE_IMAGE)
+        content = BaseImageUrlResponse(baseImage=ApiBaseImage.from_model(model=baseImage)).json().encode()
+        return create_conditional_response(request=rawRequest, content=content, etag=etag, cacheControlHeader=_CACHE_CONTROL_BASE_IMAGE)
 
     @router.get('/networks/{network}/grid-items', response_model=ListGridItemsResponse)
-    async def list_grid_items(network: str, shouldCompact: bool = False, ownerId: Optional[str] = None, updatedSinceDate: Optional[datetime.datetime] = None, groupId: Optional[str] = None) -> ListGridItemsResponse: # request: ListGridItemsRequest
-        gridItems = await manager.list_grid_items(network=network, ownerId=ownerId, updatedSinceDate=updatedSinceDate, groupId=groupId)
-        return ListGridItemsResponse(gridItems=[ApiGridItem.from_model(model=gridItem, shouldCompact=shouldCompact) for gridItem in gridItems])
+    async def list_grid_items(rawRequest: Request, network: str, shouldCompact: bool = False, ownerId: Optional[str] = None, updatedSinceDate: Optional[datetime.datetime] = None, groupId: Optional[str] = None, responseFormat: Optional[str] = Query(None, alias='format')) -> Response: # request: ListGridItemsRequest
+        # NOTE(krishan711): the columnar format is opted into with ?format=columnar or an Accept header of application/x-msgpack
+        shouldUseColumnar = responseFormat == _GRID_ITEMS_COLUMNAR_FORMAT or GRID_ITEMS_COLUMNAR_MEDIA_TYPE in rawRequest.headers.get('accept', '')
+        changeStamp = await manager.get_grid_items_change_stamp(network=network)
+        cacheKey = (network, shouldCompact, ownerId, updatedSinceDate, groupId, shouldUseColumnar)
+        # NOTE(krishan711): the body is fully determined by the change stamp and the query so the etag can be checked before anything is loaded
+        etag = generate_etag_from_change_stamp(changeStamp, *cacheKey)
+        extraHeaders = {'vary': 'Accept'}
+        if is_etag_matched(request=rawRequest, etag=etag):
+            return create_not_modified_response(etag=etag, cacheControlHeader=_CACHE_CONTROL_GRID_ITEMS, extraHeaders=extraHeaders)
+        cachedResponse = gridItemsResponseCache.get(cacheKey)
+        if cachedResponse and cachedResponse[0] == changeStamp:
+            _, content = cachedResponse
+        else:
+            gridItems = await manager.list_grid_items(network=network, ownerId=ownerId, updatedSinceDate=updatedSinceDate, groupId=groupId)
+            apiGridItems = [ApiGridItem.from_model(model=gridItem, shouldCompact=shouldCompact) for gridItem in gridItems]
+            if shouldUseColumnar:
+                content = encode_grid_items_columnar(gridItems=apiGridItems)
+            else:
+                content = ListGridItemsResponse(gridItems=apiGridItems).json().encode()
+            gridItemsResponseCache.set(cacheKey, (changeStamp, content))
+        return create_conditional_response(request=rawRequest, content=content, etag=etag, mediaType=GRID_ITEMS_COLUMNAR_MEDIA_TYPE if shouldUseColumnar else 'application/json', cacheControlHeader=_CACHE_CONTROL_GRID_ITEMS, extraHeaders=extraHeaders)
+
+    @router.get('/networks/{network}/grid-items/delta', response_model=ListGridItemsDeltaResponse)
+    async def list_grid_items_delta(network: str, cursor: Optional[str] = None, shouldCompact: bool = False) -> ListGridItemsDeltaResponse: # request: ListGridItemsDeltaRequest
+        gridItemsDelta = await manager.list_grid_items_delta(network=network, cursor=cursor)
+        return ListGridItemsDeltaResponse(gridItems=[ApiGridItem.from_model(model=gridItem, shouldCompact=shouldCompact) for gridItem in gridItemsDelta.gridItems], cursor=gridItemsDelta.cursor, hasMore=gridItemsDelta.hasMore)
+
+    @router.get('/networks/{network}/grid-items/stream')
+    async def stream_grid_items(rawRequest: Request, network: str, cursor: Optional[str] = None, shouldCompact: bool = False) -> StreamingResponse:
+        # NOTE(krishan711): server-sent events where each event id is a cursor, so browsers resume from it (via Last-Event-ID) on reconnect
+        cursor = cursor or rawRequest.headers.get('last-event-id') or None
+        if cursor:
+            manager.decode_grid_items_cursor(cursor=cursor)
+
+        async def generate_events() -> AsyncIterator[str]:
+            async for gridItemsDelta in gridItemChangeBroadcaster.stream_grid_items_deltas(network=network, cursor=cursor, keepAliveSeconds=_GRID_ITEMS_STREAM_KEEP_ALIVE_SECONDS):
+                if gridItemsDelta is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                content = ListGridItemsDeltaResponse(gridItems=[ApiGridItem.from_model(model=gridItem, shouldCompact=shouldCompact) for gridItem in gridItemsDelta.gridItems], cursor=gridItemsDelta.cursor, hasMore=gridItemsDelta.hasMore).json()
+                yield f'id: {gridItemsDelta.cursor}\nevent: grid-items\ndata: {content}\n\n'
+
+        return StreamingResponse(content=generate_events(), media_type='text/event-stream', headers={_CACHE_CONTROL_STREAM.key: _CACHE_CONTROL_STREAM.to_value_string(), 'x-accel-buffering': 'no'})
 
     @router.get('/networks/{network}/summary', response_model=GetNetworkSummaryResponse)
     async def get_network_summary(network: str) -> GetNetworkSummaryResponse: # request: GetNetworkSummaryRequest
@@ -111,12 +184,17 @@ def create_api(manager: MdtpManager) -> APIRouter():
     @router.get('/images/{imageId}/go')
     async def go_to_image(imageId: str, w: Optional[int] = None, h: Optional[int] = None) -> Response:  # pylint: disable=invalid-name
         imageUrl = await manager.go_to_image(imageId=imageId, width=w, height=h)
-        return Response(status_code=301, headers={'location': imageUrl, CacheControlHeader.KEY: CacheControlHeader(shouldCachePublically=True, maxAge=60 * 60 * 24 * 365).to_value_string()})
+        return Response(status_code=301, headers={'location': imageUrl, _CACHE_CONTROL_IMAGE_REDIRECT.key: _CACHE_CONTROL_IMAGE_REDIRECT.to_value_string()})
 
-    @router.get('/networks/{network}/status')
-    async def get_network_status(response: Response, network: str) -> GetNetworkStatusResponse:
-        response.headers[CacheControlHeader.KEY] = CacheControlHeader(shouldCachePublically=True, maxAge=60 * 60 * 24 * 365).to_value_string()
+    @router.get('/networks/{network}/status', response_model=GetNetworkStatusResponse)
+    async def get_network_status(rawRequest: Request, network: str) -> Response:
         networkStatus = await manager.get_network_status(network=network)
-        return GetNetworkStatusResponse(networkStatus=ApiNetworkStatus.from_model(model=networkStatus))
+        content = GetNetworkStatusResponse(networkStatus=ApiNetworkStatus.from_model(model=networkStatus)).json().encode()
+        return create_conditional_response(request=rawRequest, content=content, cacheControlHeader=_CACHE_CONTROL_NETWORK_STATUS)
+
+    @router.get('/cache-stats', response_model=GetCacheStatsResponse)
+    async def get_cache_stats() -> GetCacheStatsResponse: # request: GetCacheStatsRequest
+        cacheStats = manager.get_cache_stats()
+        return GetCacheStatsResponse(cacheStats=[ApiCacheStats.from_model(model=cacheStat) for cacheStat in cacheStats])
 
     return router
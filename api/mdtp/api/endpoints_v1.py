@@ -4,6 +4,7 @@ from typing import Optional
 from pydantic import BaseModel
 
 from mdtp.api.resources_v1 import ApiBaseImage
+from mdtp.api.resources_v1 import ApiCacheStats
 from mdtp.api.resources_v1 import ApiGridItem
 from mdtp.api.resources_v1 import ApiNetworkStatus
 from mdtp.api.resources_v1 import ApiNetworkSummary
@@ -22,6 +23,14 @@ class ListGridItemsRequest(BaseModel):
 class ListGridItemsResponse(BaseModel):
     gridItems: List[ApiGridItem]
 
+class ListGridItemsDeltaRequest(BaseModel):
+    pass
+
+class ListGridItemsDeltaResponse(BaseModel):
+    gridItems: List[ApiGridItem]
+    cursor: str
+    hasMore: bool
+
 class GetNetworkSummaryRequest(BaseModel):
     pass
 
@@ -116,3 +125,9 @@ class GetNetworkStatusRequest(BaseModel):
 
 class GetNetworkStatusResponse(BaseModel):
     networkStatus: ApiNetworkStatus
+
+class GetCacheStatsRequest(BaseModel):
+    pass
+
+class GetCacheStatsResponse(BaseModel):
+    cacheStats: List[ApiCacheStats]
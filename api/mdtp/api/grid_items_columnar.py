@@ -0,0 +1,122 @@
+import datetime
+import sys
+from array import array
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import msgpack
+
+from mdtp.api.resources_v1 import ApiGridItem
+
+# NOTE(krishan711): the columnar payload is a msgpack map of the form:
+#   {'version': 1, 'count': n, 'strings': [...], 'urlPrefixes': [...], 'columns': {...}}
+# Integer columns are little-endian packed arrays (tokenId is uint16, the rest uint32 / int64).
+# String columns are uint32 arrays of (index + 1) into `strings`, where 0 means null.
+# Url columns are two uint32 arrays: `<name>Prefix` into `urlPrefixes` and `<name>` into `strings` for the remainder.
+GRID_ITEMS_COLUMNAR_MEDIA_TYPE = 'application/x-msgpack'
+GRID_ITEMS_COLUMNAR_VERSION = 1
+
+_STRING_COLUMNS = ['network', 'title', 'description', 'ownerId', 'groupId', 'source']
+_URL_COLUMNS = ['contentUrl', 'imageUrl', 'resizableImageUrl', 'url']
+
+
+def _split_url(url: str) -> List[str]:
+    # NOTE(krishan711): the prefix is the scheme and host (e.g. https://host/ or ipfs://) which is shared by most urls
+    schemeIndex = url.find('://')
+    if schemeIndex < 0:
+        return ['', url]
+    pathIndex = url.find('/', schemeIndex + 3)
+    if pathIndex < 0 or url.startswith('ipfs://'):
+        pathIndex = schemeIndex + 2
+    return [url[:pathIndex + 1], url[pathIndex + 1:]]
+
+
+class _StringTable:
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+        index = self._indices.get(value)
+        if index is None:
+            self.values.append(value)
+            index = len(self.values)
+            self._indices[value] = index
+        return index
+
+
+def _pack(typecode: str, values: Sequence[int]) -> bytes:
+    packedArray = array(typecode, values)
+    # NOTE(krishan711): array uses native byte order so it needs swapping on big-endian hosts
+    if sys.byteorder != 'little':
+        packedArray.byteswap()
+    return packedArray.tobytes()
+
+
+def _unpack(typecode: str, content: bytes) -> List[int]:
+    packedArray = array(typecode)
+    packedArray.frombytes(content)
+    if sys.byteorder != 'little':
+        packedArray.byteswap()
+    return packedArray.tolist()
+
+
+def encode_grid_items_columnar(gridItems: Sequence[ApiGridItem]) -> bytes:
+    strings = _StringTable()
+    urlPrefixes = _StringTable()
+    columns: Dict[str, bytes] = {
+        'gridItemId': _pack('I', [gridItem.gridItemId for gridItem in gridItems]),
+        'tokenId': _pack('H', [gridItem.tokenId for gridItem in gridItems]),
+        'blockNumber': _pack('I', [gridItem.blockNumber for gridItem in gridItems]),
+        'updatedDate': _pack('q', [int(gridItem.updatedDate.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000) for gridItem in gridItems]),
+    }
+    for columnName in _STRING_COLUMNS:
+        columns[columnName] = _pack('I', [strings.add(getattr(gridItem, columnName)) for gridItem in gridItems])
+    for columnName in _URL_COLUMNS:
+        prefixIndices = []
+        remainderIndices = []
+        for gridItem in gridItems:
+            url = getattr(gridItem, columnName)
+            if url is None:
+                prefixIndices.append(0)
+                remainderIndices.append(0)
+                continue
+            prefix, remainder = _split_url(url=url)
+            prefixIndices.append(urlPrefixes.add(prefix))
+            remainderIndices.append(strings.add(remainder))
+        columns[f'{columnName}Prefix'] = _pack('I', prefixIndices)
+        columns[columnName] = _pack('I', remainderIndices)
+    return msgpack.packb({
+        'version': GRID_ITEMS_COLUMNAR_VERSION,
+        'count': len(gridItems),
+        'strings': strings.values,
+        'urlPrefixes': urlPrefixes.values,
+        'columns': columns,
+    }, use_bin_type=True)
+
+
+def decode_grid_items_columnar(content: bytes) -> List[ApiGridItem]:
+    payload = msgpack.unpackb(content, raw=False)
+    if payload['version'] != GRID_ITEMS_COLUMNAR_VERSION:
+        raise ValueError(f'Unsupported grid items columnar version {payload["version"]}')
+    strings = [None] + payload['strings']
+    urlPrefixes = [None] + payload['urlPrefixes']
+    columns = payload['columns']
+    values: Dict[str, List] = {
+        'gridItemId': _unpack('I', columns['gridItemId']),
+        'tokenId': _unpack('H', columns['tokenId']),
+        'blockNumber': _unpack('I', columns['blockNumber']),
+        'updatedDate': [datetime.datetime.utcfromtimestamp(timestamp / 1000) for timestamp in _unpack('q', columns['updatedDate'])],
+    }
+    for columnName in _STRING_COLUMNS:
+        values[columnName] = [strings[index] for index in _unpack('I', columns[columnName])]
+    for columnName in _URL_COLUMNS:
+        prefixIndices = _unpack('I', columns[f'{columnName}Prefix'])
+        remainderIndices = _unpack('I', columns[columnName])
+        values[columnName] = [None if prefixIndex == 0 else urlPrefixes[prefixIndex] + strings[remainderIndex] for prefixIndex, remainderIndex in zip(prefixIndices, remainderIndices)]
+    return [ApiGridItem(**{columnName: columnValues[index] for columnName, columnValues in values.items()}) for index in range(payload['count'])]
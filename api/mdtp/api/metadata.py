@@ -1,7 +1,11 @@
 from fastapi import APIRouter
+from fastapi import Request
+from fastapi import Response
 from pydantic import BaseModel
 
 from mdtp.api.resources_v1 import ApiTokenMetadata
+from mdtp.api.response_util import create_conditional_response
+from mdtp.cache_control_header import CacheControlHeader
 from mdtp.manager import MdtpManager
 
 
@@ -17,17 +21,22 @@ class GetTokenDefaultContentRequest(BaseModel):
 class GetTokenDefaultContentResponse(ApiTokenMetadata):
     pass
 
+_CACHE_CONTROL_TOKEN_METADATA = CacheControlHeader(shouldCachePublically=True, maxAge=60 * 5)
+
+
 def create_api(manager: MdtpManager) -> APIRouter():
     router = APIRouter()
 
     @router.get('/token-metadatas/{tokenId}', response_model=GetTokenMetadataResponse)
-    async def get_token_metadata(tokenId: str) -> GetTokenMetadataResponse: # request: GetTokenMetadataRequest
+    async def get_token_metadata(rawRequest: Request, tokenId: str) -> Response: # request: GetTokenMetadataRequest
         tokenMetadata = await manager.get_token_metadata(network='mainnet2', tokenId=tokenId)
-        return GetTokenMetadataResponse.from_model(model=tokenMetadata)
+        content = GetTokenMetadataResponse.from_model(model=tokenMetadata).json().encode()
+        return create_conditional_response(request=rawRequest, content=content, cacheControlHeader=_CACHE_CONTROL_TOKEN_METADATA)
 
     @router.get('/token-default-contents/{tokenId}', response_model=GetTokenDefaultContentResponse)
-    async def get_token_default_content(tokenId: str) -> GetTokenDefaultContentResponse: # request: GetTokenDefaultContentRequest
+    async def get_token_default_content(rawRequest: Request, tokenId: str) -> Response: # request: GetTokenDefaultContentRequest
         tokenMetadata = await manager.get_token_content(network='mainnet2', tokenId=tokenId)
-        return GetTokenDefaultContentResponse.from_model(model=tokenMetadata)
+        content = GetTokenDefaultContentResponse.from_model(model=tokenMetadata).json().encode()
+        return create_conditional_response(request=rawRequest, content=content, cacheControlHeader=_CACHE_CONTROL_TOKEN_METADATA)
 
     return router
@@ -6,6 +6,7 @@ from core.s3_manager import S3PresignedUpload
 from pydantic import BaseModel
 
 from mdtp.model import BaseImage
+from mdtp.model import CacheStats
 from mdtp.model import GridItem
 from mdtp.model import NetworkStatus
 from mdtp.model import NetworkSummary
@@ -96,6 +97,27 @@ class ApiNetworkStatus(BaseModel):
         )
 
 
+class ApiCacheStats(BaseModel):
+    name: str
+    size: int
+    maxSize: int
+    hitCount: int
+    missCount: int
+    hitRate: float
+
+    @classmethod
+    def from_model(cls, model: CacheStats):
+        requestCount = model.hitCount + model.missCount
+        return cls(
+            name=model.name,
+            size=model.size,
+            maxSize=model.maxSize,
+            hitCount=model.hitCount,
+            missCount=model.missCount,
+            hitRate=model.hitCount / requestCount if requestCount > 0 else 0,
+        )
+
+
 class ApiPresignedUpload(BaseModel):
     url: str
     params: Dict[str, str]
@@ -112,6 +134,9 @@ class ApiBaseImage(BaseModel):
     network: str
     url: str
     generatedDate: datetime.datetime
+    tileUrlTemplate: Optional[str]
+    tileSize: Optional[int]
+    tileMaxZoom: Optional[int]
 
     @classmethod
     def from_model(cls, model: BaseImage):
@@ -120,4 +145,7 @@ class ApiBaseImage(BaseModel):
             network=model.network,
             url=model.url,
             generatedDate=model.generatedDate,
+            tileUrlTemplate=model.tileUrlTemplate,
+            tileSize=model.tileSize,
+            tileMaxZoom=model.tileMaxZoom,
         )
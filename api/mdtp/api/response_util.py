@@ -0,0 +1,51 @@
+import hashlib
+from typing import Dict
+from typing import Optional
+
+from fastapi import Request
+from fastapi import Response
+
+from mdtp.cache_control_header import CacheControlHeader
+
+ETAG_HEADER_KEY = 'etag'
+IF_NONE_MATCH_HEADER_KEY = 'if-none-match'
+
+
+def generate_etag(content: bytes) -> str:
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def generate_etag_from_change_stamp(*parts: object) -> str:
+    # NOTE(krishan711): only use this when the body is fully determined by the parts (e.g. a change stamp and the query)
+    return generate_etag(content=':'.join(str(part) for part in parts).encode())
+
+
+def is_etag_matched(request: Request, etag: str) -> bool:
+    ifNoneMatch = request.headers.get(IF_NONE_MATCH_HEADER_KEY)
+    if not ifNoneMatch:
+        return False
+    if ifNoneMatch.strip() == '*':
+        return True
+    # NOTE(krishan711): If-None-Match uses the weak comparison so a W/ prefix (added by some CDNs when compressing) is ignored
+    requestEtags = {requestEtag.strip().removeprefix('W/') for requestEtag in ifNoneMatch.split(',')}
+    return etag.removeprefix('W/') in requestEtags
+
+
+def _build_headers(etag: str, cacheControlHeader: Optional[CacheControlHeader], extraHeaders: Optional[Dict[str, str]]) -> Dict[str, str]:
+    headers = {ETAG_HEADER_KEY: etag}
+    if cacheControlHeader:
+        headers[cacheControlHeader.key] = cacheControlHeader.to_value_string()
+    if extraHeaders:
+        headers.update(extraHeaders)
+    return headers
+
+
+def create_not_modified_response(etag: str, cacheControlHeader: Optional[CacheControlHeader] = None, extraHeaders: Optional[Dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers=_build_headers(etag=etag, cacheControlHeader=cacheControlHeader, extraHeaders=extraHeaders))
+
+
+def create_conditional_response(request: Request, content: bytes, etag: Optional[str] = None, mediaType: str = 'application/json', cacheControlHeader: Optional[CacheControlHeader] = None, extraHeaders: Optional[Dict[str, str]] = None) -> Response:
+    etag = etag or generate_etag(content=content)
+    if is_etag_matched(request=request, etag=etag):
+        return create_not_modified_response(etag=etag, cacheControlHeader=cacheControlHeader, extraHeaders=extraHeaders)
+    return Response(content=content, media_type=mediaType, headers=_build_headers(etag=etag, cacheControlHeader=cacheControlHeader, extraHeaders=extraHeaders))
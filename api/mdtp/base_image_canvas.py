@@ -0,0 +1,217 @@
+import math
+import mmap
+import os
+import struct
+import zlib
+from io import BytesIO
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+from PIL import Image as PILImage
+from PIL import ImageChops
+
+_BYTES_PER_PIXEL = 3
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_IDAT_CHUNK_SIZE = 1024 * 1024
+_PNG_FILTER_SUB = b'\x01'
+_ADLER_BASE = 65521
+
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    # NOTE(krishan711): port of zlib's adler32_combine, which isn't exposed by python's zlib module
+    remainder = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % _ADLER_BASE
+    sum1 += (adler2 & 0xffff) + _ADLER_BASE - 1
+    sum2 += ((adler1 >> 16) & 0xffff) + ((adler2 >> 16) & 0xffff) + _ADLER_BASE - remainder
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum1 >= _ADLER_BASE:
+        sum1 -= _ADLER_BASE
+    if sum2 >= (_ADLER_BASE << 1):
+        sum2 -= (_ADLER_BASE << 1)
+    if sum2 >= _ADLER_BASE:
+        sum2 -= _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+def _png_chunk(chunkType: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + chunkType + data + struct.pack('>I', zlib.crc32(chunkType + data))
+
+
+class BaseImageCanvas:
+    # NOTE(krishan711): the canvas is a raw RGB buffer kept on disk (and memory-mapped) so that it
+    # survives between builds. The png output is compressed in independent horizontal bands so only
+    # the bands that contain changed pixels need to be re-compressed.
+
+    def __init__(self, filePath: str, width: int, height: int, bandHeight: int):
+        self.filePath = filePath
+        self.versionFilePath = f'{filePath}.version'
+        self.width = width
+        self.height = height
+        self.bandHeight = bandHeight
+        self.rowLength = width * _BYTES_PER_PIXEL
+        self._buffer: Optional[mmap.mmap] = None
+        self._encodedBands: Dict[int, Tuple[bytes, int, int]] = {}
+        self._dirtyBands: Set[int] = set(range(self.bandCount))
+        self._dirtyBoxes: List[Tuple[int, int, int, int]] = []
+
+    @property
+    def bandCount(self) -> int:
+        return (self.height + self.bandHeight - 1) // self.bandHeight
+
+    @property
+    def dirtyBoxes(self) -> List[Tuple[int, int, int, int]]:
+        return self._dirtyBoxes
+
+    @property
+    def dirtyBox(self) -> Optional[Tuple[int, int, int, int]]:
+        if len(self._dirtyBoxes) == 0:
+            return None
+        return (min(box[0] for box in self._dirtyBoxes), min(box[1] for box in self._dirtyBoxes), max(box[2] for box in self._dirtyBoxes), max(box[3] for box in self._dirtyBoxes))
+
+    def open(self) -> None:
+        if self._buffer is not None:
+            return
+        os.makedirs(os.path.dirname(self.filePath) or '.', exist_ok=True)
+        bufferSize = self.rowLength * self.height
+        if not os.path.exists(self.filePath) or os.path.getsize(self.filePath) != bufferSize:
+            with open(self.filePath, 'wb') as canvasFile:
+                canvasFile.truncate(bufferSize)
+            self._clear_version()
+        with open(self.filePath, 'r+b') as canvasFile:
+            self._buffer = mmap.mmap(canvasFile.fileno(), bufferSize)
+        self._encodedBands = {}
+        self._dirtyBands = set(range(self.bandCount))
+
+    def close(self) -> None:
+        if self._buffer is None:
+            return
+        self._buffer.flush()
+        self._buffer.close()
+        self._buffer = None
+
+    def get_version(self) -> Optional[str]:
+        if not os.path.exists(self.versionFilePath):
+            return None
+        with open(self.versionFilePath, 'r') as versionFile:
+            return versionFile.read().strip() or None
+
+    def set_version(self, version: str) -> None:
+        self._buffer.flush()
+        with open(self.versionFilePath, 'w') as versionFile:
+            versionFile.write(version)
+
+    def _clear_version(self) -> None:
+        if os.path.exists(self.versionFilePath):
+            os.remove(self.versionFilePath)
+
+    def _mark_dirty(self, box: Tuple[int, int, int, int]) -> None:
+        # NOTE(krishan711): clear the version first so a crash mid-write never leaves a canvas that looks up to date
+        self._clear_version()
+        self._dirtyBands.update(range(box[1] // self.bandHeight, (box[3] - 1) // self.bandHeight + 1))
+        if box == (0, 0, self.width, self.height):
+            self._dirtyBoxes = [box]
+        else:
+            self._dirtyBoxes.append(box)
+
+    def reset_dirty_boxes(self) -> None:
+        self._dirtyBoxes = []
+
+    def clear(self) -> None:
+        self._buffer[:] = bytes(len(self._buffer))
+        self._mark_dirty(box=(0, 0, self.width, self.height))
+
+    def load_image(self, image: PILImage.Image) -> None:
+        self._buffer[:] = image.convert('RGB').resize(size=(self.width, self.height)).tobytes()
+        self._mark_dirty(box=(0, 0, self.width, self.height))
+
+    def paste_image(self, image: PILImage.Image, xPosition: int, yPosition: int) -> None:
+        if image.mode == 'RGBA':
+            backgroundImage = PILImage.new('RGB', image.size)
+            backgroundImage.paste(image, (0, 0), mask=image)
+            image = backgroundImage
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        imageWidth = min(image.size[0], self.width - xPosition)
+        imageHeight = min(image.size[1], self.height - yPosition)
+        imageContent = image.tobytes()
+        imageRowLength = image.size[0] * _BYTES_PER_PIXEL
+        copyLength = imageWidth * _BYTES_PER_PIXEL
+        for row in range(imageHeight):
+            bufferOffset = ((yPosition + row) * self.width + xPosition) * _BYTES_PER_PIXEL
+            self._buffer[bufferOffset: bufferOffset + copyLength] = imageContent[row * imageRowLength: row * imageRowLength + copyLength]
+        self._mark_dirty(box=(xPosition, yPosition, xPosition + imageWidth, yPosition + imageHeight))
+
+    def read_region(self, box: Tuple[int, int, int, int]) -> PILImage.Image:
+        left, top, right, bottom = box
+        if left == 0 and right == self.width:
+            content = self._buffer[top * self.rowLength: bottom * self.rowLength]
+        else:
+            content = b''.join(self._buffer[(row * self.width + left) * _BYTES_PER_PIXEL: (row * self.width + right) * _BYTES_PER_PIXEL] for row in range(top, bottom))
+        return PILImage.frombytes(mode='RGB', size=(right - left, bottom - top), data=content)
+
+    def to_image(self) -> PILImage.Image:
+        return self.read_region(box=(0, 0, self.width, self.height))
+
+    def _encode_band(self, bandIndex: int) -> Tuple[bytes, int, int]:
+        top = bandIndex * self.bandHeight
+        bottom = min(top + self.bandHeight, self.height)
+        bandImage = self.read_region(box=(0, top, self.width, bottom))
+        # NOTE(krishan711): the png "sub" filter is a per-channel modulo subtraction of the pixel to the left
+        shiftedImage = ImageChops.offset(bandImage, 1, 0)
+        shiftedImage.paste((0, 0, 0), (0, 0, 1, bottom - top))
+        filteredContent = ImageChops.subtract_modulo(bandImage, shiftedImage).tobytes()
+        rawContent = b''.join(_PNG_FILTER_SUB + filteredContent[row * self.rowLength: (row + 1) * self.rowLength] for row in range(bottom - top))
+        compressor = zlib.compressobj(level=6, wbits=-15)
+        compressedContent = compressor.compress(rawContent) + compressor.flush(zlib.Z_FULL_FLUSH)
+        return compressedContent, zlib.adler32(rawContent), len(rawContent)
+
+    def encode_png(self) -> bytes:
+        for bandIndex in sorted(self._dirtyBands):
+            self._encodedBands[bandIndex] = self._encode_band(bandIndex=bandIndex)
+        self._dirtyBands = set()
+        checksum = 1
+        compressedParts = [b'\x78\x9c']
+        for bandIndex in range(self.bandCount):
+            compressedContent, bandChecksum, bandLength = self._encodedBands[bandIndex]
+            compressedParts.append(compressedContent)
+            checksum = _adler32_combine(checksum, bandChecksum, bandLength)
+        compressedParts.append(zlib.compressobj(wbits=-15).flush(zlib.Z_FINISH))
+        compressedParts.append(struct.pack('>I', checksum))
+        compressedData = b''.join(compressedParts)
+        pngParts = [_PNG_SIGNATURE, _png_chunk(chunkType=b'IHDR', data=struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0, 0))]
+        for offset in range(0, len(compressedData), _PNG_IDAT_CHUNK_SIZE):
+            pngParts.append(_png_chunk(chunkType=b'IDAT', data=compressedData[offset: offset + _PNG_IDAT_CHUNK_SIZE]))
+        pngParts.append(_png_chunk(chunkType=b'IEND', data=b''))
+        return b''.join(pngParts)
+
+    def get_tile_max_zoom(self, tileSize: int) -> int:
+        return max(0, math.ceil(math.log2(max(self.width, self.height) / tileSize)))
+
+    def get_tiles_in_boxes(self, boxes: List[Tuple[int, int, int, int]], tileSize: int) -> Set[Tuple[int, int, int]]:
+        # NOTE(krishan711): tiles are addressed as (zoom, column, row) where zoom maxZoom is full resolution
+        # and each lower zoom halves the resolution, down to a single tile at zoom 0
+        maxZoom = self.get_tile_max_zoom(tileSize=tileSize)
+        tiles = set()
+        for zoom in range(maxZoom + 1):
+            zoomTileSize = tileSize * (2 ** (maxZoom - zoom))
+            for left, top, right, bottom in boxes:
+                for column in range(left // zoomTileSize, (right - 1) // zoomTileSize + 1):
+                    for row in range(top // zoomTileSize, (bottom - 1) // zoomTileSize + 1):
+                        tiles.add((zoom, column, row))
+        return tiles
+
+    def encode_tile(self, zoom: int, column: int, row: int, tileSize: int) -> bytes:
+        scaleFactor = 2 ** (self.get_tile_max_zoom(tileSize=tileSize) - zoom)
+        zoomTileSize = tileSize * scaleFactor
+        box = (column * zoomTileSize, row * zoomTileSize, min((column + 1) * zoomTileSize, self.width), min((row + 1) * zoomTileSize, self.height))
+        tileImage = self.read_region(box=box)
+        if scaleFactor > 1:
+            tileImage = tileImage.reduce(scaleFactor)
+        contentBuffer = BytesIO()
+        tileImage.save(fp=contentBuffer, format='png', optimize=True)
+        return contentBuffer.getvalue()
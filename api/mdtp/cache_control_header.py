@@ -35,7 +35,7 @@ class Header:
 
 class CacheControlSingleHeader(Header):
     _ALLOW_MANY = True
-    KEY = 'cache_control'
+    KEY = 'cache-control'
 
     class Param:
         NO_CACHE = 'no-cache'
@@ -68,7 +68,7 @@ class CacheControlSingleHeader(Header):
 
 class CacheControlHeader(Header):
     _ALLOW_MANY = True
-    KEY = 'cache_control'
+    KEY = 'cache-control'
 
     class Param:
         NO_CACHE = 'no-cache'
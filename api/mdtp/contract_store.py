@@ -1,18 +1,34 @@
 import asyncio
 import dataclasses
 from typing import Any
+from typing import Dict
 from typing import List
 from typing import Optional
+from typing import Sequence
 
 from core.exceptions import BadRequestException
 from core.exceptions import InternalServerErrorException
 from core.exceptions import NotFoundException
 from core.exceptions import ServerException
+from core.util import list_util
 from core.web3.eth_client import EthClientInterface
+from eth_utils.abi import collapse_if_tuple
 from web3.main import Web3
+from web3.types import HexBytes
 from web3.types import TxReceipt
 
-from mdtp.chain_util import int_to_hex
+# NOTE(krishan711): Multicall3 is deployed at the same address on all the chains we use (https://www.multicall3.com)
+_MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+_MULTICALL3_AGGREGATE3_ABI = {
+    'name': 'aggregate3',
+    'type': 'function',
+    'stateMutability': 'payable',
+    'inputs': [{'name': 'calls', 'type': 'tuple[]', 'components': [{'name': 'target', 'type': 'address'}, {'name': 'allowFailure', 'type': 'bool'}, {'name': 'callData', 'type': 'bytes'}]}],
+    'outputs': [{'name': 'returnData', 'type': 'tuple[]', 'components': [{'name': 'success', 'type': 'bool'}, {'name': 'returnData', 'type': 'bytes'}]}],
+}
+_MULTICALL_BATCH_SIZE = 300
+_MULTICALL_CONCURRENCY = 5
+_REVERT_ERROR_SELECTOR = bytes.fromhex('08c379a0')
 
 
 class TransactionFailedException(ServerException):
@@ -46,12 +62,33 @@ class Contract:
     updateMethodSignature: Optional[str]
     sourceNetwork: Optional[str]
 
+@dataclasses.dataclass
+class TokenState:
+    tokenId: int
+    ownerId: Optional[str]
+    ownerErrorMessage: Optional[str]
+    contentUrl: Optional[str]
+    contentUrlErrorMessage: Optional[str]
+    isTokenSetForMigration: bool
+    isTokenSetForMigrationErrorMessage: Optional[str]  # pylint: disable=invalid-name
+
+@dataclasses.dataclass
+class _MulticallRequest:
+    methodName: str
+    arguments: Optional[dict]
+
+@dataclasses.dataclass
+class _MulticallResult:
+    response: Optional[List[Any]]
+    errorMessage: Optional[str]
+
 class ContractStore:
 
     def __init__(self, contracts: List[Contract], accountAddress: Optional[str] = None, privateKey: Optional[str] = None):
         self.contracts = contracts
         self.accountAddress = accountAddress
         self.privateKey = privateKey
+        self.w3 = Web3()
 
     def get_contract(self, network: str) -> Contract:
         for contract in self.contracts:
@@ -70,6 +107,32 @@ class ContractStore:
         response = await contract.ethClient.call_function(toAddress=contract.address, contractAbi=contract.abi, functionAbi=functionAbi, arguments=arguments)
         return response
 
+    def _decode_revert_message(self, returnData: bytes) -> str:
+        if returnData[:4] == _REVERT_ERROR_SELECTOR:
+            return str(self.w3.codec.decode(types=['string'], data=returnData[4:])[0])
+        return f'execution reverted: 0x{returnData.hex()}'
+
+    async def _call_function_batch(self, contract: Contract, callRequests: Sequence[_MulticallRequest]) -> List[_MulticallResult]:
+        calls = []
+        outputTypesList = []
+        for callRequest in callRequests:
+            functionAbi = [abi for abi in contract.abi if abi.get('name') == callRequest.methodName][0]
+            callData = self.w3.eth.contract(abi=contract.abi).encodeABI(fn_name=functionAbi['name'], kwargs=(callRequest.arguments or {}))
+            # NOTE(krishan711): abi encoding rejects addresses that aren't checksummed (some are stored lowercase)
+            calls.append((Web3.to_checksum_address(contract.address), True, HexBytes(callData)))
+            outputTypesList.append([collapse_if_tuple(abiOutput) for abiOutput in functionAbi.get('outputs', [])])
+        response = await contract.ethClient.call_function(toAddress=_MULTICALL3_ADDRESS, contractAbi=[_MULTICALL3_AGGREGATE3_ABI], functionAbi=_MULTICALL3_AGGREGATE3_ABI, arguments={'calls': calls})
+        results = []
+        for (isSuccess, returnData), outputTypes in zip(response[0], outputTypesList):
+            if not isSuccess:
+                results.append(_MulticallResult(response=None, errorMessage=self._decode_revert_message(returnData=returnData)))
+                continue
+            try:
+                results.append(_MulticallResult(response=list(self.w3.codec.decode(types=outputTypes, data=returnData)), errorMessage=None))
+            except Exception as exception:  # pylint: disable=broad-except
+                results.append(_MulticallResult(response=None, errorMessage=f'Failed to decode response: {str(exception)}'))
+        return results
+
     async def _send_transaction(self, contract: Contract, methodName: str, nonce: int, gas: int, gasPrice: int, arguments: Optional[dict] = None) -> str:
         if not self.accountAddress or not self.privateKey:
             raise InternalServerErrorException('accountAddress and privateKey must be provided to ContractStore in order to make transactions')
@@ -77,15 +140,50 @@ class ContractStore:
         transactionHash = await contract.ethClient.send_transaction(toAddress=contract.address, contractAbi=contract.abi, functionAbi=functionAbi, arguments=arguments, fromAddress=self.accountAddress, privateKey=self.privateKey, nonce=nonce, gas=gas, gasPrice=gasPrice)
         return transactionHash
 
-    async def get_token_owner(self, network: str, tokenId: int) -> str:
-        contract = self.get_contract(network=network)
-        ownerIdResponse = await self._call_function(contract=contract, methodName=contract.ownerOfMethodName, arguments={'tokenId': int(tokenId)})
-        ownerId = Web3.to_checksum_address(ownerIdResponse[0].strip())
-        return ownerId
+    @staticmethod
+    def _should_check_migrations(contract: Contract) -> bool:
+        return contract.migrationTargetMethodName is not None
 
-    async def should_check_migrations(self, network: str) -> bool:
+    @staticmethod
+    def _get_calls_per_token(contract: Contract) -> int:
+        return 3 if ContractStore._should_check_migrations(contract=contract) and contract.isTokenSetForMigrationMethodName is not None else 2
+
+    async def _get_token_states_chunk(self, contract: Contract, tokenIds: Sequence[int], semaphore: asyncio.Semaphore) -> List[TokenState]:
+        shouldCheckMigrations = self._should_check_migrations(contract=contract)
+        callsPerToken = self._get_calls_per_token(contract=contract)
+        # NOTE(krishan711): a contract with a migration target but no isTokenSetForMigration method can't be checked, so
+        # every token reports the error (as the per-token check used to)
+        migrationErrorMessage = 'Contract does not have a isTokenSetForMigrationMethodName' if shouldCheckMigrations and callsPerToken < 3 else None
+        callRequests = []
+        for tokenId in tokenIds:
+            callRequests.append(_MulticallRequest(methodName=contract.ownerOfMethodName, arguments={'tokenId': int(tokenId)}))
+            callRequests.append(_MulticallRequest(methodName=contract.tokenContentUriMethodName, arguments={'tokenId': int(tokenId)}))
+            if callsPerToken == 3:
+                callRequests.append(_MulticallRequest(methodName=contract.isTokenSetForMigrationMethodName, arguments={'tokenId': int(tokenId)}))
+        async with semaphore:
+            results = await self._call_function_batch(contract=contract, callRequests=callRequests)
+        tokenStates = []
+        for index, tokenId in enumerate(tokenIds):
+            ownerResult = results[index * callsPerToken]
+            contentUrlResult = results[index * callsPerToken + 1]
+            migrationResult = results[index * callsPerToken + 2] if callsPerToken == 3 else None
+            tokenStates.append(TokenState(
+                tokenId=int(tokenId),
+                ownerId=Web3.to_checksum_address(ownerResult.response[0].strip()) if ownerResult.response else None,
+                ownerErrorMessage=ownerResult.errorMessage,
+                contentUrl=contentUrlResult.response[0].strip() if contentUrlResult.response else None,
+                contentUrlErrorMessage=contentUrlResult.errorMessage,
+                isTokenSetForMigration=bool(migrationResult.response[0]) if migrationResult and migrationResult.response else False,
+                isTokenSetForMigrationErrorMessage=migrationResult.errorMessage if migrationResult else migrationErrorMessage,
+            ))
+        return tokenStates
+
+    async def get_token_states(self, network: str, tokenIds: Sequence[int]) -> List[TokenState]:
         contract = self.get_contract(network=network)
-        return contract.migrationTargetMethodName is not None
+        semaphore = asyncio.Semaphore(_MULTICALL_CONCURRENCY)
+        chunkSize = _MULTICALL_BATCH_SIZE // self._get_calls_per_token(contract=contract)
+        tokenStateChunks = await asyncio.gather(*[self._get_token_states_chunk(contract=contract, tokenIds=tokenIdsChunk, semaphore=semaphore) for tokenIdsChunk in list_util.generate_chunks(lst=list(tokenIds), chunkSize=chunkSize)])
+        return [tokenState for tokenStateChunk in tokenStateChunks for tokenState in tokenStateChunk]
 
     async def get_migration_target(self, network: str) -> str:
         contract = self.get_contract(network=network)
@@ -95,14 +193,6 @@ class ContractStore:
         migrationTarget = Web3.to_checksum_address(ownerIdResponse[0].strip())
         return migrationTarget
 
-    async def is_token_set_for_migration(self, network: str, tokenId: int) -> bool:
-        contract = self.get_contract(network=network)
-        if not contract.isTokenSetForMigrationMethodName:
-            raise BadRequestException('Contract does not have a isTokenSetForMigrationMethodName')
-        ownerIdResponse = await self._call_function(contract=contract, methodName=contract.isTokenSetForMigrationMethodName, arguments={'tokenId': int(tokenId)})
-        isTokenSetForMigration = bool(ownerIdResponse[0])
-        return isTokenSetForMigration
-
     async def get_total_supply(self, network: str) -> int:
         contract = self.get_contract(network=network)
         response = await self._call_function(contract=contract, methodName=contract.totalSupplyMethodName)
@@ -180,24 +270,16 @@ class ContractStore:
         events = await contract.ethClient.get_log_entries(address=contract.address, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber, topics=[Web3.keccak(text=contract.transferMethodSignature).hex()])
         return [int.from_bytes(bytes(event['topics'][3]), 'big') for event in events]
 
-    async def get_updated_token_ids_in_blocks(self, network: str, startBlockNumber: int, endBlockNumber: int) -> List[int]:
+    async def get_token_update_block_numbers_in_blocks(self, network: str, startBlockNumber: int, endBlockNumber: int) -> Dict[int, int]:
         contract = self.get_contract(network=network)
         if not contract.updateMethodSignature:
-            return []
+            return {}
         events = await contract.ethClient.get_log_entries(address=contract.address, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber, topics=[Web3.keccak(text=contract.updateMethodSignature).hex()])
-        return [int.from_bytes(bytes(event['topics'][1]), 'big') for event in events]
-
-    async def get_latest_update_block_number(self, network: str, tokenId: int) -> List[int]:
-        contract = self.get_contract(network=network)
-        if not contract.updateMethodSignature:
-            return []
-        currentBlockNumber = await contract.ethClient.get_latest_block_number()
-        for blockNumber in reversed(range(contract.startBlockNumber, currentBlockNumber, 10000)):
-            endBlockNumber = blockNumber + 10000
-            events = await contract.ethClient.get_log_entries(address=contract.address, startBlockNumber=blockNumber, endBlockNumber=endBlockNumber, topics=[Web3.keccak(text=contract.updateMethodSignature).hex(), int_to_hex(tokenId)])
-            if len(events) > 0:
-                return events[-1]['blockNumber']
-        return None
+        tokenBlockNumbers: Dict[int, int] = {}
+        for event in events:
+            tokenId = int.from_bytes(bytes(event['topics'][1]), 'big')
+            tokenBlockNumbers[tokenId] = max(tokenBlockNumbers.get(tokenId, 0), int(event['blockNumber']))
+        return tokenBlockNumbers
 
     async def wait_for_transaction(self, network: str, transactionHash: str, sleepTime: int = 15, raiseOnFailure: bool = True) -> TxReceipt:
         transactionReceipt = None
@@ -0,0 +1,217 @@
+import asyncio
+from typing import AsyncIterator
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+
+import asyncpg
+from core import logging
+
+from mdtp.manager import MdtpManager
+from mdtp.model import GridItem
+from mdtp.model import GridItemsDelta
+from mdtp.store.schema import GRID_ITEMS_CHANGE_CHANNEL_NAME
+
+_SUBSCRIPTION_QUEUE_SIZE = 100
+_RECONNECT_DELAY_SECONDS = 5
+# NOTE(krishan711): changes held back by the watermark won't be notified again so they are polled for until they can be read
+_PENDING_CHANGES_POLL_SECONDS = 1
+
+# NOTE(krishan711): called with the changed grid items, or None when the changes for the network are unknown
+GridItemsChangeListener = Callable[[str, Optional[Sequence[GridItem]]], None]
+
+
+class _Subscription:
+
+    def __init__(self, network: str):
+        self.network = network
+        self.queue: asyncio.Queue[GridItemsDelta] = asyncio.Queue(maxsize=_SUBSCRIPTION_QUEUE_SIZE)
+        self.hasOverflowed = False
+
+    def publish(self, gridItemsDelta: GridItemsDelta) -> None:
+        if self.hasOverflowed:
+            return
+        try:
+            self.queue.put_nowait(gridItemsDelta)
+        except asyncio.QueueFull:
+            # NOTE(krishan711): slow consumers catch up from the database rather than holding memory here
+            self.hasOverflowed = True
+
+    def reset(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.hasOverflowed = False
+
+
+class GridItemChangeBroadcaster:
+    # NOTE(krishan711): each api replica holds a single LISTEN connection. Notifications only say which network changed,
+    # the changed grid items are then read once (using the delta cursor) and fanned out to every subscriber.
+
+    def __init__(self, connectionString: str, manager: MdtpManager):
+        # NOTE(krishan711): asyncpg takes a plain postgres dsn, not the sqlalchemy one
+        self.connectionString = connectionString.replace('postgresql+asyncpg://', 'postgresql://')
+        self.manager = manager
+        self._connection: Optional[asyncpg.Connection] = None
+        self._subscriptions: Dict[str, Set[_Subscription]] = {}
+        self._networkCursors: Dict[str, str] = {}
+        self._publishTasks: Dict[str, asyncio.Task] = {}
+        self._pendingNetworks: Set[str] = set()
+        self._reconnectTask: Optional[asyncio.Task] = None
+        self._changeListeners: List[GridItemsChangeListener] = []
+        self._isStopped = True
+
+    def add_change_listener(self, changeListener: GridItemsChangeListener) -> None:
+        # NOTE(krishan711): change listeners receive changes for every network, not just the subscribed ones
+        self._changeListeners.append(changeListener)
+
+    def _notify_change_listeners(self, network: str, gridItems: Optional[Sequence[GridItem]]) -> None:
+        for changeListener in self._changeListeners:
+            try:
+                changeListener(network, gridItems)
+            except Exception:  # pylint: disable=broad-except
+                logging.exception(f'Grid item change listener failed for network {network}')
+
+    async def start(self) -> None:
+        self._isStopped = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._isStopped = True
+        if self._reconnectTask:
+            self._reconnectTask.cancel()
+            self._reconnectTask = None
+        for publishTask in self._publishTasks.values():
+            publishTask.cancel()
+        self._publishTasks = {}
+        if self._connection:
+            await self._connection.close()
+            self._connection = None
+
+    async def _connect(self) -> None:
+        self._connection = await asyncpg.connect(dsn=self.connectionString)
+        self._connection.add_termination_listener(self._on_connection_terminated)
+        await self._connection.add_listener(GRID_ITEMS_CHANGE_CHANNEL_NAME, self._on_notification)
+        # NOTE(krishan711): anything written while disconnected was missed so re-check every tracked network
+        for network in list(self._networkCursors.keys()):
+            self._schedule_publish(network=network)
+
+    def _on_connection_terminated(self, connection: asyncpg.Connection) -> None:  # pylint: disable=unused-argument
+        self._connection = None
+        if not self._isStopped and not self._reconnectTask:
+            self._reconnectTask = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        try:
+            while not self._isStopped:
+                await asyncio.sleep(_RECONNECT_DELAY_SECONDS)
+                try:
+                    await self._connect()
+                    return
+                except (OSError, asyncpg.PostgresError) as exception:
+                    logging.info(f'Failed to reconnect grid item change listener: {exception}')
+        finally:
+            self._reconnectTask = None
+
+    def _on_notification(self, connection: asyncpg.Connection, pid: int, channel: str, payload: str) -> None:  # pylint: disable=unused-argument
+        if payload in self._subscriptions or len(self._changeListeners) > 0:
+            self._schedule_publish(network=payload)
+
+    def _schedule_publish(self, network: str) -> None:
+        publishTask = self._publishTasks.get(network)
+        if publishTask and not publishTask.done():
+            self._pendingNetworks.add(network)
+            return
+        self._publishTasks[network] = asyncio.create_task(self._publish(network=network))
+
+    async def _publish(self, network: str) -> None:
+        try:
+            while True:
+                self._pendingNetworks.discard(network)
+                cursor = self._networkCursors.get(network)
+                if cursor is None:
+                    if len(self._changeListeners) == 0:
+                        return
+                    # NOTE(krishan711): the first change seen for a network can't be diffed so listeners are told everything may have changed
+                    self._networkCursors[network] = await self.manager.get_grid_items_latest_cursor(network=network)
+                    self._notify_change_listeners(network=network, gridItems=None)
+                    cursor = self._networkCursors[network]
+                hasMore = True
+                while hasMore:
+                    gridItemsDelta = await self.manager.list_grid_items_delta(network=network, cursor=cursor)
+                    cursor = gridItemsDelta.cursor
+                    hasMore = gridItemsDelta.hasMore
+                    if network not in self._subscriptions and len(self._changeListeners) == 0:
+                        return
+                    self._networkCursors[network] = cursor
+                    if len(gridItemsDelta.gridItems) > 0:
+                        self._notify_change_listeners(network=network, gridItems=gridItemsDelta.gridItems)
+                        for subscription in self._subscriptions.get(network, set()):
+                            subscription.publish(gridItemsDelta=gridItemsDelta)
+                if gridItemsDelta.hasPendingChanges and network not in self._pendingNetworks:
+                    await asyncio.sleep(_PENDING_CHANGES_POLL_SECONDS)
+                    continue
+                if network not in self._pendingNetworks:
+                    return
+        except Exception:  # pylint: disable=broad-except
+            logging.exception(f'Failed to publish grid item changes for network {network}')
+
+    async def _subscribe(self, network: str) -> _Subscription:
+        if network not in self._networkCursors:
+            self._networkCursors[network] = await self.manager.get_grid_items_latest_cursor(network=network)
+        subscription = _Subscription(network=network)
+        self._subscriptions.setdefault(network, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: _Subscription) -> None:
+        networkSubscriptions = self._subscriptions.get(subscription.network, set())
+        networkSubscriptions.discard(subscription)
+        if len(networkSubscriptions) == 0:
+            self._subscriptions.pop(subscription.network, None)
+            if len(self._changeListeners) == 0:
+                self._networkCursors.pop(subscription.network, None)
+
+    async def _catch_up(self, network: str, cursor: str) -> AsyncIterator[GridItemsDelta]:
+        hasMore = True
+        while hasMore:
+            gridItemsDelta = await self.manager.list_grid_items_delta(network=network, cursor=cursor)
+            cursor = gridItemsDelta.cursor
+            hasMore = gridItemsDelta.hasMore
+            yield gridItemsDelta
+
+    async def stream_grid_items_deltas(self, network: str, cursor: Optional[str] = None, keepAliveSeconds: float = 15) -> AsyncIterator[Optional[GridItemsDelta]]:
+        # NOTE(krishan711): yields None every keepAliveSeconds without changes so callers can send a keep-alive.
+        # Subscribing happens before catching up so nothing written in between is missed, anything seen twice is skipped by
+        # comparing positions in (update_transaction_id, update_sequence) order.
+        subscription = await self._subscribe(network=network)
+        try:
+            if cursor is None:
+                cursor = await self.manager.get_grid_items_latest_cursor(network=network)
+            latestPosition = self.manager.decode_grid_items_cursor(cursor=cursor)
+            async for gridItemsDelta in self._catch_up(network=network, cursor=cursor):
+                latestPosition = self.manager.decode_grid_items_cursor(cursor=gridItemsDelta.cursor)
+                if len(gridItemsDelta.gridItems) > 0:
+                    yield gridItemsDelta
+            while True:
+                if subscription.hasOverflowed:
+                    subscription.reset()
+                    async for gridItemsDelta in self._catch_up(network=network, cursor=self.manager.encode_grid_items_cursor(updateTransactionId=latestPosition[0], updateSequence=latestPosition[1])):
+                        latestPosition = self.manager.decode_grid_items_cursor(cursor=gridItemsDelta.cursor)
+                        if len(gridItemsDelta.gridItems) > 0:
+                            yield gridItemsDelta
+                try:
+                    gridItemsDelta = await asyncio.wait_for(subscription.queue.get(), timeout=keepAliveSeconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                deltaPosition = self.manager.decode_grid_items_cursor(cursor=gridItemsDelta.cursor)
+                if deltaPosition <= latestPosition:
+                    continue
+                gridItems = [gridItem for gridItem in gridItemsDelta.gridItems if (gridItem.updateTransactionId, gridItem.updateSequence) > latestPosition]
+                latestPosition = deltaPosition
+                if len(gridItems) > 0:
+                    yield GridItemsDelta(gridItems=gridItems, cursor=gridItemsDelta.cursor, hasMore=False, hasPendingChanges=gridItemsDelta.hasPendingChanges)
+        finally:
+            self._unsubscribe(subscription=subscription)
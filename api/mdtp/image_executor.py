@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import Executor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Callable
+from typing import Optional
+from typing import TypeVar
+
+ResultType = TypeVar('ResultType')
+
+
+class ImageExecutor:
+    # NOTE(krishan711): PIL work holds the GIL for long stretches so it runs in a process pool to keep the event loop
+    # (and so network io and queue visibility extensions) responsive. Functions passed to run must be module-level
+    # and take and return plain values (e.g. bytes) so they can be pickled.
+
+    def __init__(self, maxWorkers: Optional[int] = None, shouldUseProcesses: bool = True):
+        self.maxWorkers = maxWorkers or os.cpu_count() or 1
+        # NOTE(krishan711): workers are started from a clean forkserver process rather than forked from this one so they
+        # don't inherit the event loop, open connections or locks held by other threads at fork time
+        self._executor: Executor = ProcessPoolExecutor(max_workers=self.maxWorkers, mp_context=multiprocessing.get_context('forkserver')) if shouldUseProcesses else ThreadPoolExecutor(max_workers=self.maxWorkers)
+        # NOTE(krishan711): work on in-process state (e.g. memory-mapped canvases) can't be sent to another process so runs on threads
+        self._threadExecutor = ThreadPoolExecutor(max_workers=self.maxWorkers)
+
+    async def run(self, function: Callable[..., ResultType], *args: Any, **kwargs: Any) -> ResultType:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+
+    async def run_in_thread(self, function: Callable[..., ResultType], *args: Any, **kwargs: Any) -> ResultType:
+        return await asyncio.get_running_loop().run_in_executor(self._threadExecutor, functools.partial(function, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+        self._threadExecutor.shutdown(wait=True)
@@ -1,22 +1,36 @@
+import asyncio
+import dataclasses
+import hashlib
 import imghdr
-import os
+import math
 import uuid
 from io import BytesIO
+from typing import Dict
 from typing import List
 from typing import Optional
 
+from core import logging
 from core.exceptions import InternalServerErrorException
 from core.exceptions import KibaException
+from core.exceptions import NotFoundException
 from core.requester import Requester
 from core.s3_manager import S3Manager
 from core.util import file_util
+from core.util import list_util
 from PIL import Image as PILImage
 
+from mdtp import image_util
+from mdtp.image_executor import ImageExecutor
 from mdtp.ipfs_manager import IpfsManager
+from mdtp.ipfs_resolver import IpfsResolver
+from mdtp.lru_cache import LruCache
+from mdtp.model import Image
 from mdtp.model import ImageData
 from mdtp.model import ImageFormat
 from mdtp.model import ImageSize
 from mdtp.model import ImageVariant
+from mdtp.store.retriever import Retriever
+from mdtp.store.saver import Saver
 
 _BUCKET = 's3://mdtp-images/pablo'
 _BASE_URL = 'https://d2a7i2107hou45.cloudfront.net/pablo'
@@ -25,16 +39,29 @@ _CACHE_CONTROL_FINAL_FILE = 'public,max-age=31536000'
 
 _TARGET_SIZES = [10, 20, 50, 100, 200, 500, 1000]
 
+_IMAGE_CACHE_SIZE = 20000
+
+_VARIANT_UPLOAD_CONCURRENCY = 8
+_VARIANT_UPLOAD_ATTEMPT_COUNT = 3
+_VARIANT_UPLOAD_RETRY_DELAY_SECONDS = 0.5
+
 
 class UnknownImageType(InternalServerErrorException):
     pass
 
 class ImageManager:
 
-    def __init__(self, requester: Requester, s3Manager: S3Manager, ipfsManager: IpfsManager):
+    def __init__(self, requester: Requester, s3Manager: S3Manager, ipfsManager: IpfsManager, ipfsResolver: IpfsResolver, retriever: Retriever, saver: Saver, imageExecutor: ImageExecutor, variantUploadConcurrency: int = _VARIANT_UPLOAD_CONCURRENCY):
         self.requester = requester
         self.s3Manager = s3Manager
         self.ipfsManager = ipfsManager
+        self.ipfsResolver = ipfsResolver
+        self.retriever = retriever
+        self.saver = saver
+        self.imageExecutor = imageExecutor
+        self.variantUploadConcurrency = variantUploadConcurrency
+        # NOTE(krishan711): images are immutable so cached rows never need invalidating
+        self.imageCache: LruCache[Image] = LruCache(maxSize=_IMAGE_CACHE_SIZE)
 
     @staticmethod
     def _get_image_type_from_file(fileName: str) -> str:
@@ -51,95 +78,104 @@ class ImageManager:
         return f'image/{imageType}'
 
     async def upload_image_from_url(self, url: str) -> str:
-        if url.startswith('ipfs://'):
-            url = url.replace('ipfs://', 'https://pablo-images.kibalabs.com/v1/ipfs/')
         localFilePath = f'./download-{str(uuid.uuid4())}'
-        await self.requester.get(url=url, outputFilePath=localFilePath, timeout=300)
+        await self.ipfsResolver.get(url=url, outputFilePath=localFilePath, timeout=300)
         imageId = await self.upload_image_from_file(filePath=localFilePath)
         await file_util.remove_file(filePath=localFilePath)
         return imageId
 
     async def upload_image_from_file(self, filePath: str, shouldResize: bool = True) -> str:
-        imageId = str(uuid.uuid4()).replace('-', '')
         # TODO(krishan711): save with extensions once implemented in pablo
         # mimetype = self._get_image_type_from_file(fileName=localFilePath)
         # extension = mimetypes.guess_extension(type=mimetype)
+        image = await self._load_image_from_file(filePath=filePath)
+        # NOTE(krishan711): only resized uploads are recorded by content hash so a match always has every variant
+        contentHash = hashlib.sha256(image.content).hexdigest() if shouldResize else None
+        if contentHash:
+            try:
+                existingImage = await self.retriever.get_image_by_content_hash(contentHash=contentHash)
+            except NotFoundException:
+                existingImage = None
+            if existingImage:
+                logging.info(f'Reusing image {existingImage.imageId} with the same content')
+                self.imageCache.set(existingImage.imageId, existingImage)
+                return existingImage.imageId
+        imageId = str(uuid.uuid4()).replace('-', '')
         await self.s3Manager.upload_file(filePath=filePath, targetPath=f'{_BUCKET}/{imageId}/original', accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE)
-        if shouldResize:
-            await self.resize_image(imageId=imageId)
+        variantIds = await self._upload_image_variants(imageId=imageId, image=image) if shouldResize else []
+        await self.saver.create_image(imageId=imageId, imageFormat=image.imageFormat, width=image.size.width, height=image.size.height, variantIds=variantIds, contentHash=contentHash)
         return imageId
 
-    async def crop_image(self, imageId: str, outputDirectory: str, width: int, height: int) -> List[str]:
-        await file_util.create_directory(directory=outputDirectory)
-        # NOTE(krishan711): this can be done in parallel
+    async def crop_image(self, imageId: str, width: int, height: int) -> List[ImageData]:
+        # NOTE(krishan711): returns the crops in row-major order. The image is decoded and sliced once, then the tiles are
+        # encoded in parallel in chunks (one per executor worker).
         image = await self._load_image(imageId=imageId)
-        targetSize = ImageSize(int(image.size.width / width), int(image.size.height / height))
         if image.imageFormat not in {ImageFormat.JPG, ImageFormat.PNG, ImageFormat.WEBP}:
             raise InternalServerErrorException(f'Unable to crop image of type {image.imageFormat}')
-        contentBuffer = BytesIO(image.content)
-        fileNames = []
-        with PILImage.open(fp=contentBuffer) as pilImage:
-            for row in range(0, height):
-                for column in range(0, width):
-                    index = (row * width) + column
-                    fileName = f'{index}'
-                    box = (column * targetSize.width, row * targetSize.height, (column + 1) * targetSize.width, (row + 1) * targetSize.height)
-                    croppedPilImage = pilImage.crop(box)
-                    content = BytesIO()
-                    croppedPilImage.save(fp=content, format=image.imageFormat.replace('image/', ''))
-                    croppedImage = ImageData(content=content.getvalue(), size=targetSize, imageFormat=image.imageFormat)
-                    await self._save_image_to_file(image=croppedImage, fileName=os.path.join(outputDirectory, fileName))
-                    fileNames.append(fileName)
-        return fileNames
-
-    async def resize_image(self, imageId: str):
-        image = await self._load_image(imageId=imageId)
+        imageTiles = await self.imageExecutor.run(image_util.slice_image_tiles, image.content, image.imageFormat, width, height)
+        chunkSize = max(math.ceil(len(imageTiles.tileContents) / self.imageExecutor.maxWorkers), 1)
+        imageTileChunks = [dataclasses.replace(imageTiles, tileContents=list(tileContents)) for tileContents in list_util.generate_chunks(lst=imageTiles.tileContents, chunkSize=chunkSize)]
+        encodedTileChunks = await asyncio.gather(*[self.imageExecutor.run(image_util.encode_image_tiles, imageTileChunk, image.imageFormat) for imageTileChunk in imageTileChunks])
+        tileSize = ImageSize(width=imageTiles.tileSize[0], height=imageTiles.tileSize[1])
+        return [ImageData(content=croppedContent, size=tileSize, imageFormat=image.imageFormat) for encodedTileChunk in encodedTileChunks for croppedContent in encodedTileChunk]
+
+    @staticmethod
+    def _get_variant_sizes(size: ImageSize) -> Dict[str, ImageSize]:
+        variantSizes: Dict[str, ImageSize] = {}
         for targetSize in _TARGET_SIZES:
-            if image.size.width >= targetSize:
-                resizedImage = await self._resize_image(image=image, size=ImageSize(width=targetSize, height=targetSize * (image.size.height / image.size.width)))
-                resizedFilename = f'./resize-{str(uuid.uuid4())}'
-                await self._save_image_to_file(image=resizedImage, fileName=resizedFilename)
-                await self.s3Manager.upload_file(filePath=resizedFilename, targetPath=f'{_BUCKET}/{imageId}/widths/{targetSize}', accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE)
-                await file_util.remove_file(filePath=resizedFilename)
-            if image.size.height >= targetSize:
-                resizedImage = await self._resize_image(image=image, size=ImageSize(width=targetSize * (image.size.width / image.size.height), height=targetSize))
-                resizedFilename = f'./resize-{str(uuid.uuid4())}'
-                await self._save_image_to_file(image=resizedImage, fileName=resizedFilename)
-                await self.s3Manager.upload_file(filePath=resizedFilename, targetPath=f'{_BUCKET}/{imageId}/heights/{targetSize}', accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE)
-                await file_util.remove_file(filePath=resizedFilename)
-
-    async def _save_image_to_file(self, image: ImageData, fileName: str) -> None:
-        if image.imageFormat == ImageFormat.JPG:
-            contentBuffer = BytesIO(image.content)
-            with PILImage.open(fp=contentBuffer) as pilImage, open(fileName, 'wb') as imageFile:
-                try:
-                    pilImage.save(fp=imageFile, format=image.imageFormat.replace('image/', ''), subsampling=0, quality=90, optimize=True)
-                except OSError as exception:
-                    raise KibaException(message=f'Exception occurred when saving image {image.imageId}: {str(exception)}') from exception
-            return
-        if image.imageFormat in {ImageFormat.PNG, ImageFormat.WEBP}:
-            contentBuffer = BytesIO(image.content)
-            with PILImage.open(fp=contentBuffer) as pilImage, open(fileName, 'wb') as imageFile:
+            if size.width >= targetSize:
+                variantSizes[f'widths/{targetSize}'] = ImageSize(width=targetSize, height=targetSize * (size.height / size.width))
+            if size.height >= targetSize:
+                variantSizes[f'heights/{targetSize}'] = ImageSize(width=targetSize * (size.width / size.height), height=targetSize)
+        return variantSizes
+
+    async def resize_image(self, imageId: str) -> List[str]:
+        image = await self._load_image(imageId=imageId)
+        return await self._upload_image_variants(imageId=imageId, image=image)
+
+    async def _upload_image_variants(self, imageId: str, image: ImageData) -> List[str]:
+        if image.imageFormat not in {ImageFormat.JPG, ImageFormat.PNG, ImageFormat.WEBP}:
+            raise KibaException(message=f'Cannot resize image format: {image.imageFormat}')
+        variantSizes = {variantId: (variantSize.width, variantSize.height) for variantId, variantSize in self._get_variant_sizes(size=image.size).items()}
+        variantContents = await self.imageExecutor.run(image_util.resize_image_variants, image.content, image.imageFormat, variantSizes)
+        semaphore = asyncio.Semaphore(self.variantUploadConcurrency)
+        await asyncio.gather(*[self._upload_image_variant(imageId=imageId, variantId=variantId, content=variantContent, imageFormat=image.imageFormat, semaphore=semaphore) for variantId, variantContent in variantContents.items()])
+        return list(variantContents.keys())
+
+    async def _upload_image_variant(self, imageId: str, variantId: str, content: bytes, imageFormat: str, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            for attempt in range(_VARIANT_UPLOAD_ATTEMPT_COUNT):
                 try:
-                    pilImage.save(fp=imageFile, format=image.imageFormat.replace('image/', ''), optimize=True)
-                except OSError as exception:
-                    raise KibaException(message=f'Exception occurred when saving image {image.imageId}: {str(exception)}') from exception
-            return
-        raise KibaException(message=f'Cannot save image format to file: {image.imageFormat}')
-
-    async def _resize_image(self, image: ImageData, size: ImageSize) -> ImageData:
-        if image.imageFormat in {ImageFormat.JPG, ImageFormat.PNG, ImageFormat.WEBP}:
-            contentBuffer = BytesIO(image.content)
-            with PILImage.open(fp=contentBuffer) as pilImage:
-                newPilImage = pilImage.resize(size=(size.width, size.height))
-                content = BytesIO()
-                newPilImage.save(fp=content, format=image.imageFormat.replace('image/', ''))
-                return ImageData(content=content.getvalue(), size=size, imageFormat=image.imageFormat)
-        raise KibaException(message=f'Cannot determine image size from image format: {image.imageFormat}')
+                    await self.s3Manager.write_file(content=content, targetPath=f'{_BUCKET}/{imageId}/{variantId}', accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE, contentType=imageFormat)
+                    return
+                except Exception as exception:  # pylint: disable=broad-except
+                    if attempt == _VARIANT_UPLOAD_ATTEMPT_COUNT - 1:
+                        raise
+                    logging.info(f'Retrying upload of variant {variantId} for image {imageId} after error: {exception}')
+                    await asyncio.sleep(_VARIANT_UPLOAD_RETRY_DELAY_SECONDS * (2 ** attempt))
+
+    async def get_image(self, imageId: str) -> Image:
+        image = self.imageCache.get(imageId)
+        if image is None:
+            image = await self._retrieve_image(imageId=imageId)
+            self.imageCache.set(imageId, image)
+        return image
+
+    async def _retrieve_image(self, imageId: str) -> Image:
+        try:
+            return await self.retriever.get_image(imageId=imageId)
+        except NotFoundException:
+            pass
+        # NOTE(krishan711): images uploaded before tbl_images existed are read from the cdn once and then recorded.
+        # They were always uploaded with every variant that fits.
+        imageData = await self._load_image(imageId=imageId)
+        variantIds = list(self._get_variant_sizes(size=imageData.size).keys())
+        # NOTE(krishan711): the content hash isn't recorded as the same content may already be stored under another image
+        return await self.saver.create_image(imageId=imageId, imageFormat=imageData.imageFormat, width=imageData.size.width, height=imageData.size.height, variantIds=variantIds, contentHash=None)
 
     async def get_image_url(self, imageId: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
-        image = await self._load_image(imageId=imageId)
-        imageVariants = await self._load_image_variants(imageId=imageId, image=image)
+        image = await self.get_image(imageId=imageId)
+        imageVariants = self._get_image_variants(image=image)
         if width is not None or height is not None:
             targetWidth = width or 0
             targetHeight = height or 0
@@ -162,7 +198,7 @@ class ImageManager:
         return self._load_image_from_content(content=response.content)
 
     async def _load_image_from_file(self, filePath: str) -> ImageData:
-        content = await file_util.read_file(filePath=filePath)
+        content = await file_util.read_file_bytes(filePath=filePath)
         return self._load_image_from_content(content=content)
 
     def _load_image_from_content(self, content: str) -> ImageData:
@@ -171,15 +207,9 @@ class ImageManager:
         image = ImageData(content=content, size=size, imageFormat=imageFormat)
         return image
 
-    # NOTE(krishan711): this needs the image because it uses the size. It can use imageId once its in a db
-    @staticmethod
-    async def _load_image_variants(imageId: str, image: ImageData) -> List[ImageVariant]:
-        variants: List[ImageVariant] = []
-        for targetSize in _TARGET_SIZES:
-            if image.size.width >= targetSize:
-                variants.append(ImageVariant(imageId=imageId, variantId=f'widths/{targetSize}', size=ImageSize(width=targetSize, height=targetSize * (image.size.height / image.size.width)), imageFormat=image.imageFormat))
-            if image.size.height >= targetSize:
-                variants.append(ImageVariant(imageId=imageId, variantId=f'heights/{targetSize}', size=ImageSize(height=targetSize, width=targetSize * (image.size.width / image.size.height)), imageFormat=image.imageFormat))
-        variants.append(ImageVariant(imageId=imageId, variantId='original', size=image.size, imageFormat=image.imageFormat))
+    def _get_image_variants(self, image: Image) -> List[ImageVariant]:
+        variantSizes = self._get_variant_sizes(size=image.size)
+        variants = [ImageVariant(imageId=image.imageId, variantId=variantId, size=variantSizes[variantId], imageFormat=image.imageFormat) for variantId in image.variantIds if variantId in variantSizes]
+        variants.append(ImageVariant(imageId=image.imageId, variantId='original', size=image.size, imageFormat=image.imageFormat))
         variants = sorted(variants, key=lambda variant: variant.size.width * variant.size.height)
         return variants
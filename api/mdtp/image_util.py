@@ -0,0 +1,111 @@
+import dataclasses
+from io import BytesIO
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from PIL import Image as PILImage
+
+
+def resize_image_content(content: bytes, width: int, height: int) -> Tuple[str, bytes]:
+    # NOTE(krishan711): this returns raw bytes (rather than a PIL image) so it can be run in an executor
+    with PILImage.open(fp=BytesIO(content)) as pilImage:
+        resizedPilImage = pilImage.resize(size=(width, height))
+    if resizedPilImage.mode != 'RGBA':
+        resizedPilImage = resizedPilImage.convert('RGB')
+    return resizedPilImage.mode, resizedPilImage.tobytes()
+
+
+_REDUCIBLE_MODES = {'L', 'LA', 'RGB', 'RGBA'}
+
+
+def _encode_image(pilImage: PILImage.Image, imageFormat: str) -> bytes:
+    content = BytesIO()
+    if imageFormat == 'image/jpeg':
+        pilImage.save(fp=content, format='jpeg', subsampling=0, quality=90, optimize=True)
+    else:
+        pilImage.save(fp=content, format=imageFormat.replace('image/', ''), optimize=True)
+    return content.getvalue()
+
+
+def resize_image_variants(content: bytes, imageFormat: str, variantSizes: Dict[str, Tuple[int, int]]) -> Dict[str, bytes]:
+    # NOTE(krishan711): the original is decoded once and each variant is made from the smallest already-made image that
+    # covers it (largest first), using reduce for the integer part of the scaling so only the remainder needs resampling
+    with PILImage.open(fp=BytesIO(content)) as pilImage:
+        pilImage.load()
+        sourceImage = pilImage
+        if sourceImage.mode not in _REDUCIBLE_MODES:
+            sourceImage = sourceImage.convert('RGB' if imageFormat == 'image/jpeg' else 'RGBA')
+        sourceImages = [sourceImage]
+        variantContents: Dict[str, bytes] = {}
+        for variantId, (width, height) in sorted(variantSizes.items(), key=lambda item: item[1][0] * item[1][1], reverse=True):
+            coveringImages = [image for image in sourceImages if image.size[0] >= width and image.size[1] >= height]
+            variantImage = min(coveringImages, key=lambda image: image.size[0] * image.size[1]) if coveringImages else sourceImage
+            reduceFactor = min(variantImage.size[0] // max(width, 1), variantImage.size[1] // max(height, 1))
+            if reduceFactor >= 2:
+                variantImage = variantImage.reduce(reduceFactor)
+            if variantImage.size != (width, height):
+                variantImage = variantImage.resize(size=(width, height))
+            sourceImages.append(variantImage)
+            variantContents[variantId] = _encode_image(pilImage=variantImage, imageFormat=imageFormat)
+    return {variantId: variantContents[variantId] for variantId in variantSizes}
+
+
+def decode_image_rgb(content: bytes, width: int, height: int) -> bytes:
+    with PILImage.open(fp=BytesIO(content)) as pilImage:
+        return pilImage.convert('RGB').resize(size=(width, height)).tobytes()
+
+
+@dataclasses.dataclass
+class ImageTiles:
+    # NOTE(krishan711): raw tile pixels (in row-major order) that can be sent to other processes to be encoded.
+    # Palette images keep their palette (and transparency) separately as it doesn't survive tobytes.
+    mode: str
+    tileSize: Tuple[int, int]
+    tileContents: List[bytes]
+    palette: Optional[List[int]]
+    transparency: Optional[Any]
+
+
+def slice_image_tiles(content: bytes, imageFormat: str, width: int, height: int) -> ImageTiles:
+    with PILImage.open(fp=BytesIO(content)) as pilImage:
+        pilImage.load()
+        sourceImage = pilImage
+        if sourceImage.mode not in _REDUCIBLE_MODES and sourceImage.mode != 'P':
+            sourceImage = sourceImage.convert('RGB' if imageFormat == 'image/jpeg' else 'RGBA')
+        cropWidth = int(sourceImage.size[0] / width)
+        cropHeight = int(sourceImage.size[1] / height)
+        tileContents = []
+        for row in range(0, height):
+            for column in range(0, width):
+                tileImage = sourceImage.crop((column * cropWidth, row * cropHeight, (column + 1) * cropWidth, (row + 1) * cropHeight))
+                tileContents.append(tileImage.tobytes())
+        palette = sourceImage.getpalette() if sourceImage.mode == 'P' else None
+        transparency = sourceImage.info.get('transparency') if sourceImage.mode == 'P' else None
+    return ImageTiles(mode=sourceImage.mode, tileSize=(cropWidth, cropHeight), tileContents=tileContents, palette=palette, transparency=transparency)
+
+
+def encode_image_tiles(imageTiles: ImageTiles, imageFormat: str) -> List[bytes]:
+    encodedContents = []
+    for tileContent in imageTiles.tileContents:
+        tileImage = PILImage.frombytes(mode=imageTiles.mode, size=imageTiles.tileSize, data=tileContent)
+        if imageTiles.palette is not None:
+            tileImage.putpalette(imageTiles.palette)
+        if imageTiles.transparency is not None:
+            tileImage.info['transparency'] = imageTiles.transparency
+        encodedContents.append(_encode_image(pilImage=tileImage, imageFormat=imageFormat))
+    return encodedContents
+
+
+def compose_grid_image(width: int, height: int, tokenWidth: int, tokenHeight: int, tokenContents: List[Tuple[bytes, int, int]]) -> bytes:
+    # NOTE(krishan711): tokenContents are (content, xPosition, yPosition) with positions in tokens, the output is a png
+    outputImage = PILImage.new('RGB', (width, height))
+    for content, xPosition, yPosition in tokenContents:
+        with PILImage.open(fp=BytesIO(content)) as tokenImage:
+            image = tokenImage.resize(size=(tokenWidth, tokenHeight))
+        outputImage.paste(image, (xPosition * tokenWidth, yPosition * tokenHeight), mask=image if image.mode == 'RGBA' else None)
+    outputContent = BytesIO()
+    outputImage.save(fp=outputContent, format='png')
+    return outputContent.getvalue()
@@ -1,10 +1,34 @@
+import base64
+import dataclasses
 import json
+import urllib.parse as urlparse
+import uuid
+from typing import AsyncIterator
 from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
 
+from core import logging
 from core.exceptions import InternalServerErrorException
 from core.requester import FileContent
 from core.requester import Requester
 
+_UPLOAD_BATCH_FILE_COUNT = 500
+_UPLOAD_BATCH_BYTE_COUNT = 50 * 1024 * 1024
+_UPLOAD_CHUNK_SIZE = 256 * 1024
+# NOTE(krishan711): httpx applies this to each connect / read / write rather than the whole request so streamed
+# uploads of any size don't time out as long as they keep moving
+_UPLOAD_TIMEOUT_SECONDS = 60
+# NOTE(krishan711): the unixfs protobuf for a plain directory (field 1, Type, set to 1, Directory) as unpadded base64
+_UNIXFS_DIRECTORY_DATA = base64.b64encode(bytes([0x08, 0x01])).decode().rstrip('=')
+
+
+@dataclasses.dataclass
+class _IpfsLink:
+    cid: str
+    size: int
+
 
 class IpfsManager:
 
@@ -29,3 +53,64 @@ class IpfsManager:
 
     async def pin_cid(self, cid: str) -> None:
         await self.infuraRequester.post(url=f'https://ipfs.infura.io:5001/api/v0/pin/add?arg={cid}&recursive=true', timeout=600)
+
+    @staticmethod
+    async def _generate_multipart_body(boundary: str, fileContents: Sequence[Tuple[str, bytes]]) -> AsyncIterator[bytes]:
+        for fileName, content in fileContents:
+            yield f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{urlparse.quote(fileName)}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode()
+            for index in range(0, len(content), _UPLOAD_CHUNK_SIZE):
+                yield content[index: index + _UPLOAD_CHUNK_SIZE]
+            yield b'\r\n'
+        yield f'--{boundary}--\r\n'.encode()
+
+    async def _upload_file_batch_to_ipfs(self, fileContents: Sequence[Tuple[str, bytes]], links: Dict[str, _IpfsLink]) -> None:
+        boundary = uuid.uuid4().hex
+        body = self._generate_multipart_body(boundary=boundary, fileContents=fileContents)
+        # NOTE(krishan711): the requester hands data straight to httpx which streams async iterators (chunked)
+        response = await self.infuraRequester.post(url='https://ipfs.infura.io:5001/api/v0/add?pin=true&progress=true', data=body, headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}, timeout=_UPLOAD_TIMEOUT_SECONDS)  # type: ignore[arg-type]
+        # NOTE(krishan711): the requester buffers the whole response so the progress lines are only read (and logged as a
+        # total) once the batch has finished rather than as they arrive
+        uploadedByteCounts: Dict[str, int] = {}
+        for outputLine in response.text.strip().split('\n'):
+            if not outputLine:
+                continue
+            output = json.loads(outputLine)
+            if 'Hash' in output:
+                links[output['Name']] = _IpfsLink(cid=output['Hash'], size=int(output['Size']))
+            elif 'Bytes' in output:
+                # NOTE(krishan711): progress lines report the bytes of the named file added so far
+                uploadedByteCounts[output['Name']] = max(uploadedByteCounts.get(output['Name'], 0), int(output['Bytes']))
+        missingFileNames = [fileName for fileName, _ in fileContents if fileName not in links]
+        if len(missingFileNames) > 0:
+            raise InternalServerErrorException(f'Failed to find hashes in IPFS response for {len(missingFileNames)} files, e.g. {missingFileNames[0]}')
+        logging.info(f'Uploaded {len(fileContents)} files ({sum(uploadedByteCounts.values())} bytes) to IPFS, {len(links)} in total')
+
+    async def _put_directory_to_ipfs(self, links: Dict[str, _IpfsLink]) -> str:
+        # NOTE(krishan711): dag-pb links must be sorted by name. This makes a single (non-sharded) directory block so
+        # it's only suitable up to ~10k entries.
+        directoryNode = {
+            'Data': {'/': {'bytes': _UNIXFS_DIRECTORY_DATA}},
+            'Links': [{'Hash': {'/': link.cid}, 'Name': name, 'Tsize': link.size} for name, link in sorted(links.items(), key=lambda item: item[0].encode())],
+        }
+        response = await self.infuraRequester.post_form(url='https://ipfs.infura.io:5001/api/v0/dag/put?store-codec=dag-pb&input-codec=dag-json&pin=true', formDataDict={'file': json.dumps(directoryNode).encode()}, timeout=_UPLOAD_TIMEOUT_SECONDS)
+        responseDict = json.loads(response.text)
+        return responseDict['Cid']['/']
+
+    async def upload_file_stream_to_ipfs(self, fileContents: AsyncIterator[Tuple[str, bytes]], batchFileCount: int = _UPLOAD_BATCH_FILE_COUNT, batchByteCount: int = _UPLOAD_BATCH_BYTE_COUNT) -> str:
+        # NOTE(krishan711): files are uploaded (and pinned) in bounded batches with streamed bodies so only one batch is
+        # held in memory, then a single directory linking every file is put on top. Returns the directory cid.
+        links: Dict[str, _IpfsLink] = {}
+        batch: List[Tuple[str, bytes]] = []
+        batchByteSize = 0
+        async for fileName, content in fileContents:
+            if len(batch) > 0 and (len(batch) >= batchFileCount or batchByteSize + len(content) > batchByteCount):
+                await self._upload_file_batch_to_ipfs(fileContents=batch, links=links)
+                batch = []
+                batchByteSize = 0
+            batch.append((fileName, content))
+            batchByteSize += len(content)
+        if len(batch) > 0:
+            await self._upload_file_batch_to_ipfs(fileContents=batch, links=links)
+        if len(links) == 0:
+            raise InternalServerErrorException('No files provided to upload to IPFS')
+        return await self._put_directory_to_ipfs(links=links)
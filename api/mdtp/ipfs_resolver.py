@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import dataclasses
+import os
+import time
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+import httpx
+from core import logging
+from core.exceptions import KibaException
+from core.requester import KibaResponse
+from core.requester import Requester
+from core.util import file_util
+
+_LATENCY_SAMPLE_COUNT = 100
+_OUTCOME_SAMPLE_COUNT = 100
+_MIN_HEDGE_LATENCY_SAMPLE_COUNT = 20
+_HEDGE_LATENCY_PERCENTILE = 0.95
+_DEFAULT_HEDGE_DELAY_SECONDS = 2.0
+_MIN_HEDGE_DELAY_SECONDS = 0.25
+_MAX_HEDGE_DELAY_SECONDS = 10.0
+_MAX_CONCURRENT_ATTEMPTS = 2
+_CIRCUIT_FAILURE_THRESHOLD = 5
+_CIRCUIT_OPEN_SECONDS = 30
+
+
+@dataclasses.dataclass
+class IpfsGateway:
+    # NOTE(krishan711): urlPrefix is prepended to the cid path, e.g. https://ipfs.io/ipfs/
+    urlPrefix: str
+    weight: float = 1.0
+
+
+DEFAULT_IPFS_GATEWAYS = [
+    IpfsGateway(urlPrefix='https://pablo-images.kibalabs.com/v1/ipfs/', weight=4.0),
+    IpfsGateway(urlPrefix='https://ipfs.io/ipfs/', weight=1.0),
+    IpfsGateway(urlPrefix='https://dweb.link/ipfs/', weight=1.0),
+]
+
+
+class _GatewayState:
+
+    def __init__(self, gateway: IpfsGateway):
+        self.gateway = gateway
+        self.latencies: Deque[float] = collections.deque(maxlen=_LATENCY_SAMPLE_COUNT)
+        self.outcomes: Deque[bool] = collections.deque(maxlen=_OUTCOME_SAMPLE_COUNT)
+        self.consecutiveFailureCount = 0
+        self.circuitOpenUntil: Optional[float] = None
+
+    def get_latency_percentile(self, percentile: float) -> Optional[float]:
+        if len(self.latencies) == 0:
+            return None
+        sortedLatencies = sorted(self.latencies)
+        return sortedLatencies[min(int(len(sortedLatencies) * percentile), len(sortedLatencies) - 1)]
+
+    def get_success_rate(self) -> float:
+        if len(self.outcomes) == 0:
+            return 1.0
+        return sum(self.outcomes) / len(self.outcomes)
+
+    def get_score(self) -> float:
+        # NOTE(krishan711): lower is better. Unmeasured gateways are assumed to take the default hedge delay so they get tried.
+        medianLatency = self.get_latency_percentile(percentile=0.5)
+        expectedLatency = medianLatency if medianLatency is not None else _DEFAULT_HEDGE_DELAY_SECONDS
+        return expectedLatency / (self.gateway.weight * max(self.get_success_rate(), 0.1))
+
+    def is_circuit_open(self) -> bool:
+        return self.circuitOpenUntil is not None and time.monotonic() < self.circuitOpenUntil
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutiveFailureCount = 0
+        self.circuitOpenUntil = None
+
+    def record_lost_race(self, latency: float) -> None:
+        # NOTE(krishan711): the real latency is at least this long so recording it lets a slow (but working) gateway drop
+        # in the order rather than keeping its old, fast, samples forever
+        self.latencies.append(latency)
+
+    def record_failure(self) -> None:
+        self.outcomes.append(False)
+        self.consecutiveFailureCount += 1
+        # NOTE(krishan711): once the circuit is half-open (open time has passed) a single failure re-opens it
+        if self.consecutiveFailureCount >= _CIRCUIT_FAILURE_THRESHOLD:
+            if not self.is_circuit_open():
+                logging.info(f'Opening circuit for ipfs gateway {self.gateway.urlPrefix} after {self.consecutiveFailureCount} failures')
+            self.circuitOpenUntil = time.monotonic() + _CIRCUIT_OPEN_SECONDS
+
+
+def _is_gateway_failure(exception: BaseException) -> bool:
+    # NOTE(krishan711): only errors that say the gateway itself is unhealthy count against it. A 4xx means the request
+    # (e.g. the cid) is bad so every other gateway would give the same answer.
+    if isinstance(exception, KibaException):
+        return exception.statusCode >= 500
+    return isinstance(exception, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError, OSError))
+
+
+def _is_client_error(exception: BaseException) -> bool:
+    return isinstance(exception, KibaException) and 400 <= exception.statusCode < 500
+
+
+class IpfsResolver:
+    # NOTE(krishan711): ipfs:// urls are fetched from the best gateway (by latency, success rate and weight). If it hasn't
+    # responded within its p95 latency a hedged request is raced against the next gateway, and failures fall over to the
+    # next gateway immediately (except 4xx responses which are raised straight away). Gateways that keep failing are skipped (circuit open) for a while.
+
+    def __init__(self, requester: Requester, gateways: Optional[Sequence[IpfsGateway]] = None):
+        self.requester = requester
+        self.gatewayStates = [_GatewayState(gateway=gateway) for gateway in (gateways or DEFAULT_IPFS_GATEWAYS)]
+
+    @staticmethod
+    def is_ipfs_url(url: str) -> bool:
+        return url.startswith('ipfs://')
+
+    def _get_ordered_gateway_states(self) -> List[_GatewayState]:
+        closedGatewayStates = [gatewayState for gatewayState in self.gatewayStates if not gatewayState.is_circuit_open()]
+        if len(closedGatewayStates) > 0:
+            return sorted(closedGatewayStates, key=lambda gatewayState: gatewayState.get_score())
+        # NOTE(krishan711): if every circuit is open it's better to try the one closest to closing than to fail outright
+        return sorted(self.gatewayStates, key=lambda gatewayState: gatewayState.circuitOpenUntil or 0)
+
+    @staticmethod
+    def _get_hedge_delay(gatewayState: _GatewayState) -> float:
+        if len(gatewayState.latencies) < _MIN_HEDGE_LATENCY_SAMPLE_COUNT:
+            return _DEFAULT_HEDGE_DELAY_SECONDS
+        hedgeDelay = gatewayState.get_latency_percentile(percentile=_HEDGE_LATENCY_PERCENTILE) or _DEFAULT_HEDGE_DELAY_SECONDS
+        return min(max(hedgeDelay, _MIN_HEDGE_DELAY_SECONDS), _MAX_HEDGE_DELAY_SECONDS)
+
+    async def _get_from_gateway(self, gatewayState: _GatewayState, path: str, timeout: int) -> KibaResponse:
+        startTime = time.monotonic()
+        try:
+            response = await self.requester.get(url=f'{gatewayState.gateway.urlPrefix}{path}', timeout=timeout)
+        except asyncio.CancelledError:
+            # NOTE(krishan711): losing a hedged race isn't a failure but it does say the gateway was slower than another
+            gatewayState.record_lost_race(latency=time.monotonic() - startTime)
+            raise
+        except Exception as exception:  # pylint: disable=broad-except
+            if _is_gateway_failure(exception=exception):
+                gatewayState.record_failure()
+            raise
+        gatewayState.record_success(latency=time.monotonic() - startTime)
+        return response
+
+    async def _get_hedged(self, path: str, timeout: int) -> KibaResponse:
+        remainingGatewayStates = self._get_ordered_gateway_states()
+        pendingTasks: Dict[asyncio.Task, _GatewayState] = {}
+        lastException: Optional[BaseException] = None
+
+        def start_next_attempt() -> None:
+            gatewayState = remainingGatewayStates.pop(0)
+            pendingTasks[asyncio.create_task(self._get_from_gateway(gatewayState=gatewayState, path=path, timeout=timeout))] = gatewayState
+
+        start_next_attempt()
+        try:
+            while len(pendingTasks) > 0:
+                canHedge = len(remainingGatewayStates) > 0 and len(pendingTasks) < _MAX_CONCURRENT_ATTEMPTS
+                hedgeDelay = self._get_hedge_delay(gatewayState=next(iter(pendingTasks.values()))) if canHedge else None
+                doneTasks, _ = await asyncio.wait(pendingTasks.keys(), timeout=hedgeDelay, return_when=asyncio.FIRST_COMPLETED)
+                if len(doneTasks) == 0:
+                    start_next_attempt()
+                    continue
+                for doneTask in doneTasks:
+                    pendingTasks.pop(doneTask)
+                    exception = doneTask.exception()
+                    if exception is None:
+                        return doneTask.result()
+                    if _is_client_error(exception=exception):
+                        raise exception
+                    lastException = exception
+                if len(remainingGatewayStates) > 0:
+                    start_next_attempt()
+        finally:
+            for pendingTask in pendingTasks:
+                pendingTask.cancel()
+        raise lastException or Exception(f'Failed to fetch ipfs path {path}')
+
+    async def get(self, url: str, timeout: int = 300, outputFilePath: Optional[str] = None) -> KibaResponse:
+        if not self.is_ipfs_url(url=url):
+            return await self.requester.get(url=url, timeout=timeout, outputFilePath=outputFilePath)
+        response = await self._get_hedged(path=url[len('ipfs://'):], timeout=timeout)
+        if outputFilePath is not None:
+            if os.path.dirname(outputFilePath):
+                os.makedirs(os.path.dirname(outputFilePath), exist_ok=True)
+            await file_util.write_file_bytes(filePath=outputFilePath, content=response.content)
+        return response
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+from typing import Generic
+from typing import Hashable
+from typing import Optional
+from typing import Tuple
+from typing import TypeVar
+
+ValueType = TypeVar('ValueType')
+
+
+class LruCache(Generic[ValueType]):
+
+    def __init__(self, maxSize: int, ttlSeconds: Optional[float] = None):
+        self.maxSize = maxSize
+        self.ttlSeconds = ttlSeconds
+        self.hitCount = 0
+        self.missCount = 0
+        # NOTE(krishan711): items are stored with their expiry time (None for never)
+        self._items: 'OrderedDict[Hashable, Tuple[Optional[float], ValueType]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Optional[ValueType]:
+        item = self._items.get(key)
+        if item is None:
+            self.missCount += 1
+            return None
+        expiryTime, value = item
+        if expiryTime is not None and time.monotonic() > expiryTime:
+            del self._items[key]
+            self.missCount += 1
+            return None
+        self._items.move_to_end(key)
+        self.hitCount += 1
+        return value
+
+    def set(self, key: Hashable, value: ValueType, ttlSeconds: Optional[float] = None) -> None:
+        # NOTE(krishan711): ttlSeconds overrides the cache's ttl for this item
+        ttlSeconds = ttlSeconds if ttlSeconds is not None else self.ttlSeconds
+        self._items[key] = (time.monotonic() + ttlSeconds if ttlSeconds is not None else None, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxSize:
+            self._items.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
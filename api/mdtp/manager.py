@@ -1,22 +1,29 @@
 import asyncio
+import base64
+import dataclasses
 import datetime
 import json
 import math
 import os
+import time
 import urllib.parse as urlparse
 import uuid
-from io import BytesIO
+from collections import defaultdict
 from typing import Any
+from typing import AsyncIterator
 from typing import Dict
 from typing import List
 from typing import Optional
 from typing import Sequence
+from typing import Set
+from typing import Tuple
 
 from core import logging
 from core.exceptions import BadRequestException
 from core.exceptions import NotFoundException
 from core.queues.message_queue import MessageQueue
 from core.queues.model import Message
+from core.requester import KibaResponse
 from core.requester import Requester
 from core.s3_manager import S3Manager
 from core.s3_manager import S3PresignedUpload
@@ -28,33 +35,50 @@ from core.store.retriever import RandomOrder
 from core.store.retriever import StringFieldFilter
 from core.util import date_util
 from core.util import file_util
+from core.util import list_util
 from eth_account.messages import defunct_hash_message
 from PIL import Image as PILImage
 from web3 import Web3
 from web3.auto import w3
 
+from mdtp import image_util
+from mdtp.base_image_canvas import BaseImageCanvas
 from mdtp.cache_control_header import CacheControlHeader
 from mdtp.chain_util import NON_OWNER_ID
 from mdtp.contract_store import ContractStore
+from mdtp.contract_store import TokenState
+from mdtp.image_executor import ImageExecutor
 from mdtp.image_manager import ImageManager
 from mdtp.ipfs_manager import IpfsManager
+from mdtp.ipfs_resolver import IpfsResolver
+from mdtp.lru_cache import LruCache
 from mdtp.messages import BuildBaseImageMessageContent
 from mdtp.messages import UpdateAllTokensMessageContent
 from mdtp.messages import UpdateGroupImageMessageContent
 from mdtp.messages import UpdateTokenMessageContent
+from mdtp.messages import UpdateTokensBatchMessageContent
 from mdtp.messages import UpdateTokensMessageContent
 from mdtp.messages import UploadTokenImageMessageContent
 from mdtp.model import BaseImage
+from mdtp.model import CacheStats
 from mdtp.model import GridItem
+from mdtp.model import GridItemGroupImage
+from mdtp.model import GridItemsDelta
 from mdtp.model import NetworkStatus
 from mdtp.model import NetworkSummary
+from mdtp.model import OffchainContent
+from mdtp.model import TokenContentUpdate
 from mdtp.model import TokenMetadata
 from mdtp.store.retriever import Retriever
+from mdtp.store.saver import GridItemValues
+from mdtp.store.saver import OffchainContentValues
 from mdtp.store.saver import Saver
 from mdtp.store.schema import BaseImagesTable
 from mdtp.store.schema import GridItemsTable
+from mdtp.store.schema import NetworkResyncsTable
 from mdtp.store.schema import OffchainContentsTable
 from mdtp.store.schema import OffchainPendingContentsTable
+from mdtp.store.schema import TokenContentUpdatesTable
 
 _KILOBYTE = 1024
 _MEGABYTE = _KILOBYTE * 1024
@@ -63,9 +87,82 @@ _CACHE_CONTROL_FINAL_FILE = CacheControlHeader(shouldCachePublically=True, maxAg
 
 _API_URL = 'https://d2a7i2107hou45.cloudfront.net'
 
+_BASE_IMAGE_DOWNLOAD_CONCURRENCY = 20
+_BASE_IMAGE_CANVAS_DIRECTORY = './base-image-canvases'
+_BASE_IMAGE_TILE_SIZE = 256
+_BASE_IMAGE_TILE_UPLOAD_CONCURRENCY = 10
+_BASE_IMAGE_TILES_BUCKET = 's3://mdtp-images/base-image-tiles'
+_BASE_IMAGE_TILES_URL = 'https://mdtp-images.s3.amazonaws.com/base-image-tiles'
+# NOTE(krishan711): tiles are overwritten in place so they can only be cached briefly
+_CACHE_CONTROL_BASE_IMAGE_TILE = CacheControlHeader(shouldCachePublically=True, maxAge=60).to_value_string()
+
+_UPDATE_TOKENS_BATCH_SIZE = 2500
+_UPDATE_TOKENS_CONCURRENCY = 5
+# NOTE(krishan711): different rpc providers phrase "your eth_getLogs query is too big" differently
+_TOO_MANY_LOG_RESULTS_ERROR_MESSAGES = [
+    'query returned more than',
+    'log response size exceeded',
+    'block range is too wide',
+    'block range too large',
+    'exceed maximum block range',
+    'response size should not greater than',
+    'block range limit exceeded',
+]
+# NOTE(krishan711): rate limit errors can also mention limits (e.g. "daily request count limit exceeded") but splitting
+# the range would only multiply the calls to a provider that is already throttling
+_RATE_LIMIT_ERROR_MESSAGES = [
+    'rate limit',
+    'request count limit',
+    'too many requests',
+]
+
+# NOTE(krishan711): SendMessageBatch accepts at most 10 messages
+_WORK_QUEUE_BATCH_SIZE = 10
+_WORK_QUEUE_SEND_CONCURRENCY = 10
+
+_UPDATE_TOKENS_BATCH_MESSAGE_SIZE = 100
+_UPDATE_TOKENS_CONTENT_CONCURRENCY = 10
+
+_UPDATE_ALL_TOKENS_SLICE_SIZE = 1000
+_UPDATE_ALL_TOKENS_CONCURRENCY = 5
+_UPDATE_ALL_TOKENS_STALE_SECONDS = 60 * 15
+
+_TOKEN_GROUP_UPLOAD_CONCURRENCY = 10
+
+_GRID_ITEMS_DELTA_PAGE_SIZE = 1000
+_GRID_ITEMS_CURSOR_VERSION = 'v2'
+
+# NOTE(krishan711): grid item entries are invalidated by change notifications (see on_grid_items_changed), the ttl only
+# bounds staleness if a notification is missed. Group images aren't notified so they rely on a short ttl.
+_REDIRECT_GRID_ITEM_CACHE_SIZE = 20000
+_REDIRECT_GRID_ITEM_CACHE_TTL_SECONDS = 60 * 10
+_REDIRECT_GROUP_IMAGE_CACHE_SIZE = 5000
+_REDIRECT_GROUP_IMAGE_CACHE_TTL_SECONDS = 60
+
+# NOTE(krishan711): ipfs content is addressed by its hash so it's cached forever, http content is cached for its
+# cache-control max-age (or the default when there isn't one) up to the max.
+_JSON_CONTENT_CACHE_SIZE = 10000
+_JSON_CONTENT_DEFAULT_TTL_SECONDS = 60 * 5
+_JSON_CONTENT_MAX_TTL_SECONDS = 60 * 60 * 24
+
+
+@dataclasses.dataclass
+class _TokenContent:
+    tokenId: int
+    ownerId: str
+    contentUrl: str
+    title: str
+    description: Optional[str]
+    imageUrl: str
+    url: Optional[str]
+    groupId: Optional[str]
+    blockNumber: int
+    source: str
+
+
 class MdtpManager:
 
-    def __init__(self, requester: Requester, retriever: Retriever, saver: Saver, s3Manager: S3Manager, contractStore: ContractStore, workQueue: MessageQueue[Message], imageManager: ImageManager, ipfsManager: IpfsManager):
+    def __init__(self, requester: Requester, retriever: Retriever, saver: Saver, s3Manager: S3Manager, contractStore: ContractStore, workQueue: MessageQueue[Message], imageManager: ImageManager, ipfsManager: IpfsManager, ipfsResolver: IpfsResolver, imageExecutor: ImageExecutor):
         self.w3 = Web3()
         self.requester = requester
         self.retriever = retriever
@@ -75,7 +172,14 @@ class MdtpManager:
         self.workQueue = workQueue
         self.imageManager = imageManager
         self.ipfsManager = ipfsManager
+        self.ipfsResolver = ipfsResolver
         self.ownerAddress = '0xce11d6fb4f1e006e5a348230449dc387fde850cc'
+        self.imageExecutor = imageExecutor
+        self.baseImageCanvases: Dict[str, BaseImageCanvas] = {}
+        # NOTE(krishan711): entries are (gridItem, isStored) where isStored is False for default (not yet minted) grid items
+        self.redirectGridItemCache: LruCache[Tuple[GridItem, bool]] = LruCache(maxSize=_REDIRECT_GRID_ITEM_CACHE_SIZE, ttlSeconds=_REDIRECT_GRID_ITEM_CACHE_TTL_SECONDS)
+        self.redirectGroupImageCache: LruCache[GridItemGroupImage] = LruCache(maxSize=_REDIRECT_GROUP_IMAGE_CACHE_SIZE, ttlSeconds=_REDIRECT_GROUP_IMAGE_CACHE_TTL_SECONDS)
+        self.jsonContentCache: LruCache[Dict[str, Any]] = LruCache(maxSize=_JSON_CONTENT_CACHE_SIZE)
 
     @staticmethod
     def _get_resized_image_url(resizableImageUrl: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
@@ -88,11 +192,56 @@ class MdtpManager:
         queryString = urlparse.urlencode(currentQuery, doseq=True)
         return urlparse.urlunsplit(components=(urlParts.scheme, urlParts.netloc, urlParts.path, queryString, urlParts.fragment))
 
+    async def _send_message_batch(self, messages: Sequence[Message], delay: Optional[int], semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            await self.workQueue.send_messages(messages=messages, delaySeconds=delay or 0)
+
+    async def _send_messages(self, messages: Sequence[Message], delay: Optional[int] = None) -> None:
+        semaphore = asyncio.Semaphore(_WORK_QUEUE_SEND_CONCURRENCY)
+        await asyncio.gather(*[self._send_message_batch(messages=messageBatch, delay=delay, semaphore=semaphore) for messageBatch in list_util.generate_chunks(lst=list(messages), chunkSize=_WORK_QUEUE_BATCH_SIZE)])
+
+    @staticmethod
+    def _is_immutable_content_url(url: str) -> bool:
+        # NOTE(krishan711): /ipfs/ gateway paths are content-addressed too (unlike /ipns/)
+        return url.startswith('ipfs://') or urlparse.urlparse(url).path.startswith('/ipfs/')
+
+    @staticmethod
+    def _get_json_content_ttl_seconds(response: KibaResponse) -> float:
+        cacheControlDirectives = [directive.strip().lower() for directive in response.headers.get('cache-control', '').split(',')]
+        if 'no-store' in cacheControlDirectives or 'no-cache' in cacheControlDirectives:
+            return 0
+        for directive in cacheControlDirectives:
+            if directive.startswith('max-age='):
+                try:
+                    return min(int(directive[len('max-age='):]), _JSON_CONTENT_MAX_TTL_SECONDS)
+                except ValueError:
+                    break
+        return _JSON_CONTENT_DEFAULT_TTL_SECONDS
+
     async def _get_json_content(self, url: str) -> Dict[str, Any]:
-        if url.startswith('ipfs://'):
-            url = url.replace('ipfs://', 'https://pablo-images.kibalabs.com/v1/ipfs/')
-        response = await self.requester.make_request(method='GET', url=url, timeout=300)
-        return json.loads(response.text)
+        content = self.jsonContentCache.get(url)
+        if content is not None:
+            return content
+        try:
+            jsonContent = await self.retriever.get_json_content(url=url)
+        except NotFoundException:
+            jsonContent = None
+        currentDate = date_util.datetime_from_now()
+        if jsonContent and (jsonContent.expiryDate is None or jsonContent.expiryDate > currentDate):
+            ttlSeconds = (jsonContent.expiryDate - currentDate).total_seconds() if jsonContent.expiryDate else None
+            self.jsonContentCache.set(url, jsonContent.content, ttlSeconds=ttlSeconds)
+            return jsonContent.content
+        response = await self.ipfsResolver.get(url=url, timeout=300)
+        content = json.loads(response.text)
+        ttlSeconds = None if self._is_immutable_content_url(url=url) else self._get_json_content_ttl_seconds(response=response)
+        if ttlSeconds is None or ttlSeconds > 0:
+            expiryDate = date_util.datetime_from_now(seconds=ttlSeconds) if ttlSeconds is not None else None
+            await self.saver.upsert_json_content(url=url, content=content, expiryDate=expiryDate)
+            self.jsonContentCache.set(url, content, ttlSeconds=ttlSeconds)
+        elif jsonContent:
+            # NOTE(krishan711): the content is no longer cacheable so the expired copy would otherwise never be replaced
+            await self.saver.delete_json_content(url=url)
+        return content
 
     async def get_token_metadata(self, network: str, tokenId: str) -> TokenMetadata:
         if network in {'rinkeby', 'mumbai', 'rinkeby2', 'rinkeby3', 'rinkeby4', 'sepolia1'}:
@@ -173,6 +322,8 @@ class MdtpManager:
             groupId=metadata.groupId,
             blockNumber=0,
             source='default',
+            updateSequence=0,
+            updateTransactionId=0,
         )
 
     async def retrieve_grid_item(self, network: str, tokenId: int) -> GridItem:
@@ -187,9 +338,52 @@ class MdtpManager:
             filters.append(DateFieldFilter(fieldName=GridItemsTable.c.groupId.key, eq=groupId))
         if ownerId:
             filters.append(DateFieldFilter(fieldName=GridItemsTable.c.ownerId.key, eq=ownerId))
-        gridItems = await self.retriever.list_grid_items(fieldFilters=filters)
+        # NOTE(krishan711): a stable order means the same change stamp always produces the same body (which the etags rely on)
+        gridItems = await self.retriever.list_grid_items(fieldFilters=filters, orders=[Order(fieldName=GridItemsTable.c.tokenId.key, direction=Direction.ASCENDING)])
         return gridItems
 
+    async def get_grid_items_change_stamp(self, network: str) -> str:
+        # NOTE(krishan711): the max update_sequence changes as soon as a newer write commits and the max settled transaction id
+        # changes once a write that committed out of order (with a lower update_sequence) falls below the watermark
+        maxUpdateSequence, maxUpdateTransactionId = await self.retriever.get_grid_items_max_update_values(network=network)
+        return f'{maxUpdateTransactionId}-{maxUpdateSequence}'
+
+    async def get_grid_items_latest_cursor(self, network: str) -> str:
+        updateWatermark = await self.retriever.get_grid_items_update_watermark()
+        return self.encode_grid_items_cursor(updateTransactionId=updateWatermark, updateSequence=0)
+
+    @staticmethod
+    def encode_grid_items_cursor(updateTransactionId: int, updateSequence: int) -> str:
+        return base64.urlsafe_b64encode(f'{_GRID_ITEMS_CURSOR_VERSION}:{updateTransactionId}:{updateSequence}'.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_grid_items_cursor(cursor: str) -> Tuple[int, int]:
+        try:
+            version, updateTransactionId, updateSequence = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+            if version != _GRID_ITEMS_CURSOR_VERSION:
+                raise ValueError(f'Unknown cursor version {version}')
+            return int(updateTransactionId), int(updateSequence)
+        except ValueError as exception:
+            raise BadRequestException(message=f'Invalid cursor: {cursor}') from exception
+
+    async def list_grid_items_delta(self, network: str, cursor: Optional[str] = None, limit: int = _GRID_ITEMS_DELTA_PAGE_SIZE) -> GridItemsDelta:
+        # NOTE(krishan711): update_sequence values are taken when a row is written, not when it commits, so a later sequence
+        # can become visible before an earlier one. Items are only returned once the transaction that wrote them is below
+        # the watermark (the snapshot xmin) because then nothing can still commit before them. The cursor is a position in
+        # (update_transaction_id, update_sequence) order. An empty cursor returns everything from the start.
+        afterPosition = self.decode_grid_items_cursor(cursor=cursor) if cursor else (0, 0)
+        updateWatermark = await self.retriever.get_grid_items_update_watermark()
+        gridItems = await self.retriever.list_grid_items_updated_after(network=network, afterUpdateTransactionId=afterPosition[0], afterUpdateSequence=afterPosition[1], beforeUpdateTransactionId=updateWatermark, limit=limit + 1)
+        hasMore = len(gridItems) > limit
+        gridItems = list(gridItems[:limit])
+        if hasMore:
+            nextPosition = (gridItems[-1].updateTransactionId, gridItems[-1].updateSequence)
+            hasPendingChanges = False
+        else:
+            nextPosition = max(afterPosition, (updateWatermark, 0))
+            hasPendingChanges = await self.retriever.has_grid_items_updated_after(network=network, afterUpdateTransactionId=nextPosition[0], afterUpdateSequence=nextPosition[1])
+        return GridItemsDelta(gridItems=gridItems, cursor=self.encode_grid_items_cursor(updateTransactionId=nextPosition[0], updateSequence=nextPosition[1]), hasMore=hasMore, hasPendingChanges=hasPendingChanges)
+
     async def get_latest_base_image_url(self, network: str) -> BaseImage:
         baseImages = await self.retriever.list_base_images(
             fieldFilters=[StringFieldFilter(fieldName=BaseImagesTable.c.network.key, eq=network)],
@@ -203,6 +397,36 @@ class MdtpManager:
     async def build_base_image_deferred(self, network: str, delay: Optional[int] = None) -> Optional[BaseImage]:
         await self.workQueue.send_message(message=BuildBaseImageMessageContent(network=network).to_message(), delaySeconds=delay or 0)
 
+    async def _load_grid_item_image(self, gridItem: GridItem, tokenWidth: int, tokenHeight: int, downloadSemaphore: asyncio.Semaphore, stageDurations: Dict[str, float]) -> Tuple[GridItem, PILImage.Image]:
+        imageUrl = self._get_resized_image_url(resizableImageUrl=gridItem.resizableImageUrl, width=tokenWidth, height=tokenHeight) if gridItem.resizableImageUrl else gridItem.imageUrl
+        async with downloadSemaphore:
+            startTime = time.time()
+            imageResponse = await self.ipfsResolver.get(url=imageUrl, timeout=300)
+            stageDurations['download'] += time.time() - startTime
+        startTime = time.time()
+        imageMode, imageContent = await self.imageExecutor.run(image_util.resize_image_content, imageResponse.content, tokenWidth, tokenHeight)
+        stageDurations['decode'] += time.time() - startTime
+        return gridItem, PILImage.frombytes(mode=imageMode, size=(tokenWidth, tokenHeight), data=imageContent)
+
+    def _get_base_image_canvas(self, network: str, width: int, height: int, bandHeight: int) -> BaseImageCanvas:
+        canvas = self.baseImageCanvases.get(network)
+        if not canvas:
+            canvas = BaseImageCanvas(filePath=os.path.join(_BASE_IMAGE_CANVAS_DIRECTORY, f'{network}.rgb'), width=width, height=height, bandHeight=bandHeight)
+            canvas.open()
+            self.baseImageCanvases[network] = canvas
+        return canvas
+
+    async def _upload_base_image_tile(self, network: str, canvas: BaseImageCanvas, zoom: int, column: int, row: int, uploadSemaphore: asyncio.Semaphore) -> None:
+        async with uploadSemaphore:
+            tileContent = await self.imageExecutor.run_in_thread(canvas.encode_tile, zoom, column, row, _BASE_IMAGE_TILE_SIZE)
+            await self.s3Manager.write_file(content=tileContent, targetPath=f'{_BASE_IMAGE_TILES_BUCKET}/{network}/{zoom}/{column}/{row}.png', accessControl='public-read', cacheControl=_CACHE_CONTROL_BASE_IMAGE_TILE, contentType='image/png')
+
+    async def _upload_base_image_tiles(self, network: str, canvas: BaseImageCanvas) -> None:
+        tiles = canvas.get_tiles_in_boxes(boxes=canvas.dirtyBoxes, tileSize=_BASE_IMAGE_TILE_SIZE)
+        logging.info(f'Uploading {len(tiles)} changed base image tiles')
+        uploadSemaphore = asyncio.Semaphore(_BASE_IMAGE_TILE_UPLOAD_CONCURRENCY)
+        await asyncio.gather(*[self._upload_base_image_tile(network=network, canvas=canvas, zoom=zoom, column=column, row=row, uploadSemaphore=uploadSemaphore) for (zoom, column, row) in tiles])
+
     async def build_base_image(self, network: str) -> Optional[BaseImage]:
         # NOTE(krishan711): everything is double so that it works well in retina
         scale = 2
@@ -213,7 +437,8 @@ class MdtpManager:
         tokenHeight = 10 * scale
         tokenWidth = 10 * scale
         generatedDate = date_util.datetime_from_now()
-        outputImage = PILImage.new('RGB', (width, height))
+        buildStartTime = time.time()
+        stageDurations: Dict[str, float] = defaultdict(float)
         try:
             latestBaseImage = await self.get_latest_base_image_url(network=network)
         except NotFoundException:
@@ -222,34 +447,50 @@ class MdtpManager:
         if len(gridItems) == 0:
             logging.info('Nothing to update')
             return None
-        if latestBaseImage:
+        canvas = self._get_base_image_canvas(network=network, width=width, height=height, bandHeight=tokenHeight)
+        canvas.reset_dirty_boxes()
+        if not latestBaseImage:
+            canvas.clear()
+        elif latestBaseImage.canvasVersion and canvas.get_version() == latestBaseImage.canvasVersion:
+            logging.info(f'Resuming from local canvas {latestBaseImage.canvasVersion}')
+        else:
+            startTime = time.time()
             baseImageResponse = await self.requester.get(latestBaseImage.url)
-            contentBuffer = BytesIO(baseImageResponse.content)
-            with PILImage.open(fp=contentBuffer) as baseImage:
-                image = baseImage.resize(size=(width, height))
-                outputImage.paste(image, (0, 0))
+            baseImageContent = await self.imageExecutor.run(image_util.decode_image_rgb, baseImageResponse.content, width, height)
+            canvas.load_image(image=PILImage.frombytes(mode='RGB', size=(width, height), data=baseImageContent))
+            stageDurations['previous'] += time.time() - startTime
         logging.info(f'Drawing {len(gridItems)} new grid items')
-        emptyTokenImage = PILImage.new('RGB', (tokenWidth, tokenHeight))
-        for gridItem in gridItems:
+        downloadSemaphore = asyncio.Semaphore(_BASE_IMAGE_DOWNLOAD_CONCURRENCY)
+        imageLoads = [self._load_grid_item_image(gridItem=gridItem, tokenWidth=tokenWidth, tokenHeight=tokenHeight, downloadSemaphore=downloadSemaphore, stageDurations=stageDurations) for gridItem in gridItems]
+        for imageLoad in asyncio.as_completed(imageLoads):
+            gridItem, image = await imageLoad
             logging.info(f'Drawing grid item {gridItem.gridItemId} ({gridItem.resizableImageUrl or gridItem.imageUrl})')
-            imageUrl = self._get_resized_image_url(resizableImageUrl=gridItem.resizableImageUrl, width=tokenWidth, height=tokenHeight) if gridItem.resizableImageUrl else gridItem.imageUrl
-            if imageUrl.startswith('ipfs://'):
-                imageUrl = imageUrl.replace('ipfs://', 'https://pablo-images.kibalabs.com/v1/ipfs/')
-            imageResponse = await self.requester.get(url=imageUrl, timeout=300)
-            contentBuffer = BytesIO(imageResponse.content)
-            with PILImage.open(fp=contentBuffer) as tokenImage:
-                image = tokenImage.resize(size=(tokenWidth, tokenHeight))
+            startTime = time.time()
             tokenIndex = gridItem.tokenId - 1
             xPosition = tokenIndex % canvasSizeX
             yPosition = math.floor(tokenIndex / canvasSizeY)
-            outputImage.paste(emptyTokenImage, (xPosition * tokenWidth, yPosition * tokenHeight))
-            outputImage.paste(image, (xPosition * tokenWidth, yPosition * tokenHeight), mask=image if image.mode == 'RGBA' else None)
+            canvas.paste_image(image=image, xPosition=xPosition * tokenWidth, yPosition=yPosition * tokenHeight)
+            stageDurations['paste'] += time.time() - startTime
+        logging.info(f'Re-encoding dirty region {canvas.dirtyBox} ({len(canvas.dirtyBoxes)} changed boxes)')
+        startTime = time.time()
+        outputContent = await self.imageExecutor.run_in_thread(canvas.encode_png)
         outputFilePath = f'base_image_output-{str(uuid.uuid4())}.png'
-        outputImage.save(outputFilePath)
+        await file_util.write_file_bytes(filePath=outputFilePath, content=outputContent)
+        stageDurations['encode'] += time.time() - startTime
+        startTime = time.time()
         imageId = await self.imageManager.upload_image_from_file(filePath=outputFilePath)
         await file_util.remove_file(filePath=outputFilePath)
+        stageDurations['upload'] += time.time() - startTime
         imageUrl = f'{_API_URL}/v1/images/{imageId}/go'
-        baseImage = await self.saver.create_base_image(network=network, url=imageUrl, generatedDate=generatedDate)
+        startTime = time.time()
+        await self._upload_base_image_tiles(network=network, canvas=canvas)
+        stageDurations['tiles'] += time.time() - startTime
+        canvasVersion = str(uuid.uuid4())
+        canvas.set_version(version=canvasVersion)
+        tileUrlTemplate = f'{_BASE_IMAGE_TILES_URL}/{network}/{{z}}/{{x}}/{{y}}.png'
+        baseImage = await self.saver.create_base_image(network=network, url=imageUrl, generatedDate=generatedDate, canvasVersion=canvasVersion, tileUrlTemplate=tileUrlTemplate, tileSize=_BASE_IMAGE_TILE_SIZE, tileMaxZoom=canvas.get_tile_max_zoom(tileSize=_BASE_IMAGE_TILE_SIZE))
+        stageTimings = ', '.join(f'{stageName} {stageDuration:.2f}s' for stageName, stageDuration in stageDurations.items())
+        logging.info(f'Built base image for {network} with {len(gridItems)} grid items in {time.time() - buildStartTime:.2f}s (cumulative stage times: {stageTimings})')
         return baseImage
 
     async def get_network_status(self, network: str) -> NetworkStatus:
@@ -296,26 +537,33 @@ class MdtpManager:
         metadataUrls = await self.create_metadata_for_token_group(network=network, tokenId=tokenId, shouldUseIpfs=shouldUseIpfs, width=1, height=1, name=name, description=description, imageUrl=imageUrl, url=url)
         return metadataUrls[0]
 
+    async def _upload_token_group_file(self, content: bytes, targetPath: str, contentType: str, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            await self.s3Manager.write_file(content=content, targetPath=targetPath, accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE, contentType=contentType)
+
+    @staticmethod
+    async def _generate_file_contents(fileContents: Dict[str, bytes]) -> AsyncIterator[Tuple[str, bytes]]:
+        for fileName, content in fileContents.items():
+            yield fileName, content
+
+    async def _upload_token_group_files(self, network: str, tokenId: int, directoryName: str, fileContents: Dict[str, bytes], shouldUseIpfs: bool, contentType: str) -> List[str]:
+        # NOTE(krishan711): returns the urls in the same order as fileContents
+        if shouldUseIpfs:
+            cid = await self.ipfsManager.upload_file_stream_to_ipfs(fileContents=self._generate_file_contents(fileContents=fileContents))
+            return [f'ipfs://{cid}/{fileName}' for fileName in fileContents.keys()]
+        target = f's3://mdtp-images/uploads/n/{network}/t/{tokenId}/{directoryName}/{str(uuid.uuid4())}'
+        semaphore = asyncio.Semaphore(_TOKEN_GROUP_UPLOAD_CONCURRENCY)
+        await asyncio.gather(*[self._upload_token_group_file(content=content, targetPath=f'{target}/{fileName}', contentType=contentType, semaphore=semaphore) for fileName, content in fileContents.items()])
+        outputUrl = target.replace('s3://mdtp-images', 'https://mdtp-images.s3.amazonaws.com')
+        return [f'{outputUrl}/{fileName}' for fileName in fileContents.keys()]
+
     async def create_metadata_for_token_group(self, network: str, tokenId: int, shouldUseIpfs: bool, width: int, height: int, name: str, description: Optional[str], imageUrl: str, url: Optional[str]) -> List[str]:
         groupId = str(uuid.uuid4())
         imageId = await self.imageManager.upload_image_from_url(url=imageUrl)
-        outputDirectory = f'./token-group-images-{str(uuid.uuid4())}'
-        imageFileNames = await self.imageManager.crop_image(imageId=imageId, outputDirectory=outputDirectory, width=width, height=height)
-        if shouldUseIpfs:
-            fileContentMap = {imageFileName: open(os.path.join(outputDirectory, imageFileName), 'rb') for imageFileName in imageFileNames}  # pylint: disable=consider-using-with
-            cid = await self.ipfsManager.upload_files_to_ipfs(fileContentMap=fileContentMap)
-            for openFile in fileContentMap.values():
-                openFile.close()
-            imageUrls = [f'ipfs://{cid}/{imageFileName}' for imageFileName in imageFileNames]
-        else:
-            target = f's3://mdtp-images/uploads/n/{network}/t/{tokenId}/gi/{str(uuid.uuid4())}'
-            await self.s3Manager.upload_directory(sourceDirectory=outputDirectory, target=target, accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE)
-            outputUrl = target.replace('s3://mdtp-images', 'https://mdtp-images.s3.amazonaws.com')
-            imageUrls = [os.path.join(outputUrl, imageFileName) for imageFileName in imageFileNames]
-        await file_util.remove_directory(directory=outputDirectory)
-        outputDirectory = f'./token-group-{str(uuid.uuid4())}'
-        await file_util.create_directory(directory=outputDirectory)
-        metadataFileNames = []
+        croppedImages = await self.imageManager.crop_image(imageId=imageId, width=width, height=height)
+        imageFileContents = {f'{index}': croppedImage.content for index, croppedImage in enumerate(croppedImages)}
+        imageUrls = await self._upload_token_group_files(network=network, tokenId=tokenId, directoryName='gi', fileContents=imageFileContents, shouldUseIpfs=shouldUseIpfs, contentType=croppedImages[0].imageFormat)
+        metadataFileContents: Dict[str, bytes] = {}
         for row in range(0, height):
             for column in range(0, width):
                 index = (row * width) + column
@@ -326,22 +574,8 @@ class MdtpManager:
                     'url': url or None,
                     'groupId': groupId,
                 }
-                metadataFileName = f'{index}.json'
-                with open(os.path.join(outputDirectory, metadataFileName), "w") as metadataFile:
-                    metadataFile.write(json.dumps(data))
-                metadataFileNames.append(metadataFileName)
-        if shouldUseIpfs:
-            fileContentMap = {metadataFileName: open(os.path.join(outputDirectory, metadataFileName), 'rb') for metadataFileName in metadataFileNames}  # pylint: disable=consider-using-with
-            cid = await self.ipfsManager.upload_files_to_ipfs(fileContentMap=fileContentMap)
-            for openFile in fileContentMap.values():
-                openFile.close()
-            tokenMetadataUrls = [f'ipfs://{cid}/{metadataFileName}' for metadataFileName in metadataFileNames]
-        else:
-            target = f's3://mdtp-images/uploads/n/{network}/t/{tokenId}/gm/{str(uuid.uuid4())}'
-            await self.s3Manager.upload_directory(sourceDirectory=outputDirectory, target=target, accessControl='public-read', cacheControl=_CACHE_CONTROL_FINAL_FILE)
-            outputUrl = target.replace('s3://mdtp-images', 'https://mdtp-images.s3.amazonaws.com')
-            tokenMetadataUrls = [os.path.join(outputUrl, metadataFileName) for metadataFileName in metadataFileNames]
-        await file_util.remove_directory(directory=outputDirectory)
+                metadataFileContents[f'{index}.json'] = json.dumps(data).encode()
+        tokenMetadataUrls = await self._upload_token_group_files(network=network, tokenId=tokenId, directoryName='gm', fileContents=metadataFileContents, shouldUseIpfs=shouldUseIpfs, contentType='application/json')
         return tokenMetadataUrls
 
     async def update_offchain_contents_for_token_group(self, network: str, tokenId: int, width: int, height: int, blockNumber: int, contentUrls: List[str], signature: str, shouldAllowPendingChange: bool) -> None:
@@ -359,77 +593,158 @@ class MdtpManager:
         messageHash = defunct_hash_message(text=signedMessage)
         signer = w3.eth.account._recover_hash(message_hash=messageHash, signature=signature)  # pylint: disable=protected-access
         isPending = False
-        tokenIds = []
-        for row in range(0, height):
-            for column in range(0, width):
-                innerTokenId = tokenId + (row * 100) + column
-                tokenIds.append(innerTokenId)
-                try:
-                    tokenOwnerId = await self.contractStore.get_token_owner(network=network, tokenId=innerTokenId)
-                except BadRequestException as exception:
-                    if 'owner query for nonexistent token' in exception.message:
-                        tokenOwnerId = NON_OWNER_ID
-                        isPending = True
-                    else:
-                        raise exception
-                if tokenOwnerId != signer and not (shouldAllowPendingChange and tokenOwnerId == NON_OWNER_ID):
-                    raise BadRequestException(message='Owners do not match')
-        databasePromises = []
-        for index, innerTokenId in enumerate(tokenIds):
-            if isPending:
-                databasePromises.append(self.saver.create_offchain_pending_content(network=network, tokenId=innerTokenId, contentUrl=contentUrls[index], blockNumber=blockNumber, ownerId=signer, signature=signature, signedMessage=signedMessage))
-            else:
-                databasePromises.append(self.saver.create_offchain_content(network=network, tokenId=innerTokenId, contentUrl=contentUrls[index], blockNumber=blockNumber, ownerId=signer, signature=signature, signedMessage=signedMessage))
-        await asyncio.gather(*databasePromises)
-        updatePromises = []
-        for innerTokenId in tokenIds:
-            if isPending:
-                updatePromises.append(self.update_token_deferred(network=network, tokenId=innerTokenId, delay=60))
+        tokenIds = [tokenId + (row * 100) + column for row in range(0, height) for column in range(0, width)]
+        tokenStates = await self.contractStore.get_token_states(network=network, tokenIds=tokenIds)
+        for tokenState in tokenStates:
+            if tokenState.ownerErrorMessage:
+                if 'owner query for nonexistent token' not in tokenState.ownerErrorMessage:
+                    raise BadRequestException(message=tokenState.ownerErrorMessage)
+                tokenOwnerId = NON_OWNER_ID
+                isPending = True
             else:
-                updatePromises.append(self.update_token(network=network, tokenId=innerTokenId))
-        await asyncio.gather(*updatePromises)
+                tokenOwnerId = tokenState.ownerId
+            if tokenOwnerId != signer and not (shouldAllowPendingChange and tokenOwnerId == NON_OWNER_ID):
+                raise BadRequestException(message='Owners do not match')
+        offchainContentValuesList = [OffchainContentValues(network=network, tokenId=innerTokenId, contentUrl=contentUrls[index], blockNumber=blockNumber, ownerId=signer, signature=signature, signedMessage=signedMessage) for index, innerTokenId in enumerate(tokenIds)]
+        if isPending:
+            await self.saver.create_offchain_pending_contents(offchainContentValuesList=offchainContentValuesList)
+        else:
+            await self.saver.create_offchain_contents(offchainContentValuesList=offchainContentValuesList)
+        if isPending:
+            await self.update_tokens_batch_deferred(network=network, tokenIds=tokenIds, delay=60)
+        else:
+            failures = await self._update_tokens(network=network, tokenIds=tokenIds)
+            if len(failures) > 0:
+                raise list(failures.values())[0]
 
     async def update_tokens_deferred(self, network: str, delay: Optional[int] = None) -> None:
         await self.workQueue.send_message(message=UpdateTokensMessageContent(network=network).to_message(), delaySeconds=delay or 0)
 
-    async def _get_updated_token_ids(self, network: str, startBlockNumber: int, endBlockNumber: int) -> None:
+    async def _get_updated_token_ids(self, network: str, startBlockNumber: int, endBlockNumber: int) -> Set[int]:
         tokenIdsToUpdate = set()
         transferredTokenIds = await self.contractStore.get_transferred_token_ids_in_blocks(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber)
         logging.info(f'Found {len(transferredTokenIds)} transferred tokens in blocks {startBlockNumber}-{endBlockNumber}')
         tokenIdsToUpdate.update(transferredTokenIds)
-        updatedTokenIds = await self.contractStore.get_updated_token_ids_in_blocks(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber)
-        logging.info(f'Found {len(updatedTokenIds)} updated tokens in blocks {startBlockNumber}-{endBlockNumber}')
-        tokenIdsToUpdate.update(updatedTokenIds)
+        tokenUpdateBlockNumbers = await self.contractStore.get_token_update_block_numbers_in_blocks(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber)
+        logging.info(f'Found {len(tokenUpdateBlockNumbers)} updated tokens in blocks {startBlockNumber}-{endBlockNumber}')
+        await self.saver.upsert_token_content_updates(network=network, tokenBlockNumbers=tokenUpdateBlockNumbers)
+        tokenIdsToUpdate.update(tokenUpdateBlockNumbers.keys())
         offChainUpdatedTokens = await self.retriever.list_offchain_contents(fieldFilters=[
             StringFieldFilter(fieldName=OffchainContentsTable.c.network.key, eq=network),
             IntegerFieldFilter(fieldName=OffchainContentsTable.c.blockNumber.key, gte=startBlockNumber),
-            IntegerFieldFilter(fieldName=OffchainContentsTable.c.blockNumber.key, lt=endBlockNumber),
+            IntegerFieldFilter(fieldName=OffchainContentsTable.c.blockNumber.key, lte=endBlockNumber),
         ])
         logging.info(f'Found {len(offChainUpdatedTokens)} on-chain updated tokens in blocks {startBlockNumber}-{endBlockNumber}')
         tokenIdsToUpdate.update([offchainContent.tokenId for offchainContent in offChainUpdatedTokens])
         return tokenIdsToUpdate
 
-    async def update_tokens(self, network: str) -> None:
+    async def _get_updated_token_ids_in_range(self, network: str, startBlockNumber: int, endBlockNumber: int, semaphore: asyncio.Semaphore) -> Set[int]:
+        async with semaphore:
+            try:
+                return await self._get_updated_token_ids(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber)
+            except BadRequestException as exception:
+                exceptionMessage = (exception.message or '').lower()
+                isRateLimited = any(errorMessage in exceptionMessage for errorMessage in _RATE_LIMIT_ERROR_MESSAGES)
+                isTooManyResults = not isRateLimited and any(errorMessage in exceptionMessage for errorMessage in _TOO_MANY_LOG_RESULTS_ERROR_MESSAGES)
+                if not isTooManyResults or startBlockNumber >= endBlockNumber:
+                    raise
+        middleBlockNumber = (startBlockNumber + endBlockNumber) // 2
+        logging.info(f'Too many results in blocks {startBlockNumber}-{endBlockNumber}, splitting at {middleBlockNumber}')
+        firstTokenIds, secondTokenIds = await asyncio.gather(
+            self._get_updated_token_ids_in_range(network=network, startBlockNumber=startBlockNumber, endBlockNumber=middleBlockNumber, semaphore=semaphore),
+            self._get_updated_token_ids_in_range(network=network, startBlockNumber=middleBlockNumber + 1, endBlockNumber=endBlockNumber, semaphore=semaphore),
+        )
+        return firstTokenIds | secondTokenIds
+
+    async def update_tokens(self, network: str, batchSize: int = _UPDATE_TOKENS_BATCH_SIZE, concurrency: int = _UPDATE_TOKENS_CONCURRENCY) -> None:
+        # NOTE(krishan711): urls that are never requested again would keep their expired json contents forever so they are
+        # purged on this regular run
+        await self.saver.delete_expired_json_contents(expiryDate=date_util.datetime_from_now())
         networkUpdate = await self.retriever.get_network_update_by_network(network=network)
         latestProcessedBlockNumber = networkUpdate.latestBlockNumber
         latestBlockNumber = await self.contractStore.get_latest_block_number(network=network)
-        batchSize = 2500
-        tokenIdsToUpdate = set()
         logging.info(f'Processing blocks from {latestProcessedBlockNumber} to {latestBlockNumber}')
-        for startBlockNumber in range(latestProcessedBlockNumber + 1, latestBlockNumber + 1, batchSize):
-            endBlockNumber = min(startBlockNumber + batchSize, latestBlockNumber)
-            tokenIdsToUpdate.update(await self._get_updated_token_ids(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber))
-        for tokenId in list(tokenIdsToUpdate):
-            await self.update_token_deferred(network=network, tokenId=tokenId)
-        await self.saver.update_network_update(networkUpdateId=networkUpdate.networkUpdateId, latestBlockNumber=latestBlockNumber)
-
-    async def update_all_tokens_deferred(self, network: str, delay: Optional[int] = None) -> None:
-        await self.workQueue.send_message(message=UpdateAllTokensMessageContent(network=network).to_message(), delaySeconds=delay or 0)
-
-    async def update_all_tokens(self, network: str) -> None:
-        tokenCount = await self.contractStore.get_total_supply(network=network)
-        for tokenIndex in range(tokenCount):
-            await self.update_token(network=network, tokenId=(tokenIndex + 1))
+        blockRanges = [(startBlockNumber, min(startBlockNumber + batchSize - 1, latestBlockNumber)) for startBlockNumber in range(latestProcessedBlockNumber + 1, latestBlockNumber + 1, batchSize)]
+        semaphore = asyncio.Semaphore(concurrency)
+        # NOTE(krishan711): ranges are scanned concurrently but consumed in order so latestBlockNumber only ever
+        # moves past a contiguous run of completed ranges and a failure never causes blocks to be skipped
+        tasks = [asyncio.create_task(self._get_updated_token_ids_in_range(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber, semaphore=semaphore)) for startBlockNumber, endBlockNumber in blockRanges]
+        scheduledTokenIds = set()
+        try:
+            for (_, endBlockNumber), task in zip(blockRanges, tasks):
+                tokenIdsToUpdate = await task
+                await self.update_tokens_batch_deferred(network=network, tokenIds=sorted(tokenIdsToUpdate - scheduledTokenIds))
+                scheduledTokenIds.update(tokenIdsToUpdate)
+                await self.saver.update_network_update(networkUpdateId=networkUpdate.networkUpdateId, latestBlockNumber=endBlockNumber)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def backfill_token_content_updates(self, network: str, batchSize: int = 10000) -> None:
+        contract = self.contractStore.get_contract(network=network)
+        networkUpdate = await self.retriever.get_network_update_by_network(network=network)
+        logging.info(f'Backfilling token content updates for {network} from {contract.startBlockNumber} to {networkUpdate.latestBlockNumber}')
+        for startBlockNumber in range(contract.startBlockNumber, networkUpdate.latestBlockNumber + 1, batchSize):
+            endBlockNumber = min(startBlockNumber + batchSize - 1, networkUpdate.latestBlockNumber)
+            tokenUpdateBlockNumbers = await self.contractStore.get_token_update_block_numbers_in_blocks(network=network, startBlockNumber=startBlockNumber, endBlockNumber=endBlockNumber)
+            logging.info(f'Found {len(tokenUpdateBlockNumbers)} updated tokens in blocks {startBlockNumber}-{endBlockNumber}')
+            await self.saver.upsert_token_content_updates(network=network, tokenBlockNumbers=tokenUpdateBlockNumbers)
+
+    async def update_all_tokens_deferred(self, network: str, delay: Optional[int] = None, networkResyncId: Optional[int] = None) -> None:
+        await self.workQueue.send_message(message=UpdateAllTokensMessageContent(network=network, networkResyncId=networkResyncId).to_message(), delaySeconds=delay or 0)
+
+    async def _update_tokens_with_semaphore(self, network: str, tokenIds: Sequence[int], semaphore: asyncio.Semaphore) -> Dict[int, BaseException]:
+        async with semaphore:
+            return await self._update_tokens(network=network, tokenIds=tokenIds)
+
+    async def update_all_tokens(self, network: str, networkResyncId: Optional[int] = None) -> None:
+        # NOTE(krishan711): each call processes one slice of tokens, checkpoints and then schedules itself to continue
+        # so a resync never holds a message longer than its visibility timeout and resumes after a crash
+        if networkResyncId:
+            networkResync = await self.retriever.get_network_resync(networkResyncId=networkResyncId)
+        else:
+            networkResyncs = await self.retriever.list_network_resyncs(fieldFilters=[
+                StringFieldFilter(fieldName=NetworkResyncsTable.c.network.key, eq=network),
+                DateFieldFilter(fieldName=NetworkResyncsTable.c.completedDate.key, isNull=True),
+            ], orders=[Order(fieldName=NetworkResyncsTable.c.createdDate.key, direction=Direction.DESCENDING)], limit=1)
+            networkResync = networkResyncs[0] if len(networkResyncs) > 0 else None
+            if networkResync and networkResync.updatedDate > date_util.datetime_from_now(seconds=-_UPDATE_ALL_TOKENS_STALE_SECONDS):
+                logging.info(f'Skipping update all tokens for {network} as resync {networkResync.networkResyncId} is already in progress')
+                return
+            if networkResync:
+                logging.info(f'Resuming update all tokens for {network} from token {networkResync.latestTokenId + 1}')
+            else:
+                tokenCount = await self.contractStore.get_total_supply(network=network)
+                networkResync = await self.saver.create_network_resync(network=network, tokenCount=tokenCount, latestTokenId=0)
+        if networkResync.completedDate:
+            return
+        # NOTE(krishan711): a stale-looking resync may still have a live chain (e.g. a slow slice or a redelivered message) so
+        # each slice is claimed, and checkpointed, only if latestTokenId is still what was read. A chain that loses either
+        # write stops so two chains never work on (or move back) the same resync. Claiming also refreshes updatedDate so the
+        # resync doesn't look stale while the slice runs.
+        isClaimed = await self.saver.update_network_resync(networkResyncId=networkResync.networkResyncId, latestTokenId=networkResync.latestTokenId, expectedLatestTokenId=networkResync.latestTokenId)
+        if not isClaimed:
+            logging.info(f'Stopping update all tokens for {network} as resync {networkResync.networkResyncId} was claimed by another run')
+            return
+        startTokenId = networkResync.latestTokenId + 1
+        endTokenId = min(networkResync.latestTokenId + _UPDATE_ALL_TOKENS_SLICE_SIZE, networkResync.tokenCount)
+        logging.info(f'Updating tokens {startTokenId}-{endTokenId} of {networkResync.tokenCount} on {network}')
+        semaphore = asyncio.Semaphore(_UPDATE_ALL_TOKENS_CONCURRENCY)
+        failuresList = await asyncio.gather(*[self._update_tokens_with_semaphore(network=network, tokenIds=tokenIdsChunk, semaphore=semaphore) for tokenIdsChunk in list_util.generate_chunks(lst=list(range(startTokenId, endTokenId + 1)), chunkSize=_UPDATE_TOKENS_BATCH_MESSAGE_SIZE)])
+        failedTokenIds = sorted(tokenId for failures in failuresList for tokenId in failures.keys())
+        if len(failedTokenIds) > 0:
+            logging.info(f'Scheduling batch updates for {len(failedTokenIds)} failed tokens on {network}')
+            await self.update_tokens_batch_deferred(network=network, tokenIds=failedTokenIds)
+        isCompleted = endTokenId >= networkResync.tokenCount
+        isCheckpointed = await self.saver.update_network_resync(networkResyncId=networkResync.networkResyncId, latestTokenId=endTokenId, completedDate=date_util.datetime_from_now() if isCompleted else None, expectedLatestTokenId=networkResync.latestTokenId)
+        if not isCheckpointed:
+            logging.info(f'Stopping update all tokens for {network} as resync {networkResync.networkResyncId} was moved on by another run')
+            return
+        if isCompleted:
+            logging.info(f'Completed update all tokens for {network}')
+            return
+        await self.update_all_tokens_deferred(network=network, networkResyncId=networkResync.networkResyncId)
 
     async def upload_token_image_deferred(self, network: str, tokenId: int, delay: Optional[int] = None) -> None:
         await self.workQueue.send_message(message=UploadTokenImageMessageContent(network=network, tokenId=tokenId).to_message(), delaySeconds=delay or 0)
@@ -480,22 +795,18 @@ class MdtpManager:
             tokenWidth = math.ceil(gridWidth / gridSizeX)
             gridHeight = math.floor(1000 * scale * (1.0 / aspectRatio if aspectRatio > 1 else 1))
             tokenHeight = math.ceil(gridHeight / gridSizeY)
-            outputImage = PILImage.new('RGB', (gridWidth, gridHeight))
+            tokenContents = []
             for gridItem in gridItems:
                 logging.info(f'Drawing grid item {gridItem.gridItemId}')
                 imageUrl = self._get_resized_image_url(resizableImageUrl=gridItem.resizableImageUrl, width=tokenWidth, height=tokenHeight) if gridItem.resizableImageUrl else gridItem.imageUrl
-                if imageUrl.startswith('ipfs://'):
-                    imageUrl = imageUrl.replace('ipfs://', 'https://pablo-images.kibalabs.com/v1/ipfs/')
-                imageResponse = await self.requester.get(url=imageUrl, timeout=300)
-                contentBuffer = BytesIO(imageResponse.content)
-                with PILImage.open(fp=contentBuffer) as tokenImage:
-                    image = tokenImage.resize(size=(tokenWidth, tokenHeight))
+                imageResponse = await self.ipfsResolver.get(url=imageUrl, timeout=300)
                 tokenIndex = gridItem.tokenId - 1
                 xPosition = (tokenIndex % canvasTokenHeight) - minX
                 yPosition = math.floor(tokenIndex / canvasTokenHeight) - minY
-                outputImage.paste(image, (xPosition * tokenWidth, yPosition * tokenHeight), mask=image if image.mode == 'RGBA' else None)
+                tokenContents.append((imageResponse.content, xPosition, yPosition))
+            outputContent = await self.imageExecutor.run(image_util.compose_grid_image, gridWidth, gridHeight, tokenWidth, tokenHeight, tokenContents)
             outputFilePath = f'grid_item_group_image_output-{str(uuid.uuid4())}.png'
-            outputImage.save(outputFilePath)
+            await file_util.write_file_bytes(filePath=outputFilePath, content=outputContent)
             imageId = await self.imageManager.upload_image_from_file(filePath=outputFilePath)
             await file_util.remove_file(filePath=outputFilePath)
             imageUrl = f'{_API_URL}/v1/images/{imageId}/go'
@@ -507,16 +818,23 @@ class MdtpManager:
     async def update_token_deferred(self, network: str, tokenId: str, delay: Optional[int] = None) -> None:
         await self.workQueue.send_message(message=UpdateTokenMessageContent(network=network, tokenId=tokenId).to_message(), delaySeconds=delay or 0)
 
-    async def update_token(self, network: str, tokenId: int) -> None:
-        logging.info(f'Updating token {network}/{tokenId}')
-        shouldCheckMigrations = await self.contractStore.should_check_migrations(network=network)
-        isTokenSetForMigration = shouldCheckMigrations and await self.contractStore.is_token_set_for_migration(network=network, tokenId=tokenId)
-        try:
-            ownerId = await self.contractStore.get_token_owner(network=network, tokenId=tokenId)
-        except Exception as exception: # pylint: disable=broad-except
-            logging.info(f'Error getting owner: {str(exception)}')
+    async def update_each_token_deferred(self, network: str, tokenIds: Sequence[int], delay: Optional[int] = None) -> None:
+        messages = [UpdateTokenMessageContent(network=network, tokenId=tokenId).to_message() for tokenId in tokenIds]
+        await self._send_messages(messages=messages, delay=delay)
+
+    async def update_tokens_batch_deferred(self, network: str, tokenIds: Sequence[int], delay: Optional[int] = None) -> None:
+        messages = [UpdateTokensBatchMessageContent(network=network, tokenIds=list(tokenIdsChunk)).to_message() for tokenIdsChunk in list_util.generate_chunks(lst=list(tokenIds), chunkSize=_UPDATE_TOKENS_BATCH_MESSAGE_SIZE)]
+        await self._send_messages(messages=messages, delay=delay)
+
+    async def _resolve_token_content(self, network: str, tokenState: TokenState, tokenContentUpdate: Optional[TokenContentUpdate], latestOffchainContent: Optional[OffchainContent], semaphore: asyncio.Semaphore) -> _TokenContent:
+        tokenId = tokenState.tokenId
+        if tokenState.isTokenSetForMigrationErrorMessage:
+            raise BadRequestException(message=tokenState.isTokenSetForMigrationErrorMessage)
+        ownerId = tokenState.ownerId
+        if tokenState.ownerErrorMessage:
+            logging.info(f'Error getting owner for {network}/{tokenId}: {tokenState.ownerErrorMessage}')
             ownerId = NON_OWNER_ID
-        if isTokenSetForMigration:
+        if tokenState.isTokenSetForMigration:
             originalAddress = await self.contractStore.get_migration_target(network=network)
             originalContract = self.contractStore.get_contract_by_address(address=originalAddress)
             originalGridItem = await self.retrieve_grid_item(network=originalContract.network, tokenId=tokenId)
@@ -524,82 +842,166 @@ class MdtpManager:
             source = originalGridItem.source
             blockNumber = originalGridItem.blockNumber
         else:
-            # Resolve pending contents for the current owner only
-            offchainPendingContents = await self.retriever.list_offchain_pending_contents(fieldFilters=[
-                StringFieldFilter(fieldName=OffchainPendingContentsTable.c.network.key, eq=network),
-                StringFieldFilter(fieldName=OffchainPendingContentsTable.c.tokenId.key, eq=tokenId),
-                StringFieldFilter(fieldName=OffchainPendingContentsTable.c.ownerId.key, eq=ownerId),
-                StringFieldFilter(fieldName=OffchainPendingContentsTable.c.appliedDate.key, eq=None),
-            ], orders=[Order(fieldName=OffchainContentsTable.c.blockNumber.key, direction=Direction.ASCENDING)])
-            for offchainPendingContent in offchainPendingContents:
-                await self.saver.create_offchain_content(network=offchainPendingContent.network, tokenId=offchainPendingContent.tokenId, contentUrl=offchainPendingContent.contentUrl, blockNumber=offchainPendingContent.blockNumber, ownerId=offchainPendingContent.ownerId, signature=offchainPendingContent.signature, signedMessage=offchainPendingContent.signedMessage)
-                await self.saver.update_offchain_pending_content(offchainPendingContentId=offchainPendingContent.offchainPendingContentId, appliedDate=date_util.datetime_from_now())
-            latestOffchainContents = await self.retriever.list_offchain_contents(fieldFilters=[
-                StringFieldFilter(fieldName=OffchainContentsTable.c.network.key, eq=network),
-                StringFieldFilter(fieldName=OffchainContentsTable.c.tokenId.key, eq=tokenId),
-            ], orders=[Order(fieldName=OffchainContentsTable.c.blockNumber.key, direction=Direction.DESCENDING)], limit=1)
-            contentUrl = await self.contractStore.get_token_content_url(network=network, tokenId=tokenId)
-            blockNumber = await self.contractStore.get_latest_update_block_number(network=network, tokenId=tokenId) or 0
+            if tokenState.contentUrlErrorMessage:
+                raise BadRequestException(message=tokenState.contentUrlErrorMessage)
+            contentUrl = tokenState.contentUrl
+            blockNumber = tokenContentUpdate.blockNumber if tokenContentUpdate else 0
             source = 'onchain'
-            if len(latestOffchainContents) > 0 and latestOffchainContents[0].blockNumber > blockNumber:
-                contentUrl = latestOffchainContents[0].contentUrl
+            if latestOffchainContent and latestOffchainContent.blockNumber > blockNumber:
+                contentUrl = latestOffchainContent.contentUrl
                 source = 'offchain'
-                blockNumber = latestOffchainContents[0].blockNumber
-        contentJson = await self._get_json_content(url=contentUrl)
-        title = contentJson.get('title') or contentJson.get('name') or None
-        imageUrl = contentJson.get('imageUrl') or contentJson.get('image') or None
+                blockNumber = latestOffchainContent.blockNumber
+        async with semaphore:
+            contentJson = await self._get_json_content(url=contentUrl)
+            title = contentJson.get('title') or contentJson.get('name') or None
+            imageUrl = contentJson.get('imageUrl') or contentJson.get('image') or None
+            if title is None or imageUrl is None:
+                logging.info('Getting metadata because title or image is None')
+                metadata = await self.get_token_metadata(network=network, tokenId=tokenId)
+                title = title or metadata.title
+                imageUrl = imageUrl or metadata.image
         description = contentJson.get('description')
         url = contentJson.get('url')
         groupId = contentJson.get('groupId') or contentJson.get('blockId')
-        if title is None or imageUrl is None:
-            logging.info('Getting metadata because title or image is None')
-            metadata = await self.get_token_metadata(network=network, tokenId=tokenId)
-            title = title or metadata.title
-            imageUrl = imageUrl or metadata.image
-        isNew = False
-        isChanged = False
-        try:
-            gridItem = await self.retriever.get_grid_item_by_token_id_network(tokenId=tokenId, network=network)
-        except NotFoundException:
-            logging.info(f'Creating token {network}/{tokenId}')
-            gridItem = await self.saver.create_grid_item(tokenId=tokenId, network=network, contentUrl=contentUrl, title=title, description=description, imageUrl=imageUrl, resizableImageUrl=None, url=url, groupId=groupId, ownerId=ownerId, blockNumber=blockNumber, source=source)
-            isNew = True
-        resizableImageUrl = gridItem.resizableImageUrl if gridItem.imageUrl == imageUrl else None
-        isChanged = gridItem.contentUrl != contentUrl or gridItem.title != title or gridItem.description != description or gridItem.imageUrl != imageUrl or gridItem.resizableImageUrl != resizableImageUrl or gridItem.url != url or gridItem.groupId != groupId or gridItem.ownerId != ownerId
-        if isChanged:
-            logging.info(f'Updating token {network}/{tokenId}')
-            await self.saver.update_grid_item(gridItemId=gridItem.gridItemId, contentUrl=contentUrl, title=title, description=description, imageUrl=imageUrl, resizableImageUrl=resizableImageUrl, url=url, groupId=groupId, ownerId=ownerId, blockNumber=blockNumber, source=source)
-        if isChanged or isNew:
-            for contract in self.contractStore.contracts:
-                if contract.sourceNetwork == network:
-                    logging.info(f'Scheduling processing for dependent token: {contract.network}/{tokenId}')
-                    await self.update_token_deferred(network=contract.network, tokenId=tokenId)
-        if not resizableImageUrl:
-            await self.upload_token_image_deferred(network=network, tokenId=tokenId, delay=1)
-        if groupId and (isNew or groupId != gridItem.groupId or ownerId != gridItem.ownerId):
-            await self.update_grid_item_group_image_deferred(network=network, ownerId=ownerId, groupId=groupId)
+        return _TokenContent(tokenId=tokenId, ownerId=ownerId, contentUrl=contentUrl, title=title, description=description, imageUrl=imageUrl, url=url, groupId=groupId, blockNumber=blockNumber, source=source)
+
+    async def _update_tokens(self, network: str, tokenIds: Sequence[int]) -> Dict[int, BaseException]:
+        tokenIds = sorted(set(int(tokenId) for tokenId in tokenIds))
+        tokenStates = await self.contractStore.get_token_states(network=network, tokenIds=tokenIds)
+        ownerIds = {tokenState.tokenId: NON_OWNER_ID if tokenState.ownerErrorMessage else tokenState.ownerId for tokenState in tokenStates}
+        # Resolve pending contents for the current owner only
+        offchainPendingContents = await self.retriever.list_offchain_pending_contents(fieldFilters=[
+            StringFieldFilter(fieldName=OffchainPendingContentsTable.c.network.key, eq=network),
+            IntegerFieldFilter(fieldName=OffchainPendingContentsTable.c.tokenId.key, containedIn=tokenIds),
+            StringFieldFilter(fieldName=OffchainPendingContentsTable.c.appliedDate.key, eq=None),
+        ], orders=[Order(fieldName=OffchainContentsTable.c.blockNumber.key, direction=Direction.ASCENDING)])
+        appliedOffchainPendingContents = [offchainPendingContent for offchainPendingContent in offchainPendingContents if offchainPendingContent.ownerId == ownerIds.get(offchainPendingContent.tokenId)]
+        if len(appliedOffchainPendingContents) > 0:
+            async with self.saver.create_transaction() as connection:
+                await self.saver.create_offchain_contents(offchainContentValuesList=[OffchainContentValues(network=offchainPendingContent.network, tokenId=offchainPendingContent.tokenId, contentUrl=offchainPendingContent.contentUrl, blockNumber=offchainPendingContent.blockNumber, ownerId=offchainPendingContent.ownerId, signature=offchainPendingContent.signature, signedMessage=offchainPendingContent.signedMessage) for offchainPendingContent in appliedOffchainPendingContents], connection=connection)
+                await self.saver.update_offchain_pending_contents(offchainPendingContentIds=[offchainPendingContent.offchainPendingContentId for offchainPendingContent in appliedOffchainPendingContents], appliedDate=date_util.datetime_from_now(), connection=connection)
+        offchainContents = await self.retriever.list_offchain_contents(fieldFilters=[
+            StringFieldFilter(fieldName=OffchainContentsTable.c.network.key, eq=network),
+            IntegerFieldFilter(fieldName=OffchainContentsTable.c.tokenId.key, containedIn=tokenIds),
+        ], orders=[Order(fieldName=OffchainContentsTable.c.blockNumber.key, direction=Direction.ASCENDING)])
+        latestOffchainContentMap = {offchainContent.tokenId: offchainContent for offchainContent in offchainContents}
+        tokenContentUpdates = await self.retriever.list_token_content_updates(fieldFilters=[
+            StringFieldFilter(fieldName=TokenContentUpdatesTable.c.network.key, eq=network),
+            IntegerFieldFilter(fieldName=TokenContentUpdatesTable.c.tokenId.key, containedIn=tokenIds),
+        ])
+        tokenContentUpdateMap = {tokenContentUpdate.tokenId: tokenContentUpdate for tokenContentUpdate in tokenContentUpdates}
+        gridItems = await self.retriever.list_grid_items(fieldFilters=[
+            StringFieldFilter(fieldName=GridItemsTable.c.network.key, eq=network),
+            IntegerFieldFilter(fieldName=GridItemsTable.c.tokenId.key, containedIn=tokenIds),
+        ])
+        gridItemMap = {gridItem.tokenId: gridItem for gridItem in gridItems}
+        semaphore = asyncio.Semaphore(_UPDATE_TOKENS_CONTENT_CONCURRENCY)
+        results = await asyncio.gather(*[self._resolve_token_content(network=network, tokenState=tokenState, tokenContentUpdate=tokenContentUpdateMap.get(tokenState.tokenId), latestOffchainContent=latestOffchainContentMap.get(tokenState.tokenId), semaphore=semaphore) for tokenState in tokenStates], return_exceptions=True)
+        failures: Dict[int, BaseException] = {}
+        gridItemValuesList = []
+        uploadImageTokenIds = []
+        groupImageKeys = set()
+        for tokenState, tokenContent in zip(tokenStates, results):
+            if isinstance(tokenContent, BaseException):
+                logging.info(f'Failed to update token {network}/{tokenState.tokenId}: {str(tokenContent)}')
+                failures[tokenState.tokenId] = tokenContent
+                continue
+            gridItem = gridItemMap.get(tokenContent.tokenId)
+            isNew = gridItem is None
+            resizableImageUrl = gridItem.resizableImageUrl if gridItem and gridItem.imageUrl == tokenContent.imageUrl else None
+            if isNew:
+                logging.info(f'Creating token {network}/{tokenContent.tokenId}')
+                isChanged = True
+            else:
+                isChanged = gridItem.contentUrl != tokenContent.contentUrl or gridItem.title != tokenContent.title or gridItem.description != tokenContent.description or gridItem.imageUrl != tokenContent.imageUrl or gridItem.resizableImageUrl != resizableImageUrl or gridItem.url != tokenContent.url or gridItem.groupId != tokenContent.groupId or gridItem.ownerId != tokenContent.ownerId
+                if isChanged:
+                    logging.info(f'Updating token {network}/{tokenContent.tokenId}')
+            if isChanged:
+                gridItemValuesList.append(GridItemValues(network=network, tokenId=tokenContent.tokenId, contentUrl=tokenContent.contentUrl, title=tokenContent.title, description=tokenContent.description, imageUrl=tokenContent.imageUrl, resizableImageUrl=resizableImageUrl, url=tokenContent.url, groupId=tokenContent.groupId, ownerId=tokenContent.ownerId, blockNumber=tokenContent.blockNumber, source=tokenContent.source))
+            if not resizableImageUrl:
+                uploadImageTokenIds.append(tokenContent.tokenId)
+            if tokenContent.groupId and (isNew or tokenContent.groupId != gridItem.groupId or tokenContent.ownerId != gridItem.ownerId):
+                groupImageKeys.add((tokenContent.ownerId, tokenContent.groupId))
+        await self.saver.upsert_grid_items(gridItemValuesList=gridItemValuesList)
+        changedTokenIds = [gridItemValues.tokenId for gridItemValues in gridItemValuesList]
+        for contract in self.contractStore.contracts:
+            if contract.sourceNetwork == network and len(changedTokenIds) > 0:
+                logging.info(f'Scheduling processing for {len(changedTokenIds)} dependent tokens on {contract.network}')
+                await self.update_tokens_batch_deferred(network=contract.network, tokenIds=changedTokenIds)
+        await self._send_messages(messages=[UpdateGroupImageMessageContent(network=network, ownerId=ownerId, groupId=groupId).to_message() for ownerId, groupId in sorted(groupImageKeys)])
+        await self._send_messages(messages=[UploadTokenImageMessageContent(network=network, tokenId=tokenId).to_message() for tokenId in uploadImageTokenIds], delay=1)
+        return failures
+
+    async def update_token(self, network: str, tokenId: int) -> None:
+        logging.info(f'Updating token {network}/{tokenId}')
+        failures = await self._update_tokens(network=network, tokenIds=[tokenId])
+        if len(failures) > 0:
+            raise list(failures.values())[0]
+
+    async def update_tokens_batch(self, network: str, tokenIds: Sequence[int]) -> None:
+        logging.info(f'Updating {len(tokenIds)} tokens on {network}')
+        failures = await self._update_tokens(network=network, tokenIds=tokenIds)
+        if len(failures) > 0:
+            # NOTE(krishan711): failed tokens are retried individually so a single bad token doesn't block (or dead-letter) the whole batch.
+            # Retrying them as another batch would loop forever when every token in it keeps failing.
+            logging.info(f'Scheduling individual updates for {len(failures)} failed tokens on {network}')
+            await self.update_each_token_deferred(network=network, tokenIds=sorted(failures.keys()))
 
     async def go_to_image(self, imageId: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
         return await self.imageManager.get_image_url(imageId=imageId, width=width, height=height)
 
-    async def go_to_token_image(self, network: str, tokenId: int, width: Optional[int] = None, height: Optional[int] = None) -> str:
+    async def _get_redirect_grid_item(self, network: str, tokenId: int) -> Tuple[GridItem, bool]:
+        cacheKey = (network, tokenId)
+        cachedValue = self.redirectGridItemCache.get(cacheKey)
+        if cachedValue is not None:
+            return cachedValue
         try:
             gridItem = await self.retriever.get_grid_item_by_token_id_network(network=network, tokenId=tokenId)
+            isStored = True
         except NotFoundException:
             gridItem = await self.get_token_default_grid_item(network=network, tokenId=tokenId)
+            isStored = False
+        self.redirectGridItemCache.set(cacheKey, (gridItem, isStored))
+        return gridItem, isStored
+
+    async def _get_redirect_group_image(self, network: str, ownerId: str, groupId: str) -> GridItemGroupImage:
+        cacheKey = (network, ownerId, groupId)
+        gridItemGroupImage = self.redirectGroupImageCache.get(cacheKey)
+        if gridItemGroupImage is None:
+            gridItemGroupImage = await self.retriever.get_grid_item_group_image_by_network_owner_id_group_id(network=network, ownerId=ownerId, groupId=groupId)
+            self.redirectGroupImageCache.set(cacheKey, gridItemGroupImage)
+        return gridItemGroupImage
+
+    def on_grid_items_changed(self, network: str, gridItems: Optional[Sequence[GridItem]]) -> None:
+        if gridItems is None:
+            self.redirectGridItemCache.clear()
+            self.redirectGroupImageCache.clear()
+            return
+        for gridItem in gridItems:
+            self.redirectGridItemCache.delete((network, gridItem.tokenId))
+            if gridItem.groupId:
+                self.redirectGroupImageCache.delete((network, gridItem.ownerId, gridItem.groupId))
+
+    def get_cache_stats(self) -> List[CacheStats]:
+        return [
+            CacheStats(name='redirectGridItems', size=len(self.redirectGridItemCache), maxSize=self.redirectGridItemCache.maxSize, hitCount=self.redirectGridItemCache.hitCount, missCount=self.redirectGridItemCache.missCount),
+            CacheStats(name='redirectGroupImages', size=len(self.redirectGroupImageCache), maxSize=self.redirectGroupImageCache.maxSize, hitCount=self.redirectGroupImageCache.hitCount, missCount=self.redirectGroupImageCache.missCount),
+            CacheStats(name='images', size=len(self.imageManager.imageCache), maxSize=self.imageManager.imageCache.maxSize, hitCount=self.imageManager.imageCache.hitCount, missCount=self.imageManager.imageCache.missCount),
+            CacheStats(name='jsonContents', size=len(self.jsonContentCache), maxSize=self.jsonContentCache.maxSize, hitCount=self.jsonContentCache.hitCount, missCount=self.jsonContentCache.missCount),
+        ]
+
+    async def go_to_token_image(self, network: str, tokenId: int, width: Optional[int] = None, height: Optional[int] = None) -> str:
+        gridItem, _ = await self._get_redirect_grid_item(network=network, tokenId=tokenId)
         if gridItem.resizableImageUrl:
             return self._get_resized_image_url(resizableImageUrl=gridItem.resizableImageUrl, width=width, height=height)
         return gridItem.imageUrl
 
     async def go_to_token_group_image(self, network: str, tokenId: int, width: Optional[int] = None, height: Optional[int] = None) -> str:
-        try:
-            gridItem = await self.retriever.get_grid_item_by_token_id_network(network=network, tokenId=tokenId)
-        except NotFoundException:
-            return await self.go_to_token_image(network=network, tokenId=tokenId, width=width, height=height)
-        if not gridItem.groupId:
+        gridItem, isStored = await self._get_redirect_grid_item(network=network, tokenId=tokenId)
+        if not isStored or not gridItem.groupId:
             return await self.go_to_token_image(network=network, tokenId=tokenId, width=width, height=height)
         try:
-            gridItemGroupImage = await self.retriever.get_grid_item_group_image_by_network_owner_id_group_id(network=gridItem.network, ownerId=gridItem.ownerId, groupId=gridItem.groupId)
+            gridItemGroupImage = await self._get_redirect_group_image(network=gridItem.network, ownerId=gridItem.ownerId, groupId=gridItem.groupId)
         except NotFoundException:
             return await self.go_to_token_image(network=network, tokenId=tokenId, width=width, height=height)
         return self._get_resized_image_url(resizableImageUrl=gridItemGroupImage.imageUrl, width=width, height=height)
@@ -4,8 +4,10 @@ from core.queues.model import Message
 
 from mdtp.manager import MdtpManager
 from mdtp.messages import BuildBaseImageMessageContent
+from mdtp.messages import UpdateAllTokensMessageContent
 from mdtp.messages import UpdateGroupImageMessageContent
 from mdtp.messages import UpdateTokenMessageContent
+from mdtp.messages import UpdateTokensBatchMessageContent
 from mdtp.messages import UpdateTokensMessageContent
 from mdtp.messages import UploadTokenImageMessageContent
 
@@ -20,10 +22,18 @@ class MdtpMessageProcessor(MessageProcessor):
             messageContent = UpdateTokenMessageContent.parse_obj(message.content)
             await self.manager.update_token(network=messageContent.network, tokenId=messageContent.tokenId)
             return
+        if message.command == UpdateTokensBatchMessageContent.get_command():
+            messageContent = UpdateTokensBatchMessageContent.parse_obj(message.content)
+            await self.manager.update_tokens_batch(network=messageContent.network, tokenIds=messageContent.tokenIds)
+            return
         if message.command == UpdateTokensMessageContent.get_command():
             messageContent = UpdateTokensMessageContent.parse_obj(message.content)
             await self.manager.update_tokens(network=messageContent.network)
             return
+        if message.command == UpdateAllTokensMessageContent.get_command():
+            messageContent = UpdateAllTokensMessageContent.parse_obj(message.content)
+            await self.manager.update_all_tokens(network=messageContent.network, networkResyncId=messageContent.networkResyncId)
+            return
         if message.command == UploadTokenImageMessageContent.get_command():
             messageContent = UploadTokenImageMessageContent.parse_obj(message.content)
             await self.manager.upload_token_image(network=messageContent.network, tokenId=messageContent.tokenId)
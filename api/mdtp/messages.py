@@ -1,3 +1,6 @@
+from typing import List
+from typing import Optional
+
 from core.queues.model import MessageContent
 
 
@@ -6,6 +9,11 @@ class UpdateTokenMessageContent(MessageContent):
     network: str
     tokenId: int
 
+class UpdateTokensBatchMessageContent(MessageContent):
+    _COMMAND = 'UPDATE_TOKENS_BATCH'
+    network: str
+    tokenIds: List[int]
+
 class UpdateTokensMessageContent(MessageContent):
     _COMMAND = 'UPDATE_TOKENS'
     network: str
@@ -13,6 +21,7 @@ class UpdateTokensMessageContent(MessageContent):
 class UpdateAllTokensMessageContent(MessageContent):
     _COMMAND = 'UPDATE_ALL_TOKENS'
     network: str
+    networkResyncId: Optional[int]
 
 class UploadTokenImageMessageContent(MessageContent):
     _COMMAND = 'UPLOAD_TOKEN_IMAGE'
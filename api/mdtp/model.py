@@ -1,4 +1,7 @@
 import datetime
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
 
 from pydantic import dataclasses
@@ -21,6 +24,8 @@ class GridItem:
     groupId: Optional[str]
     blockNumber: int
     source: str
+    updateSequence: int
+    updateTransactionId: int
 
 
 @dataclasses.dataclass
@@ -37,6 +42,15 @@ class NetworkStatus:
     randomAvailableTokenId: Optional[int]
 
 
+@dataclasses.dataclass
+class CacheStats:
+    name: str
+    size: int
+    maxSize: int
+    hitCount: int
+    missCount: int
+
+
 @dataclasses.dataclass
 class ImageSize:
     width: int
@@ -51,8 +65,20 @@ class ImageFormat:
 @dataclasses.dataclass
 class Image:
     imageId: str
+    createdDate: datetime.datetime
+    updatedDate: datetime.datetime
     size: ImageSize
     imageFormat: str
+    variantIds: List[str]
+    contentHash: Optional[str]
+
+@dataclasses.dataclass
+class JsonContent:
+    url: str
+    createdDate: datetime.datetime
+    updatedDate: datetime.datetime
+    content: Dict[str, Any]
+    expiryDate: Optional[datetime.datetime]
 
 @dataclasses.dataclass
 class ImageVariant:
@@ -67,6 +93,15 @@ class ImageData:
     size: ImageSize
     imageFormat: str
 
+@dataclasses.dataclass
+class GridItemsDelta:
+    gridItems: List[GridItem]
+    cursor: str
+    hasMore: bool
+    # NOTE(krishan711): true when committed changes exist that can't be returned until older transactions finish
+    hasPendingChanges: bool
+
+
 @dataclasses.dataclass
 class BaseImage:
     baseImageId: int
@@ -75,6 +110,10 @@ class BaseImage:
     network: str
     url: str
     generatedDate: datetime.datetime
+    canvasVersion: Optional[str]
+    tileUrlTemplate: Optional[str]
+    tileSize: Optional[int]
+    tileMaxZoom: Optional[int]
 
 @dataclasses.dataclass
 class TokenMetadata:
@@ -95,6 +134,25 @@ class NetworkUpdate:
     network: str
     latestBlockNumber: int
 
+@dataclasses.dataclass
+class NetworkResync:
+    networkResyncId: int
+    createdDate: datetime.datetime
+    updatedDate: datetime.datetime
+    network: str
+    tokenCount: int
+    latestTokenId: int
+    completedDate: Optional[datetime.datetime]
+
+@dataclasses.dataclass
+class TokenContentUpdate:
+    tokenContentUpdateId: int
+    createdDate: datetime.datetime
+    updatedDate: datetime.datetime
+    network: str
+    tokenId: int
+    blockNumber: int
+
 @dataclasses.dataclass
 class OffchainContent:
     offchainContentId: int
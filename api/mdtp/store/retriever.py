@@ -1,5 +1,8 @@
 from typing import Optional
 from typing import Sequence
+from typing import Tuple
+
+import sqlalchemy
 
 from core.exceptions import NotFoundException
 from core.store.database import DatabaseConnection
@@ -8,24 +11,41 @@ from core.store.retriever import Order
 from core.store.retriever import Retriever as CoreRetriever
 from sqlalchemy.sql import functions as sqlalchemyfunc
 from sqlalchemy.sql import select
+from sqlalchemy.sql import tuple_
 
 from mdtp.model import GridItem
 from mdtp.model import GridItemGroupImage
+from mdtp.model import Image
+from mdtp.model import JsonContent
+from mdtp.model import NetworkResync
 from mdtp.model import NetworkUpdate
 from mdtp.model import OffchainContent
 from mdtp.model import OffchainPendingContent
+from mdtp.model import TokenContentUpdate
 from mdtp.store.schema import BaseImagesTable
 from mdtp.store.schema import GridItemGroupImagesTable
 from mdtp.store.schema import GridItemsTable
+from mdtp.store.schema import ImagesTable
+from mdtp.store.schema import JsonContentsTable
+from mdtp.store.schema import NetworkResyncsTable
 from mdtp.store.schema import NetworkUpdatesTable
 from mdtp.store.schema import OffchainContentsTable
 from mdtp.store.schema import OffchainPendingContentsTable
+from mdtp.store.schema import TokenContentUpdatesTable
 from mdtp.store.schema_conversions import base_image_from_row
 from mdtp.store.schema_conversions import grid_item_from_row
 from mdtp.store.schema_conversions import grid_item_group_image_from_row
+from mdtp.store.schema_conversions import image_from_row
+from mdtp.store.schema_conversions import json_content_from_row
+from mdtp.store.schema_conversions import network_resync_from_row
 from mdtp.store.schema_conversions import network_update_from_row
 from mdtp.store.schema_conversions import offchain_content_from_row
 from mdtp.store.schema_conversions import offchain_pending_content_from_row
+from mdtp.store.schema_conversions import token_content_update_from_row
+
+# NOTE(krishan711): every transaction with an id below the current snapshot's xmin has finished, so no more rows with an
+# update_transaction_id below it can appear.
+_UPDATE_TRANSACTION_WATERMARK = sqlalchemy.func.txid_snapshot_xmin(sqlalchemy.func.txid_current_snapshot(), type_=sqlalchemy.BigInteger)
 
 
 class Retriever(CoreRetriever):
@@ -51,6 +71,45 @@ class Retriever(CoreRetriever):
         value = result.first()
         return int(value[0])
 
+    async def get_grid_items_update_watermark(self, connection: Optional[DatabaseConnection] = None) -> int:
+        query = select(_UPDATE_TRANSACTION_WATERMARK)
+        result = await self.database.execute(query=query, connection=connection)
+        value = result.first()
+        return int(value[0])
+
+    async def get_grid_items_max_update_values(self, network: str, connection: Optional[DatabaseConnection] = None) -> Tuple[int, int]:
+        # NOTE(krishan711): returns the max update_sequence and the max update_transaction_id below the watermark. Each is
+        # read from the end of an index so this stays cheap enough to run on every request.
+        maxUpdateSequenceQuery = select(sqlalchemyfunc.max(GridItemsTable.c.updateSequence)) \
+            .where(GridItemsTable.c.network == network)
+        maxUpdateTransactionIdQuery = select(sqlalchemyfunc.max(GridItemsTable.c.updateTransactionId)) \
+            .where(GridItemsTable.c.network == network) \
+            .where(GridItemsTable.c.updateTransactionId < _UPDATE_TRANSACTION_WATERMARK)
+        query = select(maxUpdateSequenceQuery.scalar_subquery(), maxUpdateTransactionIdQuery.scalar_subquery())
+        result = await self.database.execute(query=query, connection=connection)
+        value = result.first()
+        return int(value[0] or 0), int(value[1] or 0)
+
+    async def list_grid_items_updated_after(self, network: str, afterUpdateTransactionId: int, afterUpdateSequence: int, beforeUpdateTransactionId: int, limit: int, connection: Optional[DatabaseConnection] = None) -> Sequence[GridItem]:
+        query = GridItemsTable.select() \
+            .where(GridItemsTable.c.network == network) \
+            .where(tuple_(GridItemsTable.c.updateTransactionId, GridItemsTable.c.updateSequence) > tuple_(afterUpdateTransactionId, afterUpdateSequence)) \
+            .where(GridItemsTable.c.updateTransactionId < beforeUpdateTransactionId) \
+            .order_by(GridItemsTable.c.updateTransactionId.asc(), GridItemsTable.c.updateSequence.asc()) \
+            .limit(limit)
+        result = await self.database.execute(query=query, connection=connection)
+        gridItems = [grid_item_from_row(row) for row in result.mappings()]
+        return gridItems
+
+    async def has_grid_items_updated_after(self, network: str, afterUpdateTransactionId: int, afterUpdateSequence: int, connection: Optional[DatabaseConnection] = None) -> bool:
+        updatedQuery = select(GridItemsTable.c.gridItemId) \
+            .where(GridItemsTable.c.network == network) \
+            .where(tuple_(GridItemsTable.c.updateTransactionId, GridItemsTable.c.updateSequence) > tuple_(afterUpdateTransactionId, afterUpdateSequence))
+        query = select(updatedQuery.exists())
+        result = await self.database.execute(query=query, connection=connection)
+        value = result.first()
+        return bool(value[0])
+
     async def list_base_images(self, fieldFilters: Optional[Sequence[FieldFilter]] = None, orders: Optional[Sequence[Order]] = None, limit: Optional[int] = None, connection: Optional[DatabaseConnection] = None) -> Sequence[GridItem]:
         query = BaseImagesTable.select()
         if fieldFilters:
@@ -94,6 +153,51 @@ class Retriever(CoreRetriever):
         networkUpdate = network_update_from_row(row)
         return networkUpdate
 
+    async def list_network_resyncs(self, fieldFilters: Optional[Sequence[FieldFilter]] = None, orders: Optional[Sequence[Order]] = None, limit: Optional[int] = None, connection: Optional[DatabaseConnection] = None) -> Sequence[NetworkResync]:
+        query = NetworkResyncsTable.select()
+        if fieldFilters:
+            query = self._apply_field_filters(query=query, table=NetworkResyncsTable, fieldFilters=fieldFilters)
+        if orders:
+            query = self._apply_orders(query=query, table=NetworkResyncsTable, orders=orders)
+        if limit:
+            query = query.limit(limit)
+        result = await self.database.execute(query=query, connection=connection)
+        networkResyncs = [network_resync_from_row(row) for row in result.mappings()]
+        return networkResyncs
+
+    async def get_network_resync(self, networkResyncId: int, connection: Optional[DatabaseConnection] = None) -> NetworkResync:
+        query = NetworkResyncsTable.select() \
+            .where(NetworkResyncsTable.c.networkResyncId == networkResyncId)
+        result = await self.database.execute(query=query, connection=connection)
+        row = result.mappings().first()
+        if not row:
+            raise NotFoundException(message=f'NetworkResync with networkResyncId {networkResyncId} not found')
+        networkResync = network_resync_from_row(row)
+        return networkResync
+
+    async def list_token_content_updates(self, fieldFilters: Optional[Sequence[FieldFilter]] = None, orders: Optional[Sequence[Order]] = None, limit: Optional[int] = None, connection: Optional[DatabaseConnection] = None) -> Sequence[TokenContentUpdate]:
+        query = TokenContentUpdatesTable.select()
+        if fieldFilters:
+            query = self._apply_field_filters(query=query, table=TokenContentUpdatesTable, fieldFilters=fieldFilters)
+        if orders:
+            query = self._apply_orders(query=query, table=TokenContentUpdatesTable, orders=orders)
+        if limit:
+            query = query.limit(limit)
+        result = await self.database.execute(query=query, connection=connection)
+        tokenContentUpdates = [token_content_update_from_row(row) for row in result.mappings()]
+        return tokenContentUpdates
+
+    async def get_token_content_update_by_network_token_id(self, network: str, tokenId: int, connection: Optional[DatabaseConnection] = None) -> TokenContentUpdate:
+        query = TokenContentUpdatesTable.select() \
+            .where(TokenContentUpdatesTable.c.network == network) \
+            .where(TokenContentUpdatesTable.c.tokenId == tokenId)
+        result = await self.database.execute(query=query, connection=connection)
+        row = result.mappings().first()
+        if not row:
+            raise NotFoundException(message=f'TokenContentUpdate with network {network}, tokenId {tokenId} not found')
+        tokenContentUpdate = token_content_update_from_row(row)
+        return tokenContentUpdate
+
     async def list_offchain_contents(self, fieldFilters: Optional[Sequence[FieldFilter]] = None, orders: Optional[Sequence[Order]] = None, limit: Optional[int] = None, connection: Optional[DatabaseConnection] = None) -> Sequence[OffchainContent]:
         query = OffchainContentsTable.select()
         if fieldFilters:
@@ -141,3 +245,33 @@ class Retriever(CoreRetriever):
             raise NotFoundException(message=f'GridItemGroupImage with network {network}, ownerId {ownerId}, groupId {groupId} not found')
         gridItemGroupImage = grid_item_group_image_from_row(row)
         return gridItemGroupImage
+
+    async def get_image(self, imageId: str, connection: Optional[DatabaseConnection] = None) -> Image:
+        query = ImagesTable.select() \
+            .where(ImagesTable.c.imageId == imageId)
+        result = await self.database.execute(query=query, connection=connection)
+        row = result.mappings().first()
+        if not row:
+            raise NotFoundException(message=f'Image with imageId {imageId} not found')
+        image = image_from_row(row)
+        return image
+
+    async def get_image_by_content_hash(self, contentHash: str, connection: Optional[DatabaseConnection] = None) -> Image:
+        query = ImagesTable.select() \
+            .where(ImagesTable.c.contentHash == contentHash)
+        result = await self.database.execute(query=query, connection=connection)
+        row = result.mappings().first()
+        if not row:
+            raise NotFoundException(message=f'Image with contentHash {contentHash} not found')
+        image = image_from_row(row)
+        return image
+
+    async def get_json_content(self, url: str, connection: Optional[DatabaseConnection] = None) -> JsonContent:
+        query = JsonContentsTable.select() \
+            .where(JsonContentsTable.c.url == url)
+        result = await self.database.execute(query=query, connection=connection)
+        row = result.mappings().first()
+        if not row:
+            raise NotFoundException(message=f'JsonContent with url {url} not found')
+        jsonContent = json_content_from_row(row)
+        return jsonContent
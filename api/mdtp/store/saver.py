@@ -1,24 +1,41 @@
+import dataclasses
 import datetime
 from typing import TYPE_CHECKING
 from typing import Any
 from typing import Dict
+from typing import List
 from typing import Optional
+from typing import Sequence
 
 from core.store.database import DatabaseConnection
 from core.store.saver import Saver as CoreSaver
 from core.util import date_util
+from core.util import list_util
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.sql import func as sqlalchemyfunc
 
 from mdtp.model import BaseImage
 from mdtp.model import GridItem
 from mdtp.model import GridItemGroupImage
+from mdtp.model import Image
+from mdtp.model import ImageSize
+from mdtp.model import JsonContent
+from mdtp.model import NetworkResync
 from mdtp.model import NetworkUpdate
 from mdtp.model import OffchainContent
+from mdtp.store.schema import GRID_ITEMS_UPDATE_SEQUENCE_NAME
 from mdtp.store.schema import BaseImagesTable
 from mdtp.store.schema import GridItemGroupImagesTable
 from mdtp.store.schema import GridItemsTable
+from mdtp.store.schema import ImagesTable
+from mdtp.store.schema import JsonContentsTable
+from mdtp.store.schema import NetworkResyncsTable
 from mdtp.store.schema import NetworkUpdatesTable
 from mdtp.store.schema import OffchainContentsTable
 from mdtp.store.schema import OffchainPendingContentsTable
+from mdtp.store.schema import TokenContentUpdatesTable
+from mdtp.store.schema_conversions import grid_item_from_row
+from mdtp.store.schema_conversions import offchain_content_from_row
 
 if TYPE_CHECKING:
     from sqlalchemy.sql._typing import _DMLColumnArgument
@@ -29,6 +46,34 @@ UpdateRecordDict = Dict[_DMLColumnArgument, Any]  # type: ignore[misc]
 
 
 _EMPTY_STRING = '_EMPTY_STRING'
+# NOTE(krishan711): asyncpg allows at most 32767 parameters per statement so multi-row inserts are split into chunks of this many rows
+_MAX_INSERT_ROW_COUNT = 1000
+
+
+@dataclasses.dataclass
+class GridItemValues:
+    network: str
+    tokenId: int
+    contentUrl: Optional[str]
+    title: str
+    description: Optional[str]
+    imageUrl: str
+    resizableImageUrl: Optional[str]
+    url: Optional[str]
+    groupId: Optional[str]
+    ownerId: str
+    blockNumber: int
+    source: str
+
+@dataclasses.dataclass
+class OffchainContentValues:
+    network: str
+    tokenId: int
+    contentUrl: str
+    blockNumber: int
+    ownerId: str
+    signature: str
+    signedMessage: str
 
 
 class Saver(CoreSaver):
@@ -52,10 +97,49 @@ class Saver(CoreSaver):
             GridItemsTable.c.blockNumber.key: blockNumber,
             GridItemsTable.c.source.key: source,
         }
-        query = GridItemsTable.insert().values(values).returning(GridItemsTable.c.gridItemId)
+        query = GridItemsTable.insert().values(values).returning(GridItemsTable.c.gridItemId, GridItemsTable.c.updateSequence, GridItemsTable.c.updateTransactionId)
         result = await self._execute(query=query, connection=connection)
-        gridItemId = int(result.scalar_one())
-        return GridItem(gridItemId=gridItemId, createdDate=createdDate, updatedDate=updatedDate, network=network, tokenId=tokenId, contentUrl=contentUrl, title=title, description=description, imageUrl=imageUrl, resizableImageUrl=resizableImageUrl, url=url, groupId=groupId, ownerId=ownerId, blockNumber=blockNumber, source=source)
+        gridItemId, updateSequence, updateTransactionId = result.one()
+        return GridItem(gridItemId=int(gridItemId), createdDate=createdDate, updatedDate=updatedDate, network=network, tokenId=tokenId, contentUrl=contentUrl, title=title, description=description, imageUrl=imageUrl, resizableImageUrl=resizableImageUrl, url=url, groupId=groupId, ownerId=ownerId, blockNumber=blockNumber, source=source, updateSequence=int(updateSequence), updateTransactionId=int(updateTransactionId))
+
+    async def upsert_grid_items(self, gridItemValuesList: Sequence[GridItemValues], connection: Optional[DatabaseConnection] = None) -> List[GridItem]:
+        if len(gridItemValuesList) == 0:
+            return []
+        # NOTE(krishan711): postgres rejects an upsert that touches the same row twice so only the last values for each token are kept
+        gridItemValuesList = list({(gridItemValues.network, gridItemValues.tokenId): gridItemValues for gridItemValues in gridItemValuesList}.values())
+        if connection is None:
+            async with self.create_transaction() as connection:
+                return await self.upsert_grid_items(gridItemValuesList=gridItemValuesList, connection=connection)
+        createdDate = date_util.datetime_from_now()
+        valuesList: List[CreateRecordDict] = [{
+            GridItemsTable.c.createdDate.key: createdDate,
+            GridItemsTable.c.updatedDate.key: createdDate,
+            GridItemsTable.c.network.key: gridItemValues.network,
+            GridItemsTable.c.tokenId.key: gridItemValues.tokenId,
+            GridItemsTable.c.contentUrl.key: gridItemValues.contentUrl,
+            GridItemsTable.c.title.key: gridItemValues.title,
+            GridItemsTable.c.description.key: gridItemValues.description,
+            GridItemsTable.c.imageUrl.key: gridItemValues.imageUrl,
+            GridItemsTable.c.resizableImageUrl.key: gridItemValues.resizableImageUrl,
+            GridItemsTable.c.ownerId.key: gridItemValues.ownerId,
+            GridItemsTable.c.url.key: gridItemValues.url,
+            GridItemsTable.c.groupId.key: gridItemValues.groupId,
+            GridItemsTable.c.blockNumber.key: gridItemValues.blockNumber,
+            GridItemsTable.c.source.key: gridItemValues.source,
+        } for gridItemValues in gridItemValuesList]
+        gridItems: List[GridItem] = []
+        for chunkValuesList in list_util.generate_chunks(lst=valuesList, chunkSize=_MAX_INSERT_ROW_COUNT):
+            query = postgresql_insert(GridItemsTable).values(chunkValuesList)
+            query = query.on_conflict_do_update(
+                index_elements=[GridItemsTable.c.tokenId, GridItemsTable.c.network],
+                set_={
+                    **{key: query.excluded[key] for key in chunkValuesList[0].keys() if key not in {GridItemsTable.c.createdDate.key, GridItemsTable.c.network.key, GridItemsTable.c.tokenId.key}},
+                    GridItemsTable.c.updateSequence.key: sqlalchemyfunc.nextval(GRID_ITEMS_UPDATE_SEQUENCE_NAME),
+                },
+            ).returning(*GridItemsTable.columns)
+            result = await self._execute(query=query, connection=connection)
+            gridItems += [grid_item_from_row(row) for row in result.mappings()]
+        return gridItems
 
     # NOTE(krishan711): some fields is optional so _EMPTY_STRING allows it to be passed in as None. Maybe there is a nicer way to do this.
     async def update_grid_item(self, gridItemId: int, contentUrl: Optional[str] = _EMPTY_STRING, title: Optional[str] = None, description: Optional[str] = _EMPTY_STRING, imageUrl: Optional[str] = None, resizableImageUrl: Optional[str] = _EMPTY_STRING, url: Optional[str] = _EMPTY_STRING, groupId: Optional[str] = _EMPTY_STRING, ownerId: Optional[str] = None, blockNumber: Optional[int] = None, source: Optional[str] = None, connection: Optional[DatabaseConnection] = None) -> None:
@@ -82,10 +166,11 @@ class Saver(CoreSaver):
             values[GridItemsTable.c.source.key] = source
         if len(values) > 0:
             values[GridItemsTable.c.updatedDate.key] = date_util.datetime_from_now()
+            values[GridItemsTable.c.updateSequence.key] = sqlalchemyfunc.nextval(GRID_ITEMS_UPDATE_SEQUENCE_NAME)
         query = GridItemsTable.update().where(GridItemsTable.c.gridItemId == gridItemId).values(values).returning(GridItemsTable.c.gridItemId)
         await self._execute(query=query, connection=connection)
 
-    async def create_base_image(self, network: str, url: str, generatedDate: datetime.datetime, connection: Optional[DatabaseConnection] = None) -> BaseImage:
+    async def create_base_image(self, network: str, url: str, generatedDate: datetime.datetime, canvasVersion: Optional[str], tileUrlTemplate: Optional[str], tileSize: Optional[int], tileMaxZoom: Optional[int], connection: Optional[DatabaseConnection] = None) -> BaseImage:
         createdDate = date_util.datetime_from_now()
         updatedDate = createdDate
         values: CreateRecordDict = {
@@ -94,11 +179,15 @@ class Saver(CoreSaver):
             BaseImagesTable.c.network.key: network,
             BaseImagesTable.c.url.key: url,
             BaseImagesTable.c.generatedDate.key: generatedDate,
+            BaseImagesTable.c.canvasVersion.key: canvasVersion,
+            BaseImagesTable.c.tileUrlTemplate.key: tileUrlTemplate,
+            BaseImagesTable.c.tileSize.key: tileSize,
+            BaseImagesTable.c.tileMaxZoom.key: tileMaxZoom,
         }
         query = BaseImagesTable.insert().values(values).returning(BaseImagesTable.c.baseImageId)
         result = await self._execute(query=query, connection=connection)
         baseImageId = int(result.scalar_one())
-        return BaseImage(baseImageId=baseImageId, createdDate=createdDate, updatedDate=updatedDate, network=network, url=url, generatedDate=generatedDate)
+        return BaseImage(baseImageId=baseImageId, createdDate=createdDate, updatedDate=updatedDate, network=network, url=url, generatedDate=generatedDate, canvasVersion=canvasVersion, tileUrlTemplate=tileUrlTemplate, tileSize=tileSize, tileMaxZoom=tileMaxZoom)
 
     async def create_network_update(self, network: str, latestBlockNumber: int, connection: Optional[DatabaseConnection] = None) -> NetworkUpdate:
         createdDate = date_util.datetime_from_now()
@@ -123,6 +212,59 @@ class Saver(CoreSaver):
         query = NetworkUpdatesTable.update().where(NetworkUpdatesTable.c.networkUpdateId == networkUpdateId).values(values).returning(NetworkUpdatesTable.c.networkUpdateId)
         await self._execute(query=query, connection=connection)
 
+    async def create_network_resync(self, network: str, tokenCount: int, latestTokenId: int, connection: Optional[DatabaseConnection] = None) -> NetworkResync:
+        createdDate = date_util.datetime_from_now()
+        updatedDate = createdDate
+        values: CreateRecordDict = {
+            NetworkResyncsTable.c.createdDate.key: createdDate,
+            NetworkResyncsTable.c.updatedDate.key: updatedDate,
+            NetworkResyncsTable.c.network.key: network,
+            NetworkResyncsTable.c.tokenCount.key: tokenCount,
+            NetworkResyncsTable.c.latestTokenId.key: latestTokenId,
+            NetworkResyncsTable.c.completedDate.key: None,
+        }
+        query = NetworkResyncsTable.insert().values(values).returning(NetworkResyncsTable.c.networkResyncId)
+        result = await self._execute(query=query, connection=connection)
+        networkResyncId = int(result.scalar_one())
+        return NetworkResync(networkResyncId=networkResyncId, createdDate=createdDate, updatedDate=updatedDate, network=network, tokenCount=tokenCount, latestTokenId=latestTokenId, completedDate=None)
+
+    async def update_network_resync(self, networkResyncId: int, latestTokenId: Optional[int] = None, completedDate: Optional[datetime.datetime] = None, expectedLatestTokenId: Optional[int] = None, connection: Optional[DatabaseConnection] = None) -> bool:
+        # NOTE(krishan711): with expectedLatestTokenId the update only applies if nothing else has moved the resync on. Returns whether it applied.
+        values: UpdateRecordDict = {}
+        if latestTokenId is not None:
+            values[NetworkResyncsTable.c.latestTokenId.key] = latestTokenId
+        if completedDate is not None:
+            values[NetworkResyncsTable.c.completedDate.key] = completedDate
+        if len(values) > 0:
+            values[NetworkResyncsTable.c.updatedDate.key] = date_util.datetime_from_now()
+        query = NetworkResyncsTable.update().where(NetworkResyncsTable.c.networkResyncId == networkResyncId)
+        if expectedLatestTokenId is not None:
+            query = query.where(NetworkResyncsTable.c.latestTokenId == expectedLatestTokenId)
+        query = query.values(values).returning(NetworkResyncsTable.c.networkResyncId)
+        result = await self._execute(query=query, connection=connection)
+        return result.first() is not None
+
+    async def upsert_token_content_updates(self, network: str, tokenBlockNumbers: Dict[int, int], connection: Optional[DatabaseConnection] = None) -> None:
+        if len(tokenBlockNumbers) == 0:
+            return
+        createdDate = date_util.datetime_from_now()
+        valuesList = [{
+            TokenContentUpdatesTable.c.createdDate.key: createdDate,
+            TokenContentUpdatesTable.c.updatedDate.key: createdDate,
+            TokenContentUpdatesTable.c.network.key: network,
+            TokenContentUpdatesTable.c.tokenId.key: tokenId,
+            TokenContentUpdatesTable.c.blockNumber.key: blockNumber,
+        } for tokenId, blockNumber in tokenBlockNumbers.items()]
+        query = postgresql_insert(TokenContentUpdatesTable).values(valuesList)
+        query = query.on_conflict_do_update(
+            index_elements=[TokenContentUpdatesTable.c.network, TokenContentUpdatesTable.c.tokenId],
+            set_={
+                TokenContentUpdatesTable.c.updatedDate.key: query.excluded.updatedDate,
+                TokenContentUpdatesTable.c.blockNumber.key: sqlalchemyfunc.greatest(TokenContentUpdatesTable.c.blockNumber, query.excluded.blockNumber),
+            },
+        )
+        await self._execute(query=query, connection=connection)
+
     async def create_offchain_content(self, tokenId: int, network: str, contentUrl: str, blockNumber: int, ownerId: str, signature: str, signedMessage: str, connection: Optional[DatabaseConnection] = None) -> OffchainContent:
         createdDate = date_util.datetime_from_now()
         updatedDate = createdDate
@@ -142,6 +284,54 @@ class Saver(CoreSaver):
         offchainContentId = int(result.scalar_one())
         return OffchainContent(offchainContentId=offchainContentId, createdDate=createdDate, updatedDate=updatedDate, network=network, tokenId=tokenId, contentUrl=contentUrl, blockNumber=blockNumber, ownerId=ownerId, signature=signature, signedMessage=signedMessage)
 
+    async def create_offchain_contents(self, offchainContentValuesList: Sequence[OffchainContentValues], connection: Optional[DatabaseConnection] = None) -> List[OffchainContent]:
+        if len(offchainContentValuesList) == 0:
+            return []
+        if connection is None:
+            async with self.create_transaction() as connection:
+                return await self.create_offchain_contents(offchainContentValuesList=offchainContentValuesList, connection=connection)
+        createdDate = date_util.datetime_from_now()
+        valuesList: List[CreateRecordDict] = [{
+            OffchainContentsTable.c.createdDate.key: createdDate,
+            OffchainContentsTable.c.updatedDate.key: createdDate,
+            OffchainContentsTable.c.network.key: offchainContentValues.network,
+            OffchainContentsTable.c.tokenId.key: offchainContentValues.tokenId,
+            OffchainContentsTable.c.contentUrl.key: offchainContentValues.contentUrl,
+            OffchainContentsTable.c.blockNumber.key: offchainContentValues.blockNumber,
+            OffchainContentsTable.c.ownerId.key: offchainContentValues.ownerId,
+            OffchainContentsTable.c.signature.key: offchainContentValues.signature,
+            OffchainContentsTable.c.signedMessage.key: offchainContentValues.signedMessage,
+        } for offchainContentValues in offchainContentValuesList]
+        offchainContents: List[OffchainContent] = []
+        for chunkValuesList in list_util.generate_chunks(lst=valuesList, chunkSize=_MAX_INSERT_ROW_COUNT):
+            query = OffchainContentsTable.insert().values(chunkValuesList).returning(*OffchainContentsTable.columns)
+            result = await self._execute(query=query, connection=connection)
+            offchainContents += [offchain_content_from_row(row) for row in result.mappings()]
+        return offchainContents
+
+    async def create_offchain_pending_contents(self, offchainContentValuesList: Sequence[OffchainContentValues], connection: Optional[DatabaseConnection] = None) -> None:
+        if len(offchainContentValuesList) == 0:
+            return
+        if connection is None:
+            async with self.create_transaction() as connection:
+                await self.create_offchain_pending_contents(offchainContentValuesList=offchainContentValuesList, connection=connection)
+                return
+        createdDate = date_util.datetime_from_now()
+        valuesList: List[CreateRecordDict] = [{
+            OffchainPendingContentsTable.c.createdDate.key: createdDate,
+            OffchainPendingContentsTable.c.updatedDate.key: createdDate,
+            OffchainPendingContentsTable.c.network.key: offchainContentValues.network,
+            OffchainPendingContentsTable.c.tokenId.key: offchainContentValues.tokenId,
+            OffchainPendingContentsTable.c.contentUrl.key: offchainContentValues.contentUrl,
+            OffchainPendingContentsTable.c.blockNumber.key: offchainContentValues.blockNumber,
+            OffchainPendingContentsTable.c.ownerId.key: offchainContentValues.ownerId,
+            OffchainPendingContentsTable.c.signature.key: offchainContentValues.signature,
+            OffchainPendingContentsTable.c.signedMessage.key: offchainContentValues.signedMessage,
+        } for offchainContentValues in offchainContentValuesList]
+        for chunkValuesList in list_util.generate_chunks(lst=valuesList, chunkSize=_MAX_INSERT_ROW_COUNT):
+            query = OffchainPendingContentsTable.insert().values(chunkValuesList)
+            await self._execute(query=query, connection=connection)
+
     async def create_offchain_pending_content(self, tokenId: int, network: str, contentUrl: str, blockNumber: int, ownerId: str, signature: str, signedMessage: str, connection: Optional[DatabaseConnection] = None) -> OffchainContent:
         createdDate = date_util.datetime_from_now()
         updatedDate = createdDate
@@ -170,6 +360,16 @@ class Saver(CoreSaver):
         query = OffchainPendingContentsTable.update().where(OffchainPendingContentsTable.c.offchainPendingContentId == offchainPendingContentId).values(values).returning(OffchainPendingContentsTable.c.offchainPendingContentId)
         await self._execute(query=query, connection=connection)
 
+    async def update_offchain_pending_contents(self, offchainPendingContentIds: Sequence[int], appliedDate: datetime.datetime, connection: Optional[DatabaseConnection] = None) -> None:
+        if len(offchainPendingContentIds) == 0:
+            return
+        values: UpdateRecordDict = {
+            OffchainPendingContentsTable.c.appliedDate.key: appliedDate,
+            OffchainPendingContentsTable.c.updatedDate.key: date_util.datetime_from_now(),
+        }
+        query = OffchainPendingContentsTable.update().where(OffchainPendingContentsTable.c.offchainPendingContentId.in_(offchainPendingContentIds)).values(values)
+        await self._execute(query=query, connection=connection)
+
     async def create_grid_item_group_image(self, network: str, ownerId: str, groupId: str, imageUrl: str, connection: Optional[DatabaseConnection] = None) -> GridItemGroupImage:
         createdDate = date_util.datetime_from_now()
         updatedDate = createdDate
@@ -194,3 +394,51 @@ class Saver(CoreSaver):
             values[GridItemGroupImagesTable.c.updatedDate.key] = date_util.datetime_from_now()
         query = GridItemGroupImagesTable.update().where(GridItemGroupImagesTable.c.gridItemGroupImageId == gridItemGroupImageId).values(values).returning(GridItemGroupImagesTable.c.gridItemGroupImageId)
         await self._execute(query=query, connection=connection)
+
+    async def create_image(self, imageId: str, imageFormat: str, width: int, height: int, variantIds: List[str], contentHash: Optional[str], connection: Optional[DatabaseConnection] = None) -> Image:
+        createdDate = date_util.datetime_from_now()
+        updatedDate = createdDate
+        values: CreateRecordDict = {
+            ImagesTable.c.imageId.key: imageId,
+            ImagesTable.c.createdDate.key: createdDate,
+            ImagesTable.c.updatedDate.key: updatedDate,
+            ImagesTable.c.imageFormat.key: imageFormat,
+            ImagesTable.c.width.key: width,
+            ImagesTable.c.height.key: height,
+            ImagesTable.c.variantIds.key: variantIds,
+            ImagesTable.c.contentHash.key: contentHash,
+        }
+        # NOTE(krishan711): images are immutable so a concurrent create of the same image (or the same content) can safely be ignored
+        query = postgresql_insert(ImagesTable).values(values).on_conflict_do_nothing()
+        await self._execute(query=query, connection=connection)
+        return Image(imageId=imageId, createdDate=createdDate, updatedDate=updatedDate, size=ImageSize(width=width, height=height), imageFormat=imageFormat, variantIds=variantIds, contentHash=contentHash)
+
+    async def upsert_json_content(self, url: str, content: Dict[str, Any], expiryDate: Optional[datetime.datetime], connection: Optional[DatabaseConnection] = None) -> JsonContent:
+        createdDate = date_util.datetime_from_now()
+        updatedDate = createdDate
+        values: CreateRecordDict = {
+            JsonContentsTable.c.url.key: url,
+            JsonContentsTable.c.createdDate.key: createdDate,
+            JsonContentsTable.c.updatedDate.key: updatedDate,
+            JsonContentsTable.c.content.key: content,
+            JsonContentsTable.c.expiryDate.key: expiryDate,
+        }
+        query = postgresql_insert(JsonContentsTable).values(values)
+        query = query.on_conflict_do_update(
+            index_elements=[JsonContentsTable.c.url],
+            set_={
+                JsonContentsTable.c.updatedDate.key: query.excluded.updatedDate,
+                JsonContentsTable.c.content.key: query.excluded.content,
+                JsonContentsTable.c.expiryDate.key: query.excluded.expiryDate,
+            },
+        )
+        await self._execute(query=query, connection=connection)
+        return JsonContent(url=url, createdDate=createdDate, updatedDate=updatedDate, content=content, expiryDate=expiryDate)
+
+    async def delete_json_content(self, url: str, connection: Optional[DatabaseConnection] = None) -> None:
+        query = JsonContentsTable.delete().where(JsonContentsTable.c.url == url)
+        await self._execute(query=query, connection=connection)
+
+    async def delete_expired_json_contents(self, expiryDate: datetime.datetime, connection: Optional[DatabaseConnection] = None) -> None:
+        query = JsonContentsTable.delete().where(JsonContentsTable.c.expiryDate <= expiryDate)
+        await self._execute(query=query, connection=connection)
@@ -20,8 +20,15 @@ GridItemsTable = sqlalchemy.Table(
     sqlalchemy.Column(key='ownerId', name='owner_id', type_=sqlalchemy.Text, nullable=True),
     sqlalchemy.Column(key='blockNumber', name='block_number', type_=sqlalchemy.Integer, nullable=False),
     sqlalchemy.Column(key='source', name='source', type_=sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column(key='updateSequence', name='update_sequence', type_=sqlalchemy.BigInteger, nullable=False),
+    sqlalchemy.Column(key='updateTransactionId', name='update_transaction_id', type_=sqlalchemy.BigInteger, nullable=False),
 )
 
+# NOTE(krishan711): inserts get their update_sequence from the column default, updates must set it explicitly
+GRID_ITEMS_UPDATE_SEQUENCE_NAME = 'tbl_grid_items_update_sequence_seq'
+# NOTE(krishan711): notified (with the network as the payload) by a trigger on every grid item insert or update
+GRID_ITEMS_CHANGE_CHANNEL_NAME = 'grid_item_changes'
+
 BaseImagesTable = sqlalchemy.Table(
     'tbl_base_images',
     metadata,
@@ -31,6 +38,10 @@ BaseImagesTable = sqlalchemy.Table(
     sqlalchemy.Column(key='network', name='network', type_=sqlalchemy.Text, nullable=False),
     sqlalchemy.Column(key='url', name='url', type_=sqlalchemy.Text, nullable=False),
     sqlalchemy.Column(key='generatedDate', name='generated_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='canvasVersion', name='canvas_version', type_=sqlalchemy.Text, nullable=True),
+    sqlalchemy.Column(key='tileUrlTemplate', name='tile_url_template', type_=sqlalchemy.Text, nullable=True),
+    sqlalchemy.Column(key='tileSize', name='tile_size', type_=sqlalchemy.Integer, nullable=True),
+    sqlalchemy.Column(key='tileMaxZoom', name='tile_max_zoom', type_=sqlalchemy.Integer, nullable=True),
 )
 
 NetworkUpdatesTable = sqlalchemy.Table(
@@ -43,6 +54,29 @@ NetworkUpdatesTable = sqlalchemy.Table(
     sqlalchemy.Column(key='latestBlockNumber', name='latest_block_number', type_=sqlalchemy.Integer, nullable=False),
 )
 
+NetworkResyncsTable = sqlalchemy.Table(
+    'tbl_network_resyncs',
+    metadata,
+    sqlalchemy.Column(key='networkResyncId', name='id', type_=sqlalchemy.Integer, autoincrement=True, primary_key=True, nullable=False),
+    sqlalchemy.Column(key='createdDate', name='created_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='updatedDate', name='updated_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='network', name='network', type_=sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column(key='tokenCount', name='token_count', type_=sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(key='latestTokenId', name='latest_token_id', type_=sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(key='completedDate', name='completed_date', type_=sqlalchemy.DateTime, nullable=True),
+)
+
+TokenContentUpdatesTable = sqlalchemy.Table(
+    'tbl_token_content_updates',
+    metadata,
+    sqlalchemy.Column(key='tokenContentUpdateId', name='id', type_=sqlalchemy.Integer, autoincrement=True, primary_key=True, nullable=False),
+    sqlalchemy.Column(key='createdDate', name='created_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='updatedDate', name='updated_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='network', name='network', type_=sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column(key='tokenId', name='token_id', type_=sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(key='blockNumber', name='block_number', type_=sqlalchemy.Integer, nullable=False),
+)
+
 OffchainContentsTable = sqlalchemy.Table(
     'tbl_offchain_contents',
     metadata,
@@ -85,3 +119,26 @@ GridItemGroupImagesTable = sqlalchemy.Table(
     sqlalchemy.Column(key='ownerId', name='owner_id', type_=sqlalchemy.Text, nullable=False),
     sqlalchemy.Column(key='imageUrl', name='image_url', type_=sqlalchemy.Text, nullable=False)
 )
+
+ImagesTable = sqlalchemy.Table(
+    'tbl_images',
+    metadata,
+    sqlalchemy.Column(key='imageId', name='id', type_=sqlalchemy.Text, primary_key=True, nullable=False),
+    sqlalchemy.Column(key='createdDate', name='created_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='updatedDate', name='updated_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='imageFormat', name='image_format', type_=sqlalchemy.Text, nullable=False),
+    sqlalchemy.Column(key='width', name='width', type_=sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(key='height', name='height', type_=sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column(key='variantIds', name='variant_ids', type_=sqlalchemy.JSON, nullable=False),
+    sqlalchemy.Column(key='contentHash', name='content_hash', type_=sqlalchemy.Text, nullable=True),
+)
+
+JsonContentsTable = sqlalchemy.Table(
+    'tbl_json_contents',
+    metadata,
+    sqlalchemy.Column(key='url', name='url', type_=sqlalchemy.Text, primary_key=True, nullable=False),
+    sqlalchemy.Column(key='createdDate', name='created_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='updatedDate', name='updated_date', type_=sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column(key='content', name='content', type_=sqlalchemy.JSON, nullable=False),
+    sqlalchemy.Column(key='expiryDate', name='expiry_date', type_=sqlalchemy.DateTime, nullable=True),
+)
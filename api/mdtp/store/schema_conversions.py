@@ -3,15 +3,24 @@ from typing import Mapping
 from mdtp.model import BaseImage
 from mdtp.model import GridItem
 from mdtp.model import GridItemGroupImage
+from mdtp.model import Image
+from mdtp.model import ImageSize
+from mdtp.model import JsonContent
+from mdtp.model import NetworkResync
 from mdtp.model import NetworkUpdate
 from mdtp.model import OffchainContent
 from mdtp.model import OffchainPendingContent
+from mdtp.model import TokenContentUpdate
 from mdtp.store.schema import BaseImagesTable
 from mdtp.store.schema import GridItemGroupImagesTable
 from mdtp.store.schema import GridItemsTable
+from mdtp.store.schema import ImagesTable
+from mdtp.store.schema import JsonContentsTable
+from mdtp.store.schema import NetworkResyncsTable
 from mdtp.store.schema import NetworkUpdatesTable
 from mdtp.store.schema import OffchainContentsTable
 from mdtp.store.schema import OffchainPendingContentsTable
+from mdtp.store.schema import TokenContentUpdatesTable
 
 
 def grid_item_from_row(row: Mapping) -> GridItem:
@@ -31,6 +40,8 @@ def grid_item_from_row(row: Mapping) -> GridItem:
         groupId=row[GridItemsTable.c.groupId],
         blockNumber=row[GridItemsTable.c.blockNumber],
         source=row[GridItemsTable.c.source],
+        updateSequence=row[GridItemsTable.c.updateSequence],
+        updateTransactionId=row[GridItemsTable.c.updateTransactionId],
     )
 
 def base_image_from_row(row: Mapping) -> BaseImage:
@@ -41,6 +52,10 @@ def base_image_from_row(row: Mapping) -> BaseImage:
         network=row[BaseImagesTable.c.network],
         url=row[BaseImagesTable.c.url],
         generatedDate=row[BaseImagesTable.c.generatedDate],
+        canvasVersion=row[BaseImagesTable.c.canvasVersion],
+        tileUrlTemplate=row[BaseImagesTable.c.tileUrlTemplate],
+        tileSize=row[BaseImagesTable.c.tileSize],
+        tileMaxZoom=row[BaseImagesTable.c.tileMaxZoom],
     )
 
 def network_update_from_row(row: Mapping) -> NetworkUpdate:
@@ -52,6 +67,27 @@ def network_update_from_row(row: Mapping) -> NetworkUpdate:
         latestBlockNumber=row[NetworkUpdatesTable.c.latestBlockNumber],
     )
 
+def network_resync_from_row(row: Mapping) -> NetworkResync:
+    return NetworkResync(
+        networkResyncId=row[NetworkResyncsTable.c.networkResyncId],
+        createdDate=row[NetworkResyncsTable.c.createdDate],
+        updatedDate=row[NetworkResyncsTable.c.updatedDate],
+        network=row[NetworkResyncsTable.c.network],
+        tokenCount=row[NetworkResyncsTable.c.tokenCount],
+        latestTokenId=row[NetworkResyncsTable.c.latestTokenId],
+        completedDate=row[NetworkResyncsTable.c.completedDate],
+    )
+
+def token_content_update_from_row(row: Mapping) -> TokenContentUpdate:
+    return TokenContentUpdate(
+        tokenContentUpdateId=row[TokenContentUpdatesTable.c.tokenContentUpdateId],
+        createdDate=row[TokenContentUpdatesTable.c.createdDate],
+        updatedDate=row[TokenContentUpdatesTable.c.updatedDate],
+        network=row[TokenContentUpdatesTable.c.network],
+        tokenId=row[TokenContentUpdatesTable.c.tokenId],
+        blockNumber=row[TokenContentUpdatesTable.c.blockNumber],
+    )
+
 def offchain_content_from_row(row: Mapping) -> OffchainContent:
     return OffchainContent(
         offchainContentId=row[OffchainContentsTable.c.offchainContentId],
@@ -91,3 +127,24 @@ def grid_item_group_image_from_row(row: Mapping) -> GridItemGroupImage:
         ownerId=row[GridItemGroupImagesTable.c.ownerId],
         imageUrl=row[GridItemGroupImagesTable.c.imageUrl],
     )
+
+def image_from_row(row: Mapping) -> Image:
+    return Image(
+        imageId=row[ImagesTable.c.imageId],
+        createdDate=row[ImagesTable.c.createdDate],
+        updatedDate=row[ImagesTable.c.updatedDate],
+        size=ImageSize(width=row[ImagesTable.c.width], height=row[ImagesTable.c.height]),
+        imageFormat=row[ImagesTable.c.imageFormat],
+        variantIds=row[ImagesTable.c.variantIds],
+        contentHash=row[ImagesTable.c.contentHash],
+    )
+
+
+def json_content_from_row(row: Mapping) -> JsonContent:
+    return JsonContent(
+        url=row[JsonContentsTable.c.url],
+        createdDate=row[JsonContentsTable.c.createdDate],
+        updatedDate=row[JsonContentsTable.c.updatedDate],
+        content=row[JsonContentsTable.c.content],
+        expiryDate=row[JsonContentsTable.c.expiryDate],
+    )
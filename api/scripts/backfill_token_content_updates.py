@@ -0,0 +1,63 @@
+import asyncio
+import os
+import sys
+
+import asyncclick as click
+from core import logging
+from core.http.basic_authentication import BasicAuthentication
+from core.queues.sqs import SqsMessageQueue
+from core.requester import Requester
+from core.s3_manager import S3Manager
+from core.store.database import Database
+from core.web3.eth_client import RestEthClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from contracts import create_contract_store
+from mdtp.image_executor import ImageExecutor
+from mdtp.image_manager import ImageManager
+from mdtp.ipfs_manager import IpfsManager
+from mdtp.ipfs_resolver import IpfsResolver
+from mdtp.manager import MdtpManager
+from mdtp.store.retriever import Retriever
+from mdtp.store.saver import Saver
+
+
+@click.command()
+@click.option('-n', '--network', 'network', required=True, type=str)
+async def main(network: str):
+    databaseConnectionString = Database.create_psql_connection_string(username=os.environ["DB_USERNAME"], password=os.environ["DB_PASSWORD"], host=os.environ["DB_HOST"], port=os.environ["DB_PORT"], name=os.environ["DB_NAME"])
+    database = Database(connectionString=databaseConnectionString)
+    saver = Saver(database=database)
+    retriever = Retriever(database=database)
+
+    workQueue = SqsMessageQueue(region='eu-west-1', accessKeyId=os.environ['AWS_KEY'], accessKeySecret=os.environ['AWS_SECRET'], queueUrl='https://sqs.eu-west-1.amazonaws.com/097520841056/mdtp-work-queue')
+    s3Manager = S3Manager(region='eu-west-1', accessKeyId=os.environ['AWS_KEY'], accessKeySecret=os.environ['AWS_SECRET'])
+
+    requester = Requester()
+    ethClient = RestEthClient(url=os.environ['MAINNET_DEPLOYMENT_URL'], requester=requester)
+    sepoliaEthClient = RestEthClient(url='https://eth-sepolia-public.unifra.io', requester=requester)
+    mumbaiEthClient = RestEthClient(url='https://matic-mumbai.chainstacklabs.com', requester=requester)
+    contractStore = create_contract_store(ethClient=ethClient, sepoliaEthClient=sepoliaEthClient, mumbaiEthClient=mumbaiEthClient)
+
+    infuraAuth = BasicAuthentication(username=os.environ['INFURA_IPFS_PROJECT_ID'], password=os.environ['INFURA_IPFS_PROJECT_SECRET'])
+    infuraRequester = Requester(headers={'Authorization': f'Basic {infuraAuth.to_string()}'})
+    ipfsManager = IpfsManager(infuraRequester=infuraRequester)
+    ipfsResolver = IpfsResolver(requester=requester)
+
+    imageExecutor = ImageExecutor()
+    imageManager = ImageManager(requester=requester, s3Manager=s3Manager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, retriever=retriever, saver=saver, imageExecutor=imageExecutor)
+    manager = MdtpManager(requester=requester, retriever=retriever, saver=saver, s3Manager=s3Manager, contractStore=contractStore, workQueue=workQueue, imageManager=imageManager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, imageExecutor=imageExecutor)
+
+    await database.connect()
+    try:
+        await manager.backfill_token_content_updates(network=network)
+    finally:
+        await requester.close_connections()
+        await infuraRequester.close_connections()
+        await database.disconnect()
+        imageExecutor.shutdown()
+
+
+if __name__ == '__main__':
+    logging.init_basic_logging()
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import asyncio
+import datetime
+import gzip
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Callable
+from typing import List
+
+import asyncclick as click
+from core import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from mdtp.api.endpoints_v1 import ListGridItemsResponse
+from mdtp.api.grid_items_columnar import decode_grid_items_columnar
+from mdtp.api.grid_items_columnar import encode_grid_items_columnar
+from mdtp.api.resources_v1 import ApiGridItem
+
+
+def _create_grid_items(count: int, ownerCount: int, groupCount: int) -> List[ApiGridItem]:
+    # NOTE(krishan711): synthetic data shaped like mainnet (a few thousand owners, a few hundred groups, mostly default content)
+    random.seed(count)
+    ownerIds = [f'0x{random.getrandbits(160):040x}' for _ in range(ownerCount)]
+    groupIds = [str(uuid.uuid4()) for _ in range(groupCount)]
+    startDate = datetime.datetime(2021, 6, 1)
+    gridItems = []
+    for tokenId in range(1, count + 1):
+        isDefault = random.random() < 0.6
+        imageId = uuid.uuid4()
+        gridItems.append(ApiGridItem(
+            gridItemId=tokenId,
+            updatedDate=startDate + datetime.timedelta(seconds=random.randint(0, 60 * 60 * 24 * 365)),
+            network='rinkeby',
+            tokenId=tokenId,
+            contentUrl=f'https://api.mdtp.co/token-metadatas/{tokenId}' if isDefault else f'ipfs://Qm{uuid.uuid4().hex}{uuid.uuid4().hex[:12]}',
+            title=f'MDTP #{tokenId}' if isDefault else f'Token {tokenId}',
+            description=None,
+            imageUrl=f'https://mdtp-images.s3.amazonaws.com/uploads/{imageId}/image.png' if not isDefault else f'https://d2a7i2107hou45.cloudfront.net/v1/images/{imageId}/go',
+            resizableImageUrl=f'https://d2a7i2107hou45.cloudfront.net/v1/images/{imageId}/go',
+            ownerId=random.choice(ownerIds),
+            url=None if isDefault else f'https://example.com/{random.choice(groupIds)}',
+            groupId=None if isDefault or random.random() < 0.5 else random.choice(groupIds),
+            blockNumber=random.randint(8000000, 10000000),
+            source='onchain' if isDefault else 'offchain',
+        ))
+    return gridItems
+
+
+def _time_call(call: Callable, repeatCount: int) -> float:
+    startTime = time.perf_counter()
+    for _ in range(repeatCount):
+        call()
+    return (time.perf_counter() - startTime) / repeatCount * 1000
+
+
+@click.command()
+@click.option('-c', '--count', 'count', required=False, type=int, default=10000)
+@click.option('-r', '--repeat-count', 'repeatCount', required=False, type=int, default=10)
+async def main(count: int, repeatCount: int):
+    gridItems = _create_grid_items(count=count, ownerCount=count // 4, groupCount=200)
+    jsonContent = ListGridItemsResponse(gridItems=gridItems).json().encode()
+    columnarContent = encode_grid_items_columnar(gridItems=gridItems)
+    if decode_grid_items_columnar(content=columnarContent) != gridItems:
+        raise Exception('Columnar encoding did not round-trip')
+    jsonEncodeTime = _time_call(call=lambda: ListGridItemsResponse(gridItems=gridItems).json().encode(), repeatCount=repeatCount)
+    jsonDecodeTime = _time_call(call=lambda: ListGridItemsResponse.parse_raw(jsonContent), repeatCount=repeatCount)
+    columnarEncodeTime = _time_call(call=lambda: encode_grid_items_columnar(gridItems=gridItems), repeatCount=repeatCount)
+    columnarDecodeTime = _time_call(call=lambda: decode_grid_items_columnar(content=columnarContent), repeatCount=repeatCount)
+    logging.info(f'{"format":<10} {"bytes":>10} {"gzipped":>10} {"encode ms":>10} {"decode ms":>10}')
+    logging.info(f'{"json":<10} {len(jsonContent):>10} {len(gzip.compress(jsonContent)):>10} {jsonEncodeTime:>10.1f} {jsonDecodeTime:>10.1f}')
+    logging.info(f'{"columnar":<10} {len(columnarContent):>10} {len(gzip.compress(columnarContent)):>10} {columnarEncodeTime:>10.1f} {columnarDecodeTime:>10.1f}')
+
+
+if __name__ == '__main__':
+    logging.init_basic_logging()
+    asyncio.run(main())
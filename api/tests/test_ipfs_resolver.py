@@ -0,0 +1,62 @@
+import asyncio
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import pytest
+from core.exceptions import NotFoundException
+
+from mdtp import ipfs_resolver
+from mdtp.ipfs_resolver import IpfsGateway
+from mdtp.ipfs_resolver import IpfsResolver
+
+
+class FakeRequester:
+
+    def __init__(self, gatewayDelays: Dict[str, float]):
+        self.gatewayDelays = gatewayDelays
+        self.urls: List[str] = []
+
+    async def get(self, url: str, timeout: Optional[int] = None, outputFilePath: Optional[str] = None) -> str:  # pylint: disable=unused-argument
+        self.urls.append(url)
+        urlPrefix = next(urlPrefix for urlPrefix in self.gatewayDelays if url.startswith(urlPrefix))
+        await asyncio.sleep(self.gatewayDelays[urlPrefix])
+        return url
+
+
+def _get_gateway_order(resolver: IpfsResolver) -> List[str]:
+    # pylint: disable=protected-access
+    return [gatewayState.gateway.urlPrefix for gatewayState in resolver._get_ordered_gateway_states()]
+
+
+def test_slow_preferred_gateway_drops_in_order(monkeypatch):
+    monkeypatch.setattr(ipfs_resolver, '_DEFAULT_HEDGE_DELAY_SECONDS', 0.05)
+    requester = FakeRequester(gatewayDelays={'https://preferred/ipfs/': 0.001, 'https://backup/ipfs/': 0.001})
+    resolver = IpfsResolver(requester=requester, gateways=[IpfsGateway(urlPrefix='https://preferred/ipfs/', weight=4.0), IpfsGateway(urlPrefix='https://backup/ipfs/', weight=1.0)])
+
+    async def run() -> List[str]:
+        for _ in range(5):
+            await resolver.get(url='ipfs://cid')
+        assert _get_gateway_order(resolver=resolver)[0] == 'https://preferred/ipfs/'
+        # NOTE(krishan711): the preferred gateway still answers but now always loses the hedged race
+        requester.gatewayDelays['https://preferred/ipfs/'] = 1.0
+        responses = [await resolver.get(url='ipfs://cid') for _ in range(10)]
+        assert all(response == 'https://backup/ipfs/cid' for response in responses)
+        return _get_gateway_order(resolver=resolver)
+
+    assert asyncio.run(run())[0] == 'https://backup/ipfs/'
+
+
+def test_client_error_is_raised_without_failover():
+
+    class NotFoundRequester(FakeRequester):
+
+        async def get(self, url: str, timeout: Optional[int] = None, outputFilePath: Optional[str] = None) -> str:  # pylint: disable=unused-argument
+            self.urls.append(url)
+            raise NotFoundException(message='not found')
+
+    requester = NotFoundRequester(gatewayDelays={})
+    resolver = IpfsResolver(requester=requester, gateways=[IpfsGateway(urlPrefix='https://preferred/ipfs/'), IpfsGateway(urlPrefix='https://backup/ipfs/')])
+    with pytest.raises(NotFoundException):
+        asyncio.run(resolver.get(url='ipfs://cid'))
+    assert requester.urls == ['https://preferred/ipfs/cid']
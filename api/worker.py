@@ -13,8 +13,10 @@ from core.util.value_holder import RequestIdHolder
 from core.web3.eth_client import RestEthClient
 
 from contracts import create_contract_store
+from mdtp.image_executor import ImageExecutor
 from mdtp.image_manager import ImageManager
 from mdtp.ipfs_manager import IpfsManager
+from mdtp.ipfs_resolver import IpfsResolver
 from mdtp.manager import MdtpManager
 from mdtp.mdtp_message_processor import MdtpMessageProcessor
 from mdtp.store.retriever import Retriever
@@ -53,9 +55,11 @@ async def main():
     infuraAuth = BasicAuthentication(username=infuraUsername, password=infuraPassword)
     infuraRequester = Requester(headers={'Authorization': f'Basic {infuraAuth.to_string()}'})
     ipfsManager = IpfsManager(infuraRequester=infuraRequester)
+    ipfsResolver = IpfsResolver(requester=requester)
 
-    imageManager = ImageManager(requester=requester, s3Manager=s3Manager, ipfsManager=ipfsManager)
-    manager = MdtpManager(requester=requester, retriever=retriever, saver=saver, s3Manager=s3Manager, contractStore=contractStore, workQueue=workQueue, imageManager=imageManager, ipfsManager=ipfsManager)
+    imageExecutor = ImageExecutor()
+    imageManager = ImageManager(requester=requester, s3Manager=s3Manager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, retriever=retriever, saver=saver, imageExecutor=imageExecutor)
+    manager = MdtpManager(requester=requester, retriever=retriever, saver=saver, s3Manager=s3Manager, contractStore=contractStore, workQueue=workQueue, imageManager=imageManager, ipfsManager=ipfsManager, ipfsResolver=ipfsResolver, imageExecutor=imageExecutor)
 
     processor = MdtpMessageProcessor(manager=manager)
     slackClient = SlackClient(webhookUrl=os.environ['SLACK_WEBHOOK_URL'], requester=requester, defaultSender='worker', defaultChannel='mdtp-notifications')
@@ -72,6 +76,7 @@ async def main():
     await s3Manager.disconnect()
     await workQueue.disconnect()
     await database.disconnect()
+    imageExecutor.shutdown()
 
 if __name__ == '__main__':
     asyncio.run(main())
@@ -1,3 +1,4 @@
+CREATE SEQUENCE tbl_grid_items_update_sequence_seq;
 CREATE TABLE tbl_grid_items (
     id BIGSERIAL PRIMARY KEY,
     created_date TIMESTAMP NOT NULL,
@@ -15,13 +16,34 @@ CREATE TABLE tbl_grid_items (
     owner_id TEXT NOT NULL,
     block_number INTEGER NOT NULL,
     owner_id TEXT NOT NULL,
+    update_sequence BIGINT NOT NULL DEFAULT nextval('tbl_grid_items_update_sequence_seq'),
+    -- NOTE(krishan711): the id of the transaction that last wrote the row (set by trg_grid_items_set_update_transaction_id).
+    -- update_sequence values can commit out of order so readers only trust rows from transactions below the snapshot xmin.
+    update_transaction_id BIGINT NOT NULL,
 );
 CREATE UNIQUE INDEX tbl_grid_items_uq_token_id_network ON tbl_grid_items (token_id, network);
+CREATE INDEX tbl_grid_items_network_update_sequence ON tbl_grid_items (network, update_sequence);
+CREATE INDEX tbl_grid_items_network_update_transaction_id_update_sequence ON tbl_grid_items (network, update_transaction_id, update_sequence);
 CREATE INDEX tbl_grid_items_updated_date ON tbl_grid_items (updated_date);
 CREATE INDEX tbl_grid_items_network ON tbl_grid_items (network);
 CREATE INDEX tbl_grid_items_token_id ON tbl_grid_items (token_id);
 CREATE INDEX tbl_grid_items_owner_id ON tbl_grid_items (owner_id);
 CREATE INDEX tbl_grid_items_block_id ON tbl_grid_items (block_id);
+CREATE FUNCTION fn_grid_items_set_update_transaction_id() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.update_transaction_id := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_grid_items_set_update_transaction_id BEFORE INSERT OR UPDATE ON tbl_grid_items FOR EACH ROW EXECUTE FUNCTION fn_grid_items_set_update_transaction_id();
+-- NOTE(krishan711): the payload is just the network so postgres collapses the notifications from one transaction into one
+CREATE FUNCTION fn_grid_items_notify_change() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('grid_item_changes', NEW.network);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER trg_grid_items_notify_change AFTER INSERT OR UPDATE ON tbl_grid_items FOR EACH ROW EXECUTE FUNCTION fn_grid_items_notify_change();
 
 CREATE TABLE tbl_base_images (
     id BIGSERIAL PRIMARY KEY,
@@ -29,7 +51,11 @@ CREATE TABLE tbl_base_images (
     updated_date TIMESTAMP NOT NULL,
     network TEXT NOT NULL,
     url TEXT NOT NULL,
-    generated_date TIMESTAMP NOT NULL
+    generated_date TIMESTAMP NOT NULL,
+    canvas_version TEXT,
+    tile_url_template TEXT,
+    tile_size INTEGER,
+    tile_max_zoom INTEGER
 );
 CREATE INDEX tbl_base_images_updated_date ON tbl_base_images (updated_date);
 CREATE INDEX tbl_base_images_network ON tbl_base_images (network);
@@ -43,6 +69,29 @@ CREATE TABLE tbl_network_updates (
 );
 CREATE UNIQUE INDEX tbl_network_updated_uq_network ON tbl_network_updated (network);
 
+CREATE TABLE tbl_network_resyncs (
+    id BIGSERIAL PRIMARY KEY,
+    created_date TIMESTAMP NOT NULL,
+    updated_date TIMESTAMP NOT NULL,
+    network TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    latest_token_id INTEGER NOT NULL,
+    completed_date TIMESTAMP
+);
+CREATE INDEX tbl_network_resyncs_network ON tbl_network_resyncs (network);
+CREATE INDEX tbl_network_resyncs_completed_date ON tbl_network_resyncs (completed_date);
+
+CREATE TABLE tbl_token_content_updates (
+    id BIGSERIAL PRIMARY KEY,
+    created_date TIMESTAMP NOT NULL,
+    updated_date TIMESTAMP NOT NULL,
+    network TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    block_number INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX tbl_token_content_updates_uq_network_token_id ON tbl_token_content_updates (network, token_id);
+CREATE INDEX tbl_token_content_updates_updated_date ON tbl_token_content_updates (updated_date);
+
 CREATE TABLE tbl_offchain_contents (
     id BIGSERIAL PRIMARY KEY,
     created_date TIMESTAMP NOT NULL,
@@ -96,3 +145,26 @@ CREATE INDEX tbl_grid_item_group_images_applied_date ON tbl_grid_item_group_imag
 CREATE INDEX tbl_grid_item_group_images_network ON tbl_grid_item_group_images (network);
 CREATE INDEX tbl_grid_item_group_images_group_id ON tbl_grid_item_group_images (group_id);
 CREATE INDEX tbl_grid_item_group_images_owner_id ON tbl_grid_item_group_images (owner_id);
+
+CREATE TABLE tbl_images (
+    id TEXT PRIMARY KEY,
+    created_date TIMESTAMP NOT NULL,
+    updated_date TIMESTAMP NOT NULL,
+    image_format TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    variant_ids JSONB NOT NULL,
+    content_hash TEXT
+);
+CREATE INDEX tbl_images_updated_date ON tbl_images (updated_date);
+CREATE UNIQUE INDEX tbl_images_uq_content_hash ON tbl_images (content_hash);
+
+CREATE TABLE tbl_json_contents (
+    url TEXT PRIMARY KEY,
+    created_date TIMESTAMP NOT NULL,
+    updated_date TIMESTAMP NOT NULL,
+    content JSONB NOT NULL,
+    expiry_date TIMESTAMP
+);
+CREATE INDEX tbl_json_contents_updated_date ON tbl_json_contents (updated_date);
+CREATE INDEX tbl_json_contents_expiry_date ON tbl_json_contents (expiry_date);